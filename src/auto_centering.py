@@ -1,13 +1,53 @@
 # BSIM4 SkyWater PDK Auto-Centering Tool
 # Constant Current is used for Vth: Id > 140nA * W/L
 
-import re
+from __future__ import annotations
+
 import os
-import subprocess
-import numpy as np
-from typing import Dict, List, Tuple, Optional
-from dataclasses import dataclass
+import re
+import abc
+import math
+from lazy import lazy_import
+from typing import Dict, List, Tuple, Optional, Union
+from dataclasses import dataclass, field, asdict, replace
+import copy
 import tempfile
+import threading
+import contextlib
+from simulator import SimulatorBackend, SimulationJob, Analysis, SimulationError, create_backend, altermod_commands
+from batch import SimulationPool
+from cache import SimulationCache, create_cache, file_digest
+from model_library import ModelLibrary, ModelCard
+from optimizers import OptimizerStrategy, PARAMETER_BOUNDS, clamp_parameter, create_optimizer
+from extraction import extract_iv_metrics, iv_metric_arrays, output_resistance, threshold_current
+from telemetry import Telemetry, create_telemetry
+from solutions import SolutionStore, create_solution_store
+from tuning import TunableParameter, MetricTarget, METRICS, resolve_tunables
+from sensitivity import perturbed_value, normalized_sensitivities, format_sensitivities
+from checkpoint import run_key, save_checkpoint, load_checkpoint, decode_state
+
+np = lazy_import("numpy")
+
+# bump when the netlist, the extracted metrics or the analytic model change,
+# so cached results and stored solutions are not reused
+EXTRACTION_VERSION = 4
+LINEAR_VDS = 0.1    # drain bias of the linear (Vth) sweep
+MC_SAMPLES_PER_JOB = 500    # mismatch samples simulated side by side in one netlist
+MC_MIN_VALID = 0.9          # fraction of samples that must give a Vth for a valid result
+SIGNED_METRICS = ('vth', 'vth_gm', 'vth_sat')   # negative for PMOS, like vth0; currents are magnitudes
+ION_SENSITIVITY_REFRESH = 0.25  # heuristic: re-measure Ion sensitivities after u0/vsat move 25% (vth0 50mV)
+SWEEP_MODES = ('full', 'adaptive')
+ADAPTIVE_WINDOW = 0.06      # V swept either side of the last Vth in adaptive mode
+ADAPTIVE_STEP = 0.004       # V, gate step of the adaptive window (full sweeps use 0.02V)
+
+class CenteringCancelled(Exception):
+    pass
+
+
+@dataclass
+class CenteringEvent:
+    kind: str           # start, iteration, simulation_failed, finished, cancelled
+    data: Dict
 
 @dataclass
 class BSIM4TargetSpec:
@@ -17,6 +57,165 @@ class BSIM4TargetSpec:
     temp: float = 25    # Temperature (°C)
     length: float = 0.15e-6   # Gate length
     width: float = 1e-6       # Gate width (m)
+    metrics: List[MetricTarget] = field(default_factory=list)    # further weighted targets (ss, dibl, rout, ...)
+    
+    def metric_names(self) -> List[str]:
+        return [metric.name for metric in self.metrics]
+    
+    def metric_errors(self, results: Dict[str, float]) -> List[Tuple[float, float]]:
+        # (weight, signed error) of every target, Vth and Ion weigh 1
+        errors = [(1.0, (results['vth'] - self.vth) / self.vth),
+                  (1.0, (results['ion'] - self.ion) / self.ion)]
+        errors.extend((metric.weight, metric.error(results[metric.name])) for metric in self.metrics)
+        return errors
+    
+    def residuals(self, results: Dict[str, float]) -> List[float]:
+        return [weight ** 0.5 * error for weight, error in self.metric_errors(results)]
+
+@dataclass
+class CornerSpec:
+    name: str                   # corner label, e.g. "ss_m40"
+    target: BSIM4TargetSpec     # Vth/Ion targets and vdd/temp of this corner
+    weight: float = 1.0         # weight in the combined error
+    vth0_shift: float = 0.0     # process corner offset added to |vth0| (V)
+    u0_scale: float = 1.0       # process corner factor on u0
+    vsat_scale: float = 1.0     # process corner factor on vsat
+
+class CompositeTargetSpec(abc.ABC):
+    # several named BSIM4TargetSpecs centered together in one job
+    
+    @abc.abstractmethod
+    def named_targets(self) -> List[Tuple[str, BSIM4TargetSpec, float]]:
+        pass
+    
+    def describe(self, name: str) -> str:
+        return name
+    
+    def residuals(self, results: Dict[str, Dict[str, float]]) -> List[float]:
+        residuals = []
+        for name, target, weight in self.named_targets():
+            residuals.extend(weight ** 0.5 * r for r in target.residuals(results[name]))
+        return residuals
+
+@dataclass
+class BSIM4MultiTargetSpec(CompositeTargetSpec):
+    corners: List[CornerSpec]
+    
+    def __post_init__(self):
+        if not self.corners:
+            raise ValueError("At least one corner is required")
+        names = [corner.name for corner in self.corners]
+        if len(set(names)) != len(names):
+            raise ValueError("Corner names must be unique")
+        for corner in self.corners:
+            if not re.fullmatch(r'\w+', corner.name):
+                raise ValueError(f"Invalid corner name: {corner.name!r}")
+            # all corners share one testbench
+            if (corner.target.length, corner.target.width) != (self.corners[0].target.length, self.corners[0].target.width):
+                raise ValueError("All corners must use the same device length and width")
+    
+    def named_targets(self) -> List[Tuple[str, BSIM4TargetSpec, float]]:
+        return [(corner.name, corner.target, corner.weight) for corner in self.corners]
+    
+    def describe(self, name: str) -> str:
+        target = next(corner.target for corner in self.corners if corner.name == name)
+        return f"{name} @ {target.temp:g}°C, VDD={target.vdd:g}V"
+
+@dataclass
+class GeometryTarget:
+    width: float        # Gate width (m)
+    length: float       # Gate length (m)
+    vth: float          # Threshold voltage target (V)
+    ion: float          # On current target (A/um)
+    weight: float = 1.0
+
+def geometry_edges(values: List[float]) -> List[float]:
+    # bin edges around the distinct sizes: geometric midpoints, half a step beyond the extremes
+    values = sorted(set(values))
+    if len(values) == 1:
+        return [values[0] / 1.1, values[0] * 1.1]
+    middles = [math.sqrt(low * high) for low, high in zip(values, values[1:])]
+    return [values[0] ** 2 / middles[0]] + middles + [values[-1] ** 2 / middles[-1]]
+
+@dataclass
+class BSIM4GeometrySpec(CompositeTargetSpec):
+    bins: List[GeometryTarget]
+    vdd: float = 1.8
+    temp: float = 25
+    per_bin: bool = False       # False: one shared parameter set, True: parameters fitted per bin
+    
+    def __post_init__(self):
+        if not self.bins:
+            raise ValueError("At least one geometry is required")
+        if len({(row.width, row.length) for row in self.bins}) != len(self.bins):
+            raise ValueError("Every geometry bin needs its own W/L")
+    
+    def bin_cells(self) -> List[Tuple[Dict[str, float], int]]:
+        # binned model cards: one cell per distinct length x distinct width of the table,
+        # each with the parameters of the nearest row (log W/L distance), so every size
+        # in the table's range selects exactly one card
+        length_edges = geometry_edges([row.length for row in self.bins])
+        width_edges = geometry_edges([row.width for row in self.bins])
+        cells = []
+        for i in range(len(length_edges) - 1):
+            for j in range(len(width_edges) - 1):
+                length = math.sqrt(length_edges[i] * length_edges[i + 1])
+                width = math.sqrt(width_edges[j] * width_edges[j + 1])
+                nearest = min(range(len(self.bins)), key=lambda k: math.log(self.bins[k].length / length) ** 2
+                              + math.log(self.bins[k].width / width) ** 2)
+                cells.append(({'lmin': length_edges[i], 'lmax': length_edges[i + 1],
+                               'wmin': width_edges[j], 'wmax': width_edges[j + 1]}, nearest))
+        return cells
+    
+    def target(self, index: int) -> BSIM4TargetSpec:
+        row = self.bins[index]
+        return BSIM4TargetSpec(vth=row.vth, ion=row.ion, vdd=self.vdd, temp=self.temp,
+                               length=row.length, width=row.width)
+    
+    def named_targets(self) -> List[Tuple[str, BSIM4TargetSpec, float]]:
+        return [(f"bin{i}", self.target(i), row.weight) for i, row in enumerate(self.bins)]
+    
+    def describe(self, name: str) -> str:
+        row = self.bins[int(name[3:])]
+        return f"{name}: W={row.width*1e6:g}um L={row.length*1e6:g}um"
+
+@dataclass
+class BSIM4StatisticalSpec(BSIM4TargetSpec):
+    # vth/ion are targets for the Monte Carlo mean under local mismatch
+    samples: int = 1000         # mismatch samples per candidate
+    sigma_vth0: float = 0.01    # Vth0 mismatch sigma (V), instance delvto
+    sigma_u0: float = 0.03      # relative u0 mismatch sigma, instance mulu0
+    seed: int = 1               # every candidate sees the same samples
+    
+    def __post_init__(self):
+        if self.samples < 2:
+            raise ValueError("At least two Monte Carlo samples are required")
+        if self.sigma_vth0 < 0 or self.sigma_u0 < 0:
+            raise ValueError("Mismatch sigmas must not be negative")
+        if 'rout' in self.metric_names():
+            raise ValueError("Rout targets are not supported for Monte Carlo specs")
+    
+    def mismatch_samples(self) -> Tuple[np.ndarray, np.ndarray]:
+        # (delvto, mulu0) per sample; common random numbers keep the optimizer's objective smooth
+        z = np.random.default_rng(self.seed).standard_normal((2, self.samples))
+        return self.sigma_vth0 * z[0], np.exp(self.sigma_u0 * z[1])
+
+TargetSpec = Union[BSIM4TargetSpec, BSIM4MultiTargetSpec, BSIM4GeometrySpec, BSIM4StatisticalSpec]
+
+# target values and weights only enter the error, not the simulated netlist
+TARGET_FIELDS = ('vth', 'ion', 'value', 'weight')
+
+def _netlist_fields(value):
+    if isinstance(value, dict):
+        return {key: _netlist_fields(item) for key, item in value.items() if key not in TARGET_FIELDS}
+    if isinstance(value, (list, tuple)):
+        return [_netlist_fields(item) for item in value]
+    return value
+
+def netlist_spec(spec: TargetSpec) -> List:
+    # the parts of a spec that determine simulation results: geometry, VDD, temperature,
+    # corners, metric names and Monte Carlo settings; used for cache keys
+    return [type(spec).__name__, _netlist_fields(asdict(spec))]
 
 @dataclass
 class BSIM4Parameters:
@@ -24,29 +223,103 @@ class BSIM4Parameters:
     vsat: float = 1.5e5     # Saturation velocity
     u0: float = 400         # Low field mobility
     toxe: float = 3.05e-9   # Oxide thickness
+    extra: Dict[str, float] = field(default_factory=dict)     # further tuned parameters (k1, eta0, rdsw, ...)
     
     def to_dict(self) -> Dict[str, float]:
         return {
             'vth0': self.vth0,
             'vsat': self.vsat,
             'u0': self.u0,
-            'toxe': self.toxe
+            'toxe': self.toxe,
+            **self.extra
         }
+    
+    def get(self, name: str) -> float:
+        return getattr(self, name) if name in ('vth0', 'vsat', 'u0', 'toxe') else self.extra[name]
+    
+    def updated(self, values: Dict[str, float]) -> 'BSIM4Parameters':
+        fixed = {name: value for name, value in values.items() if name in ('vth0', 'vsat', 'u0', 'toxe')}
+        extra = {**self.extra, **{name: value for name, value in values.items() if name not in fixed}}
+        return replace(self, extra=extra, **fixed)
+    
+    def model_values(self) -> Dict[str, float]:
+        # parameters written into the model card; toxe is only written when it is tuned
+        values = {'vth0': self.vth0, 'vsat': self.vsat, 'u0': self.u0}
+        values.update(self.extra)
+        return values
+
+@dataclass
+class BSIM4BinnedParameters:
+    bins: List[BSIM4Parameters]     # one parameter set per geometry bin
+    
+    def to_dict(self) -> Dict[str, float]:
+        return {f"{name}[{i}]": value
+                for i, params in enumerate(self.bins)
+                for name, value in params.to_dict().items()}
 
 class SkyWaterBSIM4Centering:
     
-    def __init__(self, model_lib_file: str = "skywater_models.lib", device_model: str = "sky130_fd_pr__nfet_01v8"):
+    def __init__(self, model_lib_file: str = "skywater_models.lib", device_model: str = "sky130_fd_pr__nfet_01v8",
+                 backend: Optional[SimulatorBackend] = None, workers: Optional[int] = None,
+                 executor: Optional[str] = None, optimizer: Optional[OptimizerStrategy] = None,
+                 cache: Optional[SimulationCache] = None, use_cache: bool = True,
+                 telemetry: Optional[Telemetry] = None, solutions: Optional[SolutionStore] = None,
+                 warm_start: bool = True, tunables: Optional[List[Union[str, TunableParameter, Dict]]] = None,
+                 simulation_pool: Optional[SimulationPool] = None, sweep: str = "full"):
+        if sweep not in SWEEP_MODES:
+            raise ValueError(f"Unknown sweep mode: {sweep} (choose from {', '.join(SWEEP_MODES)})")
         self.model_lib_file = model_lib_file
         self.device_model = device_model
         self.current_params = BSIM4Parameters()
         self.target_spec = None
         self.iteration_log = []
+        self.best_params = None
+        self.best_error = float('inf')
         self.temp_dir = tempfile.mkdtemp()
+        # created on first simulation, so setting up a tool does not start a simulator
+        self._backend = backend
+        self.workers = workers
+        self.executor = executor
+        # a pool passed in is shared with other tools (and usually their backend too)
+        self.simulation_pool = simulation_pool
+        self.shared_pool = simulation_pool is not None
+        self.optimizer = optimizer if optimizer is not None else create_optimizer()
+        self.simulation_count = 0
+        self.cache = cache if cache is not None else (create_cache() if use_cache else None)
+        self.model_library = None
+        self.model_library_digest = None
+        self.telemetry = telemetry if telemetry is not None else create_telemetry()
+        self.solutions = solutions if solutions is not None else (create_solution_store() if warm_start else None)
+        # parameters the optimizer moves, vth0/u0/vsat by default
+        self.tunables = resolve_tunables(tunables)
+        # last sensitivity_analysis result, {metric: {parameter: normalized sensitivity}}
+        self.sensitivities = None
+        # heuristic: (target, parameters, (u0, vsat) Ion sensitivities) of the last measurement
+        self.ion_sensitivity_point = None
+        # progress events are delivered on the optimizing thread
+        self.event_callback = None
+        self.cancel_event = threading.Event()
+        # set by optimize_parameters(checkpoint=...), written after every iteration
+        self.checkpoint_path = None
+        self.checkpoint_key = None
+        # "adaptive": after the first iteration the linear sweep only covers a fine window
+        # around the last Vth of each target, {netlist prefix: (|Vth|, |vth0|)}
+        self.sweep = sweep
+        self.vth_brackets = {}
         
         print(f"Model library: {self.model_lib_file}")
         print(f"Device model: {self.device_model}")
+        if backend is not None:
+            print(f"Simulator backend: {backend.name}")
         print(f"Temp directory: {self.temp_dir}")
     
+    @property
+    def backend(self) -> SimulatorBackend:
+        if self._backend is None:
+            self._backend = create_backend()
+            print(f"Simulator backend: {self._backend.name}")
+        return self._backend
+    
     def check_model_installation(self) -> bool:
         if not os.path.exists(self.model_lib_file):
             print(f"Creating custom SkyWater model file: {self.model_lib_file}")
@@ -72,36 +345,63 @@ class SkyWaterBSIM4Centering:
         
         print(f"✅ Created custom model file: {self.model_lib_file}")
     
+    def load_model_library(self) -> ModelLibrary:
+        # parsed once, re-parsed only when the file contents change
+        digest = file_digest(self.model_lib_file)
+        if self.model_library is None or digest != self.model_library_digest:
+            self.model_library = ModelLibrary(self.model_lib_file)
+            self.model_library_digest = digest
+        return self.model_library
+    
+    def get_model_card(self) -> Optional[ModelCard]:
+        card = self.load_model_library().get(self.device_model)
+        if card is None or card.device_type not in ('nmos', 'pmos'):
+            return None
+        return card
+    
+    @property
+    def polarity(self) -> int:
+        # +1 for NMOS, -1 for PMOS: sign of the bias voltages, of Vth and of vth0
+        try:
+            card = self.get_model_card()
+        except OSError:
+            return 1
+        return -1 if card is not None and card.device_type == 'pmos' else 1
+    
+    def active_tunables(self) -> Tuple[TunableParameter, ...]:
+        # vth0 bounds are given for NMOS, PMOS mirrors them
+        if self.polarity > 0:
+            return self.tunables
+        return tuple(replace(t, lower=-t.upper, upper=-t.lower, default=-t.default)
+                     if t.name == 'vth0' and t.lower > 0 else t for t in self.tunables)
+    
     def extract_nominal_parameters(self) -> BSIM4Parameters:
         try:
-            with open(self.model_lib_file, 'r', encoding='utf-8') as f:
-                content = f.read()
+            card = self.get_model_card()
             
-            model_pattern = rf'\.model\s+{self.device_model}\s+nmos.*'
-            model_match = re.search(model_pattern, content, re.IGNORECASE)
-            
-            if not model_match:
+            if card is None:
                 print(f"Warning: Model {self.device_model} not found, using default parameters")
                 return BSIM4Parameters()
             
-            model_line = model_match.group(0)
-            params = BSIM4Parameters()
+            for param_name in card.duplicates:
+                print(f"Warning: {param_name} is given more than once, using the last value {card.raw_values[param_name]}")
             
-            param_patterns = {
-                'vth0': r'vth0=([-+]?\d*\.?\d+([eE][-+]?\d+)?)',
-                'vsat': r'vsat=([-+]?\d*\.?\d+([eE][-+]?\d+)?)',
-                'u0': r'u0=([-+]?\d*\.?\d+([eE][-+]?\d+)?)',
-                'toxe': r'toxe=([-+]?\d*\.?\d+([eE][-+]?\d+)?)'
-            }
+            params = self.fill_tunables(BSIM4Parameters())
             
-            for param_name, pattern in param_patterns.items():
-                match = re.search(pattern, model_line, re.IGNORECASE)
-                if match:
-                    try:
-                        setattr(params, param_name, float(match.group(1)))
-                        print(f"Extracted {param_name}: {getattr(params, param_name)}")
-                    except ValueError:
-                        print(f"Warning: Could not parse {param_name}")
+            names = ['vth0', 'vsat', 'u0', 'toxe']
+            names += [name for name in params.extra if name not in names]
+            for param_name in names:
+                value = card.get(param_name)
+                if value is None:
+                    continue
+                if isinstance(value, str):
+                    print(f"Warning: Could not parse {param_name}")
+                    continue
+                # BSIM4 reads u0 < 1 as m^2/V-s, the optimizer works in cm^2/V-s
+                if param_name == 'u0' and value < 1:
+                    value *= 1e4
+                params = params.updated({param_name: value})
+                print(f"Extracted {param_name}: {params.get(param_name)}")
             
             self.current_params = params
             return params
@@ -110,252 +410,994 @@ class SkyWaterBSIM4Centering:
             print(f"Error extracting parameters: {e}")
             return BSIM4Parameters()
     
-    def generate_testbench_netlist(self, params: BSIM4Parameters, spec: BSIM4TargetSpec) -> str:
-        # calculate constant current threshold
-        threshold_current = 140e-9 * (spec.width / spec.length)
-        #print(f"DEBUG: Constant current threshold = 140nA * W/L = {threshold_current:.2e}A")
+    def fill_tunables(self, params):
+        # tuned parameters missing from params start at their BSIM4 default
+        if isinstance(params, BSIM4BinnedParameters):
+            return replace(params, bins=[self.fill_tunables(p) for p in params.bins])
+        current = params.to_dict()
+        missing = {t.name: t.default for t in self.active_tunables() if t.name not in current}
+        return params.updated(missing) if missing else params
+    
+    def model_alterations(self, params: BSIM4Parameters) -> Dict[str, float]:
+        values = params.model_values()
+        if any(t.name == 'toxe' for t in self.tunables):
+            values['toxe'] = params.toxe
+        return values
+    
+    def generate_testbench_netlist(self, params: BSIM4Parameters, spec: BSIM4TargetSpec) -> SimulationJob:
+        # the model library is included as is, only the device model gets altered
+        circuit = self.create_netlist_content(spec, threshold_current(spec.width, spec.length))
+        alter = {self.device_model: self.model_alterations(params)}
         
-        # copy model files to temp
-        temp_model_file = os.path.join(self.temp_dir, "models.lib")
-        with open(self.model_lib_file, 'r') as f:
-            original_content = f.read()
+        return SimulationJob(circuit=circuit, alter=alter, analyses=self.create_analyses(spec, [params]))
+    
+    def corner_parameters(self, params: BSIM4Parameters, corner: CornerSpec) -> Dict[str, float]:
+        return {
+            **self.model_alterations(params),
+            'vth0': params.vth0 + self.polarity * corner.vth0_shift,
+            'vsat': params.vsat * corner.vsat_scale,
+            'u0': params.u0 * corner.u0_scale
+        }
+    
+    def generate_corner_netlist(self, params: BSIM4Parameters, multi_spec: BSIM4MultiTargetSpec) -> SimulationJob:
+        # one testbench, every corner re-sets temperature, supply and model parameters
+        base = multi_spec.corners[0].target
+        circuit = self.create_netlist_content(base, threshold_current(base.width, base.length))
+        circuit.insert(1, f"* Corners: {', '.join(corner.name for corner in multi_spec.corners)}")
         
-        # update model parameters
-        updated_content = original_content
-        updated_content = re.sub(r'vth0=([-+]?\d*\.?\d+([eE][-+]?\d+)?)', 
-                                f'vth0={params.vth0:.6e}', updated_content)
-        updated_content = re.sub(r'vsat=([-+]?\d*\.?\d+([eE][-+]?\d+)?)', 
-                                f'vsat={params.vsat:.6e}', updated_content)
-        updated_content = re.sub(r'u0=([-+]?\d*\.?\d+([eE][-+]?\d+)?)', 
-                                f'u0={params.u0:.6e}', updated_content)
+        analyses = []
+        for corner in multi_spec.corners:
+            spec = corner.target
+            setup = altermod_commands({self.device_model: self.corner_parameters(params, corner)})
+            setup.append(f"option temp = {spec.temp}")
+            setup.append(f"alter Vds2 dc = {self.polarity * spec.vdd}")
+            analyses.extend(self.create_analyses(spec, [params], prefix=f"{corner.name}_", setup=setup))
         
-        with open(temp_model_file, 'w') as f:
-            f.write(updated_content)
+        return SimulationJob(circuit=circuit, analyses=analyses)
+    
+    def generate_geometry_netlist(self, params, geometry_spec: BSIM4GeometrySpec) -> SimulationJob:
+        # every geometry gets its own Vth and Ion device; all Vth devices share the
+        # swept gate, so one dc sweep and one op cover the whole bin table
+        lines = []
+        lines.append("* BSIM4 Geometry Sweep Testbench")
+        lines.append("* Constant Current Vth Extraction: Id > 140nA * W/L")
+        lines.append(f"* Bins: {len(geometry_spec.bins)}")
+        lines.append("")
+        lines.append(f".temp {geometry_spec.temp}")
+        lines.append("")
+        lines.append(f".include {os.path.abspath(self.model_lib_file)}")
+        lines.append("")
         
-        #print(f"DEBUG: Created model file: {temp_model_file}")
+        alter = {}
+        if geometry_spec.per_bin:
+            # per-bin fitting needs one model copy per bin
+            card = self.get_model_card()
+            if card is None:
+                raise ValueError(f"Model {self.device_model} not found in {self.model_lib_file}")
+            for i, bin_params in enumerate(params.bins):
+                model_name = f"{self.device_model}_bin{i}"
+                lines.extend(card.to_spice(name=model_name).splitlines())
+                alter[model_name] = self.model_alterations(bin_params)
+            lines.append("")
+        else:
+            alter[self.device_model] = self.model_alterations(params)
         
-        netlist_content = self.create_netlist_content(spec, threshold_current)
+        lines.append("* Test circuits")
+        sign = self.polarity
+        for i, row in enumerate(geometry_spec.bins):
+            model_name = f"{self.device_model}_bin{i}" if geometry_spec.per_bin else self.device_model
+            lines.append(f"M{i}v d{i}v g1 0 0 {model_name} L={row.length} W={row.width}")
+            lines.append(f"M{i}i d{i}i g2 0 0 {model_name} L={row.length} W={row.width}")
+            lines.append(f"Vd{i}v d{i}v 0 {sign * LINEAR_VDS}")
+            lines.append(f"Vd{i}i d{i}i 0 {sign * geometry_spec.vdd}")
+        lines.append("")
+        lines.append("Vgs1 g1 0 0")
+        lines.append(f"Vgs2 g2 0 {sign * geometry_spec.vdd}")
+        lines.append("")
+        lines.append(".end")
         
-        #print("DEBUG: Generated netlist:")
-        #print(netlist_content)
+        lin_vectors = {'vgs': self.gate_vector('g1')}
+        lin_vectors.update({f'id{i}': f'abs(i(Vd{i}v))' for i in range(len(geometry_spec.bins))})
+        sat_vectors = {'vgs': self.gate_vector('g2')}
+        sat_vectors.update({f'id{i}': f'abs(i(Vd{i}i))' for i in range(len(geometry_spec.bins))})
+        analyses = [
+            Analysis('lin', self.gate_sweep('Vgs1', geometry_spec.vdd), lin_vectors),
+            Analysis('sat', self.gate_sweep('Vgs2', geometry_spec.vdd), sat_vectors)
+        ]
         
-        return netlist_content
+        return SimulationJob(circuit=lines, alter=alter, analyses=analyses)
+    
+    def generate_statistical_netlists(self, params: BSIM4Parameters,
+                                      spec: BSIM4StatisticalSpec) -> List[SimulationJob]:
+        # every sample is its own Vth and Ion device with the mismatch as instance parameters,
+        # so one dc sweep per netlist covers MC_SAMPLES_PER_JOB samples; the netlists run on the pool
+        delvto, mulu0 = spec.mismatch_samples()
+        sign = self.polarity
+        alter = {self.device_model: self.model_alterations(params)}
+        jobs = []
+        for start in range(0, spec.samples, MC_SAMPLES_PER_JOB):
+            count = min(MC_SAMPLES_PER_JOB, spec.samples - start)
+            lines = []
+            lines.append("* BSIM4 Monte Carlo Mismatch Testbench")
+            lines.append("* Constant Current Vth Extraction: Id > 140nA * W/L")
+            lines.append(f"* Samples: {start}..{start + count - 1} of {spec.samples} (seed {spec.seed})")
+            lines.append("")
+            lines.append(f".temp {spec.temp}")
+            lines.append("")
+            lines.append(f".include {os.path.abspath(self.model_lib_file)}")
+            lines.append("")
+            lines.append("* Test circuits")
+            for k in range(count):
+                mismatch = f"delvto={delvto[start + k]:.6e} mulu0={mulu0[start + k]:.6e}"
+                lines.append(f"M{k}v d{k}v g1 0 0 {self.device_model} L={spec.length} W={spec.width} {mismatch}")
+                lines.append(f"M{k}i d{k}i g2 0 0 {self.device_model} L={spec.length} W={spec.width} {mismatch}")
+                lines.append(f"Vd{k}v d{k}v 0 {sign * LINEAR_VDS}")
+                lines.append(f"Vd{k}i d{k}i 0 {sign * spec.vdd}")
+            lines.append("")
+            lines.append("Vgs1 g1 0 0")
+            lines.append(f"Vgs2 g2 0 {sign * spec.vdd}")
+            lines.append("")
+            lines.append(".end")
+            
+            lin_vectors = {'vgs': self.gate_vector('g1')}
+            lin_vectors.update({f'id{k}': f'abs(i(Vd{k}v))' for k in range(count)})
+            sat_vectors = {'vgs': self.gate_vector('g2')}
+            sat_vectors.update({f'id{k}': f'abs(i(Vd{k}i))' for k in range(count)})
+            analyses = [
+                Analysis('lin', self.gate_sweep('Vgs1', spec.vdd), lin_vectors),
+                Analysis('sat', self.gate_sweep('Vgs2', spec.vdd), sat_vectors)
+            ]
+            jobs.append(SimulationJob(circuit=lines, alter=alter, analyses=analyses))
+        return jobs
     
-    def create_netlist_content(self, spec: BSIM4TargetSpec, threshold_current: float) -> str:
+    def generate_side_by_side_netlist(self, params_list: List[BSIM4Parameters],
+                                      spec: BSIM4TargetSpec) -> SimulationJob:
+        # one model copy per parameter set, each with its own Vth and Ion device on the
+        # shared gate sweeps, so all sets cost a single simulator run
+        card = self.get_model_card()
+        if card is None:
+            raise ValueError(f"Model {self.device_model} not found in {self.model_lib_file}")
         lines = []
-        
-        lines.append("* BSIM4 Characterization Testbench")
+        lines.append("* BSIM4 Side-by-Side Testbench")
         lines.append("* Constant Current Vth Extraction: Id > 140nA * W/L")
-        lines.append(f"* Threshold current: {threshold_current:.2e}A")
+        lines.append(f"* Parameter sets: {len(params_list)}")
         lines.append("")
         lines.append(f".temp {spec.temp}")
         lines.append("")
-        lines.append(".include models.lib")
+        lines.append(f".include {os.path.abspath(self.model_lib_file)}")
         lines.append("")
+        
+        alter = {}
+        for k, params in enumerate(params_list):
+            model_name = f"{self.device_model}_set{k}"
+            lines.extend(card.to_spice(name=model_name).splitlines())
+            alter[model_name] = self.model_alterations(params)
+        lines.append("")
+        
         lines.append("* Test circuits")
-        lines.append(f"M1 d1 g1 0 0 {self.device_model} L={spec.length} W={spec.width}")
-        lines.append(f"M2 d2 g2 0 0 {self.device_model} L={spec.length} W={spec.width}")
+        sign = self.polarity
+        for k in range(len(params_list)):
+            model_name = f"{self.device_model}_set{k}"
+            lines.append(f"M{k}v d{k}v g1 0 0 {model_name} L={spec.length} W={spec.width}")
+            lines.append(f"M{k}i d{k}i g2 0 0 {model_name} L={spec.length} W={spec.width}")
+            lines.append(f"Vd{k}v d{k}v 0 {sign * LINEAR_VDS}")
+            lines.append(f"Vd{k}i d{k}i 0 {sign * spec.vdd}")
         lines.append("")
         lines.append("Vgs1 g1 0 0")
-        lines.append("Vds1 d1 0 0.1")
-        lines.append(f"Vgs2 g2 0 {spec.vdd}")
-        lines.append(f"Vds2 d2 0 {spec.vdd}")
-        lines.append("")
-        lines.append(".control")
-        lines.append("* Vth extraction using constant current method")
-        lines.append(f"dc Vgs1 0 {spec.vdd} 0.02")
+        lines.append(f"Vgs2 g2 0 {sign * spec.vdd}")
         lines.append("")
-        lines.append("* Find Vth where Id > threshold")
-        lines.append(f"let threshold = {threshold_current}")
-        lines.append("let id_current = abs(i(Vds1))")
-        lines.append("let vth_extracted = 0.35")
-        lines.append("")
-        lines.append("* Use meas for vth extraction")
-        lines.append("meas dc vth_temp when id_current=threshold")
-        lines.append("let vth_extracted = $&vth_temp")
-        lines.append("echo $&vth_extracted > vth_result.txt")
+        lines.append(".end")
+        
+        lin_vectors = {'vgs': self.gate_vector('g1')}
+        lin_vectors.update({f'id{k}': f'abs(i(Vd{k}v))' for k in range(len(params_list))})
+        sat_vectors = {'vgs': self.gate_vector('g2')}
+        sat_vectors.update({f'id{k}': f'abs(i(Vd{k}i))' for k in range(len(params_list))})
+        analyses = [
+            Analysis('lin', self.lin_sweep('Vgs1', spec, params_list), lin_vectors),
+            Analysis('sat', self.gate_sweep('Vgs2', spec.vdd), sat_vectors)
+        ]
+        return SimulationJob(circuit=lines, alter=alter, analyses=analyses)
+    
+    def create_netlist_content(self, spec: BSIM4TargetSpec, threshold_current: float) -> List[str]:
+        lines = []
+        
+        lines.append("* BSIM4 Characterization Testbench")
+        lines.append("* Constant Current Vth Extraction: Id > 140nA * W/L")
+        lines.append(f"* Threshold current: {threshold_current:.2e}A")
         lines.append("")
-        lines.append("* Ion measurement")
-        lines.append("op")
-        lines.append("let ion_current = abs(i(Vds2))")
-        lines.append(f"let width_microns = {spec.width * 1e6}")
-        lines.append("let ion_normalized = ion_current / width_microns")
+        lines.append(f".temp {spec.temp}")
         lines.append("")
-        lines.append("echo $&ion_normalized > ion_result.txt")
+        lines.append(f".include {os.path.abspath(self.model_lib_file)}")
         lines.append("")
-        lines.append("* Debug output")
-        lines.append("print threshold")
-        lines.append("print vth_extracted")
-        lines.append("print ion_normalized")
+        lines.append("* Test circuits")
+        lines.append(f"M1 d1 g1 0 0 {self.device_model} L={spec.length} W={spec.width}")
+        lines.append(f"M2 d2 g2 0 0 {self.device_model} L={spec.length} W={spec.width}")
         lines.append("")
-        lines.append("quit")
-        lines.append(".endc")
+        sign = self.polarity
+        lines.append("Vgs1 g1 0 0")
+        lines.append(f"Vds1 d1 0 {sign * LINEAR_VDS}")
+        lines.append(f"Vgs2 g2 0 {sign * spec.vdd}")
+        lines.append(f"Vds2 d2 0 {sign * spec.vdd}")
         lines.append("")
         lines.append(".end")
         
-        return "\n".join(lines)
+        return lines
     
-    def run_simulation(self, params: BSIM4Parameters, spec: BSIM4TargetSpec) -> Dict[str, float]:
-        netlist = self.generate_testbench_netlist(params, spec)
-        
-        netlist_file = os.path.join(self.temp_dir, "testbench.cir")
-        with open(netlist_file, 'w') as f:
-            f.write(netlist)
+    def create_analyses(self, spec: BSIM4TargetSpec, params_list: List[BSIM4Parameters], prefix: str = "",
+                        setup: Optional[List[str]] = None) -> List[Analysis]:
+        analyses = [
+            # linear Id-Vgs sweep: constant current Vth, max-gm Vth, SS
+            Analysis(f'{prefix}lin', self.lin_sweep('Vgs1', spec, params_list, prefix), {'vgs': self.gate_vector('g1'), 'id': 'abs(i(Vds1))'},
+                     setup=list(setup or [])),
+            # saturation Id-Vgs sweep: Ion, Ioff, DIBL
+            Analysis(f'{prefix}sat', self.gate_sweep('Vgs2', spec.vdd), {'vgs': self.gate_vector('g2'), 'id': 'abs(i(Vds2))'})
+        ]
+        if 'rout' in spec.metric_names():
+            # output sweep at Vgs = VDD, only simulated when Rout is a target
+            sign = self.polarity
+            analyses.append(Analysis(f'{prefix}out', f"dc Vds2 {sign * (spec.vdd - 0.1):.6g} {sign * spec.vdd:.6g} {sign * 0.05}",
+                                     {'vds': self.gate_vector('d2'), 'id': 'abs(i(Vds2))'},
+                                     setup=[f"alter Vgs2 dc = {sign * spec.vdd}"]))
+        return analyses
+    
+    def gate_sweep(self, source: str, vdd: float) -> str:
+        # 0..VDD for NMOS, 0..-VDD for PMOS
+        sign = self.polarity
+        return f"dc {source} 0 {sign * vdd} {sign * 0.02}"
+    
+    def lin_sweep(self, source: str, spec: BSIM4TargetSpec, params_list: List[BSIM4Parameters],
+                  prefix: str = "") -> str:
+        # Vth sweep: in adaptive mode a fine window around the last Vth of this target,
+        # the full gate sweep for the first iteration (the coarse search) and otherwise
+        bracket = self.vth_brackets.get(prefix) if self.adaptive_sweep(spec) else None
+        if bracket is None:
+            return self.gate_sweep(source, spec.vdd)
+        # Vth follows vth0 about one to one, so the window moves with each set's vth0
+        vth, vth0 = bracket
+        centers = [vth + abs(params.vth0) - vth0 for params in params_list]
+        low = min(centers) - ADAPTIVE_WINDOW
+        high = max(centers) + ADAPTIVE_WINDOW
+        if low <= 0 or high > spec.vdd:
+            # the window would be cut off at 0V or VDD
+            return self.gate_sweep(source, spec.vdd)
+        sign = self.polarity
+        return f"dc {source} {sign * low:.6g} {sign * high:.6g} {sign * ADAPTIVE_STEP:.6g}"
+    
+    def adaptive_sweep(self, spec: TargetSpec) -> bool:
+        # single and corner targets whose linear sweep is only needed for Vth
+        # (the max-gm Vth, SS, gm and Id,lin need the whole sweep)
+        if self.sweep != 'adaptive' or isinstance(spec, (BSIM4StatisticalSpec, BSIM4GeometrySpec)):
+            return False
+        return not any(METRICS[name].analysis == 'lin'
+                       for _, target, _ in self.named_targets(spec) for name in target.metric_names())
+    
+    def update_vth_brackets(self, params: BSIM4Parameters, results: Dict, spec: TargetSpec):
+        # the adaptive sweeps of the next iteration are centered on this iteration's Vth
+        if not self.adaptive_sweep(spec):
+            return
+        if 'vth' in results:
+            self.vth_brackets[""] = (abs(results['vth']), abs(params.vth0))
+        else:
+            for name, corner_results in results.items():
+                self.vth_brackets[f"{name}_"] = (abs(corner_results['vth']), abs(params.vth0))
+    
+    @contextlib.contextmanager
+    def full_sweeps(self):
+        # netlists built inside sweep the whole gate range
+        brackets, self.vth_brackets = self.vth_brackets, {}
+        try:
+            yield
+        finally:
+            self.vth_brackets = brackets
+    
+    def missed_window(self, results, spec: TargetSpec) -> bool:
+        # a failed windowed sweep: Vth may have left the window, the full sweep decides
+        return bool(self.vth_brackets) and self.adaptive_sweep(spec) and self.simulation_failed(results)
+    
+    def sweep_key(self, params_list: List[BSIM4Parameters], spec: TargetSpec) -> Dict[str, List[str]]:
+        # the linear sweeps a netlist of these parameters gets right now: a window depends
+        # on the run's last Vth, so its bounds and step are part of the cache key.
+        # Full sweeps keep the keys they had before adaptive sweeps
+        if not self.vth_brackets or not self.adaptive_sweep(spec):
+            return {}
+        if isinstance(spec, BSIM4MultiTargetSpec):
+            targets = [(f"{corner.name}_", corner.target) for corner in spec.corners]
+        else:
+            targets = [("", spec)]
+        sweeps = [self.lin_sweep('Vgs1', target, params_list, prefix) for prefix, target in targets]
+        if sweeps == [self.gate_sweep('Vgs1', target.vdd) for _, target in targets]:
+            return {}
+        return {'sweep': sweeps}
+    
+    def gate_vector(self, node: str) -> str:
+        # bias magnitude, so the extraction sees ascending sweeps for both polarities
+        return f'v({node})' if self.polarity > 0 else f'abs(v({node}))'
+    
+    def build_simulation_job(self, params, spec: TargetSpec) -> SimulationJob:
+        if isinstance(spec, BSIM4MultiTargetSpec):
+            return self.generate_corner_netlist(params, spec)
+        if isinstance(spec, BSIM4GeometrySpec):
+            return self.generate_geometry_netlist(params, spec)
+        return self.generate_testbench_netlist(params, spec)
+    
+    def build_simulation_jobs(self, params, spec: TargetSpec) -> List[SimulationJob]:
+        # all jobs of one candidate: several for Monte Carlo specs, one otherwise
+        if isinstance(spec, BSIM4StatisticalSpec):
+            return self.generate_statistical_netlists(params, spec)
+        return [self.build_simulation_job(params, spec)]
+    
+    def extract_job_results(self, vectors_list: List[Dict[str, Dict[str, List[float]]]], spec: TargetSpec):
+        if isinstance(spec, BSIM4StatisticalSpec):
+            return self.extract_statistical_results(vectors_list, spec)
+        return self.extract_results(vectors_list[0], spec)
+    
+    def extract_statistical_results(self, vectors_list: List[Dict[str, Dict[str, List[float]]]],
+                                    spec: BSIM4StatisticalSpec) -> Dict[str, float]:
+        # metrics of all samples in one vectorized pass, then mean/sigma/±3 sigma points
+        try:
+            id_lin = np.concatenate([np.array([vectors['lin'][f'id{k}'] for k in range(len(vectors['lin']) - 1)])
+                                     for vectors in vectors_list])
+            id_sat = np.concatenate([np.array([vectors['sat'][f'id{k}'] for k in range(len(vectors['sat']) - 1)])
+                                     for vectors in vectors_list])
+            metrics = self.signed(iv_metric_arrays(vectors_list[0]['lin']['vgs'], id_lin, vectors_list[0]['sat']['vgs'],
+                                                   id_sat, LINEAR_VDS, spec.vdd, spec.width, spec.length,
+                                                   spec.metric_names()))
+        except Exception as e:
+            print(f"Error parsing results: {e}")
+            return self.failed_results(spec)
         
-        #print(f"DEBUG: Netlist file: {netlist_file}")
+        valid = np.isfinite(metrics['vth']) & np.isfinite(metrics['ion'])
+        if valid.sum() < max(2, MC_MIN_VALID * len(valid)):
+            print(f"WARNING: Vth not found for {len(valid) - valid.sum()} of {len(valid)} Monte Carlo samples")
+            return self.failed_results(spec)
         
-        try:
-            cmd = ["ngspice", "-b", netlist_file]
-            result = subprocess.run(cmd, capture_output=True, text=True, 
-                                  cwd=self.temp_dir, timeout=30)
+        results = {}
+        for name, values in metrics.items():
+            finite = values[valid & np.isfinite(values)]
+            results[name] = float(finite.mean()) if len(finite) else float('nan')
+        for name in ('vth', 'ion'):
+            values = metrics[name][valid]
+            results[f'{name}_sigma'] = float(np.std(values, ddof=1))
+            low, high = np.percentile(values, [0.135, 99.865])
+            results[f'{name}_low'] = float(low)
+            results[f'{name}_high'] = float(high)
+        results['samples'] = int(valid.sum())
+        unmeasured = [name for name in spec.metric_names() if not np.isfinite(results[name])]
+        if unmeasured:
+            print(f"WARNING: could not measure {', '.join(unmeasured)}")
+            return self.failed_results(spec)
+        return results
+    
+    def extract_results(self, vectors: Dict[str, Dict[str, List[float]]], spec: TargetSpec):
+        if isinstance(spec, BSIM4MultiTargetSpec):
+            return {corner.name: self.parse_simulation_results(vectors, corner.target, prefix=f"{corner.name}_")
+                    for corner in spec.corners}
+        if isinstance(spec, BSIM4GeometrySpec):
+            results = {}
+            for i, (name, target, _) in enumerate(spec.named_targets()):
+                bin_vectors = {'lin': {'vgs': vectors['lin']['vgs'], 'id': vectors['lin'][f'id{i}']},
+                               'sat': {'vgs': vectors['sat']['vgs'], 'id': vectors['sat'][f'id{i}']}}
+                results[name] = self.parse_simulation_results(bin_vectors, target)
+            return results
+        return self.parse_simulation_results(vectors, spec)
+    
+    def failed_results(self, spec: TargetSpec):
+        if isinstance(spec, CompositeTargetSpec):
+            return {name: {'vth': 0, 'ion': 0} for name, _, _ in spec.named_targets()}
+        return {'vth': 0, 'ion': 0}
+    
+    def simulation_failed(self, results) -> bool:
+        if 'vth' in results:
+            return results['vth'] == 0 or results['ion'] == 0
+        return any(self.simulation_failed(corner_results) for corner_results in results.values())
+    
+    def simulation_cache_key(self, params: BSIM4Parameters, spec: TargetSpec) -> str:
+        return self.cache.make_key(
+            params=params.to_dict(),
+            spec=netlist_spec(spec),
+            model_file=file_digest(self.model_lib_file),
+            device_model=self.device_model,
+            backend=self.backend.name,
+            extraction=EXTRACTION_VERSION,
+            **self.sweep_key([params], spec)
+        )
+    
+    def cached_results(self, params: BSIM4Parameters, spec: TargetSpec) -> Tuple[Optional[str], Optional[Dict]]:
+        if self.cache is None:
+            return None, None
+        with self.telemetry.span("cache_lookup") as record:
+            try:
+                key = self.simulation_cache_key(params, spec)
+            except OSError as e:
+                print(f"Warning: could not hash model library: {e}")
+                return None, None
+            cached = self.cache.get(key)
+            record.set(hit=cached is not None)
+        return key, cached
+    
+    def store_results(self, key: Optional[str], results: Dict):
+        # failed simulations are never cached
+        if key is not None and not self.simulation_failed(results):
+            self.cache.put(key, results)
+    
+    def emit(self, kind: str, **data):
+        if self.event_callback is not None:
+            self.event_callback(CenteringEvent(kind, data))
+    
+    def cancel(self):
+        # safe to call from any thread: stops the running simulations and the optimization loop
+        self.cancel_event.set()
+        if self.shared_pool:
+            # the simulators serve other runs too: only our queued jobs are dropped
+            return
+        if self._backend is not None:
+            self._backend.cancel()
+        if self.simulation_pool is not None:
+            self.simulation_pool.cancel()
+    
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise CenteringCancelled("Centering cancelled")
+    
+    def run_simulation(self, params: BSIM4Parameters, spec: TargetSpec) -> Dict:
+        # single spec: {'vth', 'ion'}; multi-corner spec: {corner name: {'vth', 'ion'}}
+        self.check_cancelled()
+        if isinstance(spec, BSIM4StatisticalSpec):
+            # the sample netlists of one candidate run in parallel on the pool
+            return self.run_simulations_batch([params], spec)[0]
+        with self.telemetry.span("simulation", backend=self.backend.name) as record:
+            key, cached = self.cached_results(params, spec)
+            record.set(cached=cached is not None)
+            if cached is not None:
+                return cached
             
-            #print(f"DEBUG: ngspice return code: {result.returncode}")
-            #print(f"DEBUG: ngspice stdout: {result.stdout}")
-            if result.stderr:
-                print(f"DEBUG: ngspice stderr: {result.stderr}")
+            with self.telemetry.span("netlist"):
+                job = self.build_simulation_job(params, spec)
+            self.simulation_count += 1
             
-            vth_file = os.path.join(self.temp_dir, "vth_result.txt")
-            ion_file = os.path.join(self.temp_dir, "ion_result.txt")
-            #print(f"DEBUG: vth_result.txt exists: {os.path.exists(vth_file)}")
-            #print(f"DEBUG: ion_result.txt exists: {os.path.exists(ion_file)}")
+            try:
+                vectors = self.run_job(job)
+            except SimulationError as e:
+                # a shared backend may be cancelled by another run, only our own cancel stops us
+                self.check_cancelled()
+                print(f"Simulation error: {e}")
+                record.set(failed=True, error=str(e))
+                return self.failed_results(spec)
+            except Exception as e:
+                print(f"Simulation failed: {e}")
+                record.set(failed=True, error=str(e))
+                return self.failed_results(spec)
             
-            if result.returncode != 0:
-                print(f"Simulation error: {result.stderr}")
-                return {'vth': 0, 'ion': 0}
+            with self.telemetry.span("extract"):
+                results = self.extract_results(vectors, spec)
+            if self.missed_window(results, spec):
+                print("Vth not found in the adaptive sweep window, repeating with the full sweep")
+                with self.full_sweeps():
+                    return self.run_simulation(params, spec)
+            record.set(failed=self.simulation_failed(results))
+            self.store_results(key, results)
+            return results
+    
+    def run_job(self, job: SimulationJob) -> Dict[str, Dict[str, List[float]]]:
+        # on a shared pool (batch, GUI jobs) every worker has its own simulator session,
+        # so runs simulate in parallel instead of queueing on this process's session
+        if not self.shared_pool:
+            return self.backend.run(job, self.temp_dir)
+        outcome = self.simulation_pool.run([job], cancelled=self.cancel_event.is_set)[0]
+        if isinstance(outcome, Exception):
+            self.check_cancelled()
+            raise outcome
+        return outcome
+    
+    def run_simulations_batch(self, params_list: List[BSIM4Parameters], spec: TargetSpec) -> List[Dict]:
+        self.check_cancelled()
+        if self.simulation_pool is None:
+            self.simulation_pool = SimulationPool(self.backend, workers=self.workers, executor=self.executor)
+        
+        with self.telemetry.span("simulation_batch", candidates=len(params_list),
+                                 executor=self.simulation_pool.executor_kind) as record:
+            return self.simulate_batch(params_list, spec, record)
+    
+    def simulate_batch(self, params_list: List[BSIM4Parameters], spec: TargetSpec, record) -> List[Dict]:
+        results = []
+        keys = []
+        pending = []
+        for params in params_list:
+            key, cached = self.cached_results(params, spec)
+            results.append(cached)
+            keys.append(key)
+            if cached is None:
+                pending.append(len(results) - 1)
+        
+        with self.telemetry.span("netlist", jobs=len(pending)):
+            job_lists = [self.build_simulation_jobs(params_list[i], spec) for i in pending]
+        jobs = [job for job_list in job_lists for job in job_list]
+        self.simulation_count += len(pending)
+        record.set(jobs=len(jobs))
+        
+        outcomes = self.simulation_pool.run(jobs, cancelled=self.cancel_event.is_set)
+        self.check_cancelled()
+        failures = 0
+        with self.telemetry.span("extract", jobs=len(jobs)):
+            start = 0
+            for i, job_list in zip(pending, job_lists):
+                candidate = outcomes[start:start + len(job_list)]
+                start += len(job_list)
+                errors = [outcome for outcome in candidate if isinstance(outcome, Exception)]
+                if errors:
+                    print(f"Simulation error: {errors[0]}")
+                    results[i] = self.failed_results(spec)
+                    failures += 1
+                else:
+                    results[i] = self.extract_job_results(candidate, spec)
+                    self.store_results(keys[i], results[i])
+        missed = [i for i in pending if self.missed_window(results[i], spec)]
+        if missed:
+            print(f"Vth not found in the adaptive sweep window of {len(missed)} candidates, repeating with the full sweep")
+            with self.full_sweeps():
+                repeated = self.simulate_batch([params_list[i] for i in missed], spec, record)
+            for i, candidate_results in zip(missed, repeated):
+                results[i] = candidate_results
+            failures = sum(self.simulation_failed(results[i]) for i in pending)
+        record.set(failed=failures)
+        return results
+    
+    @staticmethod
+    def side_by_side_supported(spec: TargetSpec) -> bool:
+        # single nominal targets; Rout needs an output sweep of its own per device
+        return type(spec) is BSIM4TargetSpec and 'rout' not in spec.metric_names()
+    
+    def run_side_by_side(self, params_list: List[BSIM4Parameters], spec: BSIM4TargetSpec) -> List[Dict]:
+        # results of every parameter set from one simulation (not cached per set)
+        self.check_cancelled()
+        with self.telemetry.span("side_by_side", candidates=len(params_list), backend=self.backend.name) as record:
+            with self.telemetry.span("netlist"):
+                job = self.generate_side_by_side_netlist(params_list, spec)
+            self.simulation_count += 1
             
-            return self.parse_simulation_results()
+            try:
+                vectors = self.run_job(job)
+            except SimulationError as e:
+                self.check_cancelled()
+                print(f"Simulation error: {e}")
+                record.set(failed=True, error=str(e))
+                return [self.failed_results(spec) for _ in params_list]
+            except Exception as e:
+                print(f"Simulation failed: {e}")
+                record.set(failed=True, error=str(e))
+                return [self.failed_results(spec) for _ in params_list]
             
-        except subprocess.TimeoutExpired:
-            print("Simulation timeout")
-            return {'vth': 0, 'ion': 0}
+            with self.telemetry.span("extract"):
+                results = self.extract_side_by_side_results(vectors, spec, len(params_list))
+            if any(self.missed_window(r, spec) for r in results):
+                print("Vth not found in the adaptive sweep window, repeating with the full sweep")
+                with self.full_sweeps():
+                    return self.run_side_by_side(params_list, spec)
+            record.set(failed=sum(self.simulation_failed(r) for r in results))
+            return results
+    
+    def extract_side_by_side_results(self, vectors: Dict[str, Dict[str, List[float]]], spec: BSIM4TargetSpec,
+                                     count: int) -> List[Dict[str, float]]:
+        try:
+            id_lin = np.array([vectors['lin'][f'id{k}'] for k in range(count)])
+            id_sat = np.array([vectors['sat'][f'id{k}'] for k in range(count)])
+            metrics = self.signed(iv_metric_arrays(vectors['lin']['vgs'], id_lin, vectors['sat']['vgs'], id_sat,
+                                                   LINEAR_VDS, spec.vdd, spec.width, spec.length,
+                                                   spec.metric_names()))
         except Exception as e:
-            print(f"Simulation failed: {e}")
-            return {'vth': 0, 'ion': 0}
+            print(f"Error parsing results: {e}")
+            return [self.failed_results(spec) for _ in range(count)]
+        
+        results = []
+        for k in range(count):
+            values = {name: float(array[k]) for name, array in metrics.items()}
+            if not all(np.isfinite(values[name]) for name in ['vth', 'ion'] + spec.metric_names()):
+                values = self.failed_results(spec)
+            results.append(values)
+        return results
+    
+    def sensitivity_analysis(self, params: Optional[BSIM4Parameters] = None,
+                             spec: Optional[BSIM4TargetSpec] = None) -> Dict[str, Dict[str, float]]:
+        # normalized sensitivities of every measured metric to every tunable parameter,
+        # from one side-by-side simulation; cached per operating point (parameters and bias)
+        params = self.fill_tunables(params if params is not None else self.current_params)
+        spec = spec if spec is not None else self.target_spec
+        if spec is None or not self.side_by_side_supported(spec):
+            raise ValueError("Sensitivities need a single nominal target without a Rout metric")
+        tunables = self.active_tunables()
+        params_list = [params] + [params.updated({t.name: perturbed_value(t, params.get(t.name))})
+                                  for t in tunables]
+        
+        key = None
+        if self.cache is not None:
+            try:
+                key = self.cache.make_key(kind='sensitivity', params=[p.to_dict() for p in params_list],
+                                          spec=netlist_spec(spec), model_file=file_digest(self.model_lib_file),
+                                          device_model=self.device_model, backend=self.backend.name,
+                                          extraction=EXTRACTION_VERSION, **self.sweep_key(params_list, spec))
+            except OSError as e:
+                print(f"Warning: could not hash model library: {e}")
+            cached = self.cache.get(key) if key is not None else None
+            if cached is not None:
+                self.sensitivities = cached
+                return cached
+        
+        with self.telemetry.span("sensitivity", parameters=len(tunables)):
+            results = self.run_side_by_side(params_list, spec)
+        if self.simulation_failed(results[0]):
+            print("WARNING: sensitivity analysis failed at the nominal point")
+            return {}
+        table = normalized_sensitivities(params_list, results, [t.name for t in tunables])
+        if key is not None:
+            self.cache.put(key, table)
+        self.sensitivities = table
+        return table
     
-    def parse_simulation_results(self) -> Dict[str, float]:
+    def print_sensitivities(self, table: Dict[str, Dict[str, float]]):
+        print("Normalized sensitivities (dM/M per dp/p):")
+        for line in format_sensitivities(table):
+            print(f"  {line}")
+    
+    def parse_simulation_results(self, vectors: Dict[str, Dict[str, List[float]]],
+                                 spec: BSIM4TargetSpec, prefix: str = "") -> Dict[str, float]:
         results = {'vth': 0, 'ion': 0}
         
         try:
-            vth_file = os.path.join(self.temp_dir, "vth_result.txt")
-            if os.path.exists(vth_file):
-                with open(vth_file, 'r') as f:
-                    vth_content = f.read().strip()
-                    #print(f"DEBUG: vth_result.txt content: '{vth_content}'")
-                    if vth_content and vth_content != '':
-                        try:
-                            results['vth'] = float(vth_content)
-                        except ValueError:
-                            print(f"WARNING: Could not convert vth '{vth_content}' to float")
-                            results['vth'] = 0.35
-                    else:
-                        print("WARNING: Vth result is empty, using default 0.35")
-                        results['vth'] = 0.35
-            
-            ion_file = os.path.join(self.temp_dir, "ion_result.txt")
-            if os.path.exists(ion_file):
-                with open(ion_file, 'r') as f:
-                    ion_content = f.read().strip()
-                    #print(f"DEBUG: ion_result.txt content: '{ion_content}'")
-                    if ion_content and ion_content != '':
-                        try:
-                            results['ion'] = float(ion_content)
-                        except ValueError:
-                            print(f"WARNING: Could not convert ion '{ion_content}' to float")
-                            results['ion'] = 0
-                    
+            lin = vectors[f'{prefix}lin']
+            sat = vectors[f'{prefix}sat']
+            results = extract_iv_metrics(lin['vgs'], lin['id'], sat['vgs'], sat['id'],
+                                         LINEAR_VDS, spec.vdd, spec.width, spec.length, spec.metric_names())
+            if 'rout' in spec.metric_names():
+                out = vectors[f'{prefix}out']
+                results['rout'] = float(output_resistance(out['vds'], out['id'], spec.width))
+            results = self.signed(results)
         except Exception as e:
             print(f"Error parsing results: {e}")
+            return {'vth': 0, 'ion': 0}
         
-        #print(f"DEBUG: Final parsed results: vth={results['vth']}, ion={results['ion']}")
+        unmeasured = [name for name in spec.metric_names() if not np.isfinite(results[name])]
+        if unmeasured:
+            print(f"WARNING: could not measure {', '.join(unmeasured)}")
+            return {'vth': 0, 'ion': 0}
+        
+        # no fallback value: a sweep without a crossing is a failed simulation
+        if np.isnan(results['vth']):
+            print(f"WARNING: Id never crosses the threshold current {threshold_current(spec.width, spec.length):.2e}A "
+                  f"in the {lin['vgs'][0]:.3g}..{lin['vgs'][-1]:.3g}V sweep, Vth not found")
+            results['vth'] = 0
+        if np.isnan(results['ion']):
+            results['ion'] = 0
         return results
     
-    def calculate_error(self, current_specs: Dict[str, float], target_spec: BSIM4TargetSpec) -> float:
-        if current_specs['vth'] == 0 or current_specs['ion'] == 0:
+    def signed(self, metrics: Dict) -> Dict:
+        # extraction works on magnitudes, PMOS threshold voltages are reported negative
+        if self.polarity > 0:
+            return metrics
+        return {name: -value if name in SIGNED_METRICS else value for name, value in metrics.items()}
+    
+    def calculate_error(self, current_specs: Dict, target_spec: TargetSpec) -> float:
+        if self.simulation_failed(current_specs):
             return float('inf')
         
-        vth_error = abs((current_specs['vth'] - target_spec.vth) / target_spec.vth)
-        ion_error = abs((current_specs['ion'] - target_spec.ion) / target_spec.ion)
+        if isinstance(target_spec, CompositeTargetSpec):
+            # weighted mean over all corners / geometries
+            targets = target_spec.named_targets()
+            total_weight = sum(weight for _, _, weight in targets)
+            return sum(weight * self.calculate_error(current_specs[name], target)
+                       for name, target, weight in targets) / total_weight
         
-        total_error = (vth_error + ion_error) / 2
+        # weighted mean of the absolute errors, (|vth error| + |ion error|) / 2 without metric targets
+        errors = target_spec.metric_errors(current_specs)
+        total_error = sum(weight * abs(error) for weight, error in errors) / sum(weight for weight, _ in errors)
         return total_error
     
-    def optimize_parameters(self, target_spec: BSIM4TargetSpec, max_iterations: int = 5) -> bool:
+    def print_target(self, target_spec: TargetSpec):
+        if isinstance(target_spec, CompositeTargetSpec):
+            for name, spec, weight in target_spec.named_targets():
+                print(f"Target [{target_spec.describe(name)}]: Vth={spec.vth:.3f}V, Ion={spec.ion:.2e}A/um "
+                      f"(weight {weight:g})")
+        else:
+            print(f"Target: Vth={target_spec.vth:.3f}V, Ion={target_spec.ion:.2e}A/um")
+            for metric in target_spec.metrics:
+                print(f"Target: {metric.name}={metric.value:.4g}{METRICS[metric.name].unit} (weight {metric.weight:g})")
+            print(f"Dimensions: L={target_spec.length*1e6:.0f}nm, W={target_spec.width*1e6:.0f}nm")
+            if isinstance(target_spec, BSIM4StatisticalSpec):
+                print(f"Monte Carlo: mean of {target_spec.samples} mismatch samples "
+                      f"(σvth0={target_spec.sigma_vth0*1000:.1f}mV, σu0={target_spec.sigma_u0*100:.1f}%)")
+    
+    def print_results(self, current_specs: Dict, target_spec: TargetSpec):
+        if isinstance(target_spec, CompositeTargetSpec):
+            for name, target, _ in target_spec.named_targets():
+                print(f"  [{name}] ", end="")
+                self.print_results(current_specs[name], target)
+            return
+        
+        vth_error = abs((current_specs['vth'] - target_spec.vth) / target_spec.vth) * 100
+        ion_error = abs((current_specs['ion'] - target_spec.ion) / target_spec.ion) * 100
+        print(f"Current: Vth={current_specs['vth']:.3f}V ({vth_error:.1f}% error), Ion={current_specs['ion']:.2e}A/um ({ion_error:.1f}% error)")
+        for metric in target_spec.metrics:
+            print(f"  {metric.name}={current_specs[metric.name]:.4g}{METRICS[metric.name].unit} "
+                  f"({self.format_metric_error(metric, current_specs[metric.name])})")
+        if 'vth_sigma' in current_specs:
+            print(f"  σVth={current_specs['vth_sigma']*1000:.1f}mV, "
+                  f"σIon={current_specs['ion_sigma']/current_specs['ion']*100:.1f}% ({current_specs['samples']} samples)")
+    
+    @staticmethod
+    def format_metric_error(metric: MetricTarget, value: float) -> str:
+        error = metric.error(value)
+        return f"{error:+.2f} dec error" if METRICS[metric.name].log_scale else f"{abs(error)*100:.1f}% error"
+    
+    def optimize_parameters(self, target_spec: TargetSpec, max_iterations: int = 5,
+                            tolerance: float = 0.05, checkpoint: Optional[str] = None, resume: bool = False) -> bool:
+        # checkpoint: file the run state is written to after every iteration;
+        # resume=True continues from it instead of starting over (see checkpoint.py)
         self.target_spec = target_spec
+        self.optimizer.set_parameters(self.active_tunables())
+        self.optimizer.reset()
+        self.cancel_event.clear()
+        self.vth_brackets = {}
+        self.ion_sensitivity_point = None
         
         print("\n" + "="*60)
         print("BSIM4 Parameter Optimization (Constant Current Method)")
         print("="*60)
-        print(f"Target: Vth={target_spec.vth:.3f}V, Ion={target_spec.ion:.2e}A/um")
+        self.print_target(target_spec)
         print(f"Device: {self.device_model}")
-        print(f"Dimensions: L={target_spec.length*1e6:.0f}nm, W={target_spec.width*1e6:.0f}nm")
+        print(f"Optimizer: {self.optimizer.name}")
+        if self.adaptive_sweep(target_spec):
+            print(f"Vth sweep: adaptive (±{ADAPTIVE_WINDOW * 1000:.0f}mV window, {ADAPTIVE_STEP * 1000:g}mV steps)")
         
-        best_error = float('inf')
-        best_params = None
+        if isinstance(target_spec, CompositeTargetSpec) and not self.optimizer.supports_multi_target:
+            print(f"ERROR: the {self.optimizer.name} optimizer cannot center multiple targets")
+            return False
         
-        for iteration in range(max_iterations):
-            print(f"\n--- Iteration {iteration + 1}/{max_iterations} ---")
-            
-            current_specs = self.run_simulation(self.current_params, target_spec)
-            
-            if current_specs['vth'] == 0 or current_specs['ion'] == 0:
-                print("Simulation failed, trying next iteration...")
-                continue
-            
-            error = self.calculate_error(current_specs, target_spec)
-            vth_error = abs((current_specs['vth'] - target_spec.vth) / target_spec.vth) * 100
-            ion_error = abs((current_specs['ion'] - target_spec.ion) / target_spec.ion) * 100
-            
-            if error < best_error:
-                best_error = error
-                best_params = BSIM4Parameters(
-                    vth0=self.current_params.vth0,
-                    vsat=self.current_params.vsat,
-                    u0=self.current_params.u0,
-                    toxe=self.current_params.toxe
-                )
-            
-            log_entry = {
-                'iteration': iteration,
-                'params': self.current_params.to_dict().copy(),
-                'specs': current_specs.copy(),
-                'error': error
-            }
-            self.iteration_log.append(log_entry)
-            
-            print(f"Current: Vth={current_specs['vth']:.3f}V ({vth_error:.1f}% error), Ion={current_specs['ion']:.2e}A/um ({ion_error:.1f}% error)")
-            print(f"Overall Error: {error:.4f} (Best: {best_error:.4f})")
-            
-            if error < 0.05:
-                print("✅ Converged!")
-                return True
-            
-            self.update_parameters_multi_param(current_specs, target_spec, iteration)
+        wrong_sign = [name or "target" for name, target, _ in self.named_targets(target_spec)
+                      if target.vth * self.polarity <= 0]
+        if wrong_sign:
+            kind = "negative" if self.polarity < 0 else "positive"
+            print(f"ERROR: {self.device_model} needs {kind} Vth targets ({', '.join(wrong_sign)})")
+            return False
+        
+        custom = ([t.name for t in self.tunables] != ['vth0', 'u0', 'vsat']
+                  or any(target.metrics for _, target, _ in self.named_targets(target_spec)))
+        if custom and not self.optimizer.supports_custom_parameters:
+            print(f"ERROR: the {self.optimizer.name} optimizer only tunes vth0/u0/vsat on Vth/Ion targets")
+            return False
+        
+        if isinstance(target_spec, BSIM4GeometrySpec) and target_spec.per_bin:
+            if not isinstance(self.current_params, BSIM4BinnedParameters):
+                self.current_params = BSIM4BinnedParameters([copy.deepcopy(self.current_params)
+                                                             for _ in target_spec.bins])
+        elif isinstance(self.current_params, BSIM4BinnedParameters):
+            print("ERROR: binned parameters can only be centered with a per-bin geometry spec")
+            return False
+        self.current_params = self.fill_tunables(self.current_params)
+        
+        self.best_error = float('inf')
+        self.best_params = None
+        self.checkpoint_path = checkpoint
+        self.checkpoint_key = self.run_checkpoint_key(target_spec) if checkpoint else None
+        state = load_checkpoint(checkpoint, self.checkpoint_key) if checkpoint and resume else None
+        start = self.restore_checkpoint(state) if state is not None else 0
+        if state is not None and state['finished'] and (state['converged'] or start >= max_iterations):
+            # a run that did not converge continues when given more iterations
+            print(f"Run already finished (checkpoint {checkpoint}), error {self.best_error:.4f}")
+            self.restore_best_parameters()
+            self.emit('finished', success=state['converged'], error=self.best_error, simulations=self.simulation_count)
+            return state['converged']
+        if state is not None:
+            print(f"Resuming from checkpoint {checkpoint} at iteration {start + 1} "
+                  f"(best error {self.best_error:.4f}, {self.simulation_count} simulations so far)")
+        else:
+            self.apply_warm_start(target_spec)
+        self.emit('start', max_iterations=max_iterations, tolerance=tolerance, optimizer=self.optimizer.name)
+        self.telemetry.new_trace()
+        
+        try:
+            with self.telemetry.span("optimize", device=self.device_model, optimizer=self.optimizer.name,
+                                     backend=self.backend.name) as record:
+                converged = self.optimization_loop(target_spec, max_iterations, tolerance, start)
+                record.set(converged=converged, error=self.best_error, simulations=self.simulation_count)
+        except CenteringCancelled:
+            print("\nOptimization cancelled")
+            self.restore_best_parameters()
+            self.emit('cancelled', simulations=self.simulation_count)
+            raise
+        self.print_profile()
+        # the last iterate, not the best one: it is what the optimizer state belongs to,
+        # so a resumed run given more iterations goes on like an uninterrupted one
+        self.write_checkpoint(max_iterations, finished=True, converged=converged)
+        self.restore_best_parameters()
+        if converged:
+            self.store_solution(target_spec)
+        self.emit('finished', success=converged, error=self.best_error, simulations=self.simulation_count)
+        return converged
+    
+    @staticmethod
+    def named_targets(target_spec: TargetSpec) -> List[Tuple[str, BSIM4TargetSpec, float]]:
+        if isinstance(target_spec, CompositeTargetSpec):
+            return target_spec.named_targets()
+        return [("", target_spec, 1.0)]
+    
+    def solution_scope(self) -> Optional[str]:
+        try:
+            model_file = file_digest(self.model_lib_file)
+        except OSError:
+            return None
+        return SolutionStore.make_scope(model_file=model_file, device_model=self.device_model,
+                                        backend=self.backend.name, extraction=EXTRACTION_VERSION)
+    
+    def apply_warm_start(self, target_spec: TargetSpec):
+        # start from the nearest stored solution instead of the current (nominal) parameters
+        scope = self.solution_scope() if self.solutions is not None else None
+        if scope is None:
+            return
+        solution = self.solutions.nearest(scope, target_spec)
+        if solution is None:
+            return
+        current = self.current_params.to_dict()
+        if solution['params'].keys() != current.keys():
+            return
         
-        if best_params:
-            self.current_params = best_params
-            print(f"\nUsing best parameters with error: {best_error:.4f}")
+        self.current_params = self.parameters_from_dict(solution['params'])
+        if solution['jacobian'] is not None and solution['optimizer'] == self.optimizer.name:
+            self.optimizer.warm_start(solution['jacobian'])
+        source = "stored solution" if solution['neighbours'] == 1 else f"{solution['neighbours']} stored solutions"
+        print(f"Warm start from {source} (distance {solution['distance']:.2f})")
+    
+    def parameters_from_dict(self, values: Dict[str, float]):
+        # inverse of to_dict() on the shape of the current parameters; binned names are "vth0[1]"
+        if isinstance(self.current_params, BSIM4BinnedParameters):
+            return replace(self.current_params, bins=[
+                params.updated({name: values[f"{name}[{i}]"] for name in params.to_dict()})
+                for i, params in enumerate(self.current_params.bins)])
+        return self.current_params.updated(values)
+    
+    def run_checkpoint_key(self, target_spec: TargetSpec) -> str:
+        try:
+            model_file = file_digest(self.model_lib_file)
+        except OSError:
+            model_file = self.model_lib_file
+        return run_key(model_file=model_file, device_model=self.device_model, backend=self.backend.name,
+                       target=[type(target_spec).__name__, asdict(target_spec)], optimizer=self.optimizer.name,
+                       tunables=[asdict(t) for t in self.tunables], extraction=EXTRACTION_VERSION)
+    
+    def write_checkpoint(self, iteration: int, finished: bool = False, converged: bool = False):
+        # iteration: the next one to run
+        if self.checkpoint_path is None:
+            return
+        state = {
+            'iteration': iteration,
+            'finished': finished,
+            'converged': converged,
+            'current_params': self.current_params,
+            'best_params': self.best_params,
+            'best_error': self.best_error,
+            'simulation_count': self.simulation_count,
+            'iteration_log': self.iteration_log,
+            'optimizer': self.optimizer.state_dict()
+        }
+        try:
+            with self.telemetry.span("checkpoint", iteration=iteration):
+                save_checkpoint(self.checkpoint_path, self.checkpoint_key, state)
+        except OSError as e:
+            print(f"Warning: checkpoint write failed: {e}")
+    
+    def restore_checkpoint(self, state: Dict) -> int:
+        # returns the iteration to continue with
+        state = decode_state(state, self)
+        self.current_params = state['current_params']
+        self.best_params = state['best_params']
+        self.best_error = state['best_error']
+        self.simulation_count = state['simulation_count']
+        self.iteration_log = state['iteration_log']
+        self.optimizer.load_state(self, state['optimizer'])
+        return state['iteration']
+    
+    def store_solution(self, target_spec: TargetSpec):
+        scope = self.solution_scope() if self.solutions is not None else None
+        if scope is None:
+            return
+        self.solutions.add(scope, target_spec, self.current_params.to_dict(), self.best_error,
+                           jacobian=self.optimizer.jacobian_estimate(), optimizer=self.optimizer.name)
+    
+    def print_profile(self):
+        print("\nTime profile:")
+        print(self.telemetry.format_profile())
+    
+    def restore_best_parameters(self):
+        if self.best_params is not None and self.best_params.to_dict() != self.current_params.to_dict():
+            self.current_params = self.best_params
+            print(f"\nUsing best parameters with error: {self.best_error:.4f}")
+    
+    def optimization_loop(self, target_spec: TargetSpec, max_iterations: int, tolerance: float,
+                          start: int = 0) -> bool:
+        for iteration in range(start, max_iterations):
+            with self.telemetry.span("iteration", iteration=iteration) as record:
+                self.check_cancelled()
+                print(f"\n--- Iteration {iteration + 1}/{max_iterations} ---")
+                
+                current_specs = self.run_simulation(self.current_params, target_spec)
+                
+                if self.simulation_failed(current_specs):
+                    print("Simulation failed, trying next iteration...")
+                    self.emit('simulation_failed', iteration=iteration)
+                    record.set(failed=True)
+                    self.current_params = self.optimizer.recover(self, self.current_params, target_spec, iteration)
+                    self.write_checkpoint(iteration + 1)
+                    continue
+                
+                self.update_vth_brackets(self.current_params, current_specs, target_spec)
+                error = self.calculate_error(current_specs, target_spec)
+                record.set(error=error)
+                
+                if error < self.best_error:
+                    self.best_error = error
+                    self.best_params = copy.deepcopy(self.current_params)
+                
+                log_entry = {
+                    'iteration': iteration,
+                    'params': self.current_params.to_dict().copy(),
+                    'specs': current_specs.copy(),
+                    'error': error
+                }
+                self.iteration_log.append(log_entry)
+                
+                self.print_results(current_specs, target_spec)
+                print(f"Overall Error: {error:.4f} (Best: {self.best_error:.4f})")
+                self.emit('iteration', **log_entry, best_error=self.best_error, simulations=self.simulation_count)
+                
+                if error < tolerance:
+                    print(f"✅ Converged! ({self.simulation_count} simulations)")
+                    self.print_cache_stats()
+                    return True
+                
+                with self.telemetry.span("optimizer_step", optimizer=self.optimizer.name):
+                    self.current_params = self.optimizer.step(self, self.current_params, current_specs,
+                                                              target_spec, iteration)
+                self.write_checkpoint(iteration + 1)
         
-        return best_error < 0.1
+        self.print_cache_stats()
+        return self.best_error < 2 * tolerance
+    
+    def print_cache_stats(self):
+        if self.cache is not None:
+            stats = self.cache.stats()
+            print(f"Simulation cache: {stats['hits']} hits, {stats['misses']} misses "
+                  f"({stats['hit_rate']*100:.0f}% hit rate, {stats['entries']} entries)")
     
     def update_parameters_multi_param(self, current_specs: Dict[str, float], 
                                     target_spec: BSIM4TargetSpec, iteration: int):
         lr = 0.3 * (0.9 ** iteration)
 
-        # adjust vth
+        # adjust vth (PMOS: vth0 moves the other way)
         vth_error = (target_spec.vth - current_specs['vth']) / target_spec.vth
         if abs(vth_error) > 0.02:
-            delta_vth0 = vth_error * lr
+            delta_vth0 = vth_error * lr * self.polarity
             new_vth0 = self.current_params.vth0 + delta_vth0
-            self.current_params.vth0 = max(0.1, min(0.9, new_vth0))
+            vth0_bounds = next(t for t in self.active_tunables() if t.name == 'vth0')
+            self.current_params.vth0 = vth0_bounds.clamp(new_vth0)
             print(f"  Vth adjustment: vth0 → {self.current_params.vth0:.3f}")
 
         # adjust ion with u0 and vsat
         ion_error = (target_spec.ion - current_specs['ion']) / target_spec.ion
         if abs(ion_error) > 0.1:
             # check how much headroom for parsmeters, and it will be dissapated
-            u0_headroom = (2000 - self.current_params.u0) / 800
-            vsat_headroom = (2.5e7 - self.current_params.vsat) / 3e5
+            # (towards the upper bound to raise Ion, the lower bound to cut it)
+            u0_low, u0_high = PARAMETER_BOUNDS['u0']
+            vsat_low, vsat_high = PARAMETER_BOUNDS['vsat']
+            if ion_error > 0:
+                u0_headroom = (u0_high - self.current_params.u0) / (u0_high - u0_low)
+                vsat_headroom = (vsat_high - self.current_params.vsat) / (vsat_high - vsat_low)
+            else:
+                u0_headroom = (self.current_params.u0 - u0_low) / (u0_high - u0_low)
+                vsat_headroom = (self.current_params.vsat - vsat_low) / (vsat_high - vsat_low)
 
+            # the parameter that moves Ion more takes more of the correction
+            sensitivities = self.ion_sensitivities(target_spec)
+            if sensitivities is not None:
+                u0_headroom *= sensitivities[0]
+                vsat_headroom *= sensitivities[1]
             total_headroom = u0_headroom + vsat_headroom
 
             if total_headroom > 0:
@@ -365,34 +1407,79 @@ class SkyWaterBSIM4Centering:
                 u0_weight = 0.6  # default u0 has 60%
                 vsat_weight = 0.4  # vsat has 40%
 
-            # adjust application
-            delta_u0 = ion_error * lr * u0_weight * 0.5
-            delta_vsat = ion_error * lr * vsat_weight * 0.5
+            # adjust application: sized so the predicted Ion change is lr * ion_error,
+            # half of that when the sensitivities cannot be measured
+            gain = 0.5
+            if sensitivities is not None and u0_weight * sensitivities[0] + vsat_weight * sensitivities[1] > 0:
+                gain = 1 / (u0_weight * sensitivities[0] + vsat_weight * sensitivities[1])
+            delta_u0 = ion_error * lr * u0_weight * gain
+            delta_vsat = ion_error * lr * vsat_weight * gain
 
             # update u0
             new_u0 = self.current_params.u0 * (1 + delta_u0)
-            self.current_params.u0 = max(50, min(800, new_u0))
+            self.current_params.u0 = clamp_parameter('u0', new_u0)
 
             # update vsat
             new_vsat = self.current_params.vsat * (1 + delta_vsat)
-            self.current_params.vsat = max(5e4, min(3e5, new_vsat))
+            self.current_params.vsat = clamp_parameter('vsat', new_vsat)
 
             print(f"  Ion adjustment: u0 → {self.current_params.u0:.1f} (weight: {u0_weight:.2f})")
             print(f"                 vsat → {self.current_params.vsat:.2e} (weight: {vsat_weight:.2f})")
     
+    def ion_sensitivities(self, target_spec: BSIM4TargetSpec) -> Optional[Tuple[float, float]]:
+        # normalized Ion sensitivities to (u0, vsat), None if they cannot be measured; measured
+        # once per operating point, again only when the parameters have moved far from it
+        if not self.side_by_side_supported(target_spec):
+            return None
+        params = self.current_params
+        if self.ion_sensitivity_point is not None:
+            spec, measured, sensitivities = self.ion_sensitivity_point
+            moved = (abs(np.log(params.u0 / measured.u0)) > np.log1p(ION_SENSITIVITY_REFRESH)
+                     or abs(np.log(params.vsat / measured.vsat)) > np.log1p(ION_SENSITIVITY_REFRESH)
+                     or abs(params.vth0 - measured.vth0) > 0.05)
+            if spec == target_spec and not moved:
+                return sensitivities
+        ion = self.sensitivity_analysis(params, target_spec).get('ion', {})
+        sensitivities = (abs(ion.get('u0', np.nan)), abs(ion.get('vsat', np.nan)))
+        if not all(np.isfinite(sensitivities)):
+            sensitivities = None
+        else:
+            print(f"  Ion sensitivity: u0 {sensitivities[0]:.2f}, vsat {sensitivities[1]:.2f}")
+        self.ion_sensitivity_point = (target_spec, copy.deepcopy(params), sensitivities)
+        return sensitivities
+    
     def save_centered_model(self, output_path: Optional[str] = None) -> str:
+        polarity = "pmos" if self.polarity < 0 else "nmos"
         if output_path is None:
-            output_path = "skywater_nmos_centered.lib"
+            output_path = f"skywater_{polarity}_centered.lib"
+        
+        try:
+            card = self.get_model_card()
+        except OSError:
+            card = None
         
         content_lines = [
             "* SkyWater BSIM4 Centered Model",
             "* Generated by Auto-Centering Tool (Constant Current Method)", 
             f"* Date: {__import__('datetime').datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
             f"* Based on: {self.device_model}",
-            "",
-            f".model nch_centered nmos level=54 version=4.7 toxe={self.current_params.toxe:.6e} vth0={self.current_params.vth0:.6e} u0={self.current_params.u0:.6e} vsat={self.current_params.vsat:.6e} k1=0.39 k2=0.05 vfb=-0.9 xt=1.55e-7 lint=0 wint=0 mobmod=0 binunit=2 paramchk=1"
+            ""
         ]
         
+        if isinstance(self.current_params, BSIM4BinnedParameters):
+            # a binned model: the simulator picks the card whose lmin/lmax and wmin/wmax hold the device size
+            name = f"{polarity[0]}ch_centered"
+            content_lines.append(f"* Binned model, instantiate {name}: the card is selected by L and W")
+            for i, (limits, row) in enumerate(self.target_spec.bin_cells()):
+                geometry = self.target_spec.bins[row]
+                content_lines.append(f"* Bin {i}: L={limits['lmin']*1e6:.4g}-{limits['lmax']*1e6:.4g}um "
+                                     f"W={limits['wmin']*1e6:.4g}-{limits['wmax']*1e6:.4g}um, "
+                                     f"centered at W={geometry.width*1e6:g}um L={geometry.length*1e6:g}um")
+                content_lines.append(self.centered_model_text(card, self.current_params.bins[row], f"{name}.{i}",
+                                                              limits))
+        else:
+            content_lines.append(self.centered_model_text(card, self.current_params, f"{polarity[0]}ch_centered"))
+        
         content = "\n".join(content_lines)
         
         with open(output_path, 'w', encoding='utf-8') as f:
@@ -400,6 +1487,79 @@ class SkyWaterBSIM4Centering:
         
         return output_path
     
+    def centered_model_text(self, card: Optional[ModelCard], params: BSIM4Parameters, name: str,
+                            limits: Optional[Dict[str, float]] = None) -> str:
+        centered_params = {'toxe': params.toxe, **params.model_values(), **(limits or {})}
+        
+        if card is not None:
+            # keep every other parameter of the original card
+            centered_card = replace(card, params=dict(card.params), raw_values=dict(card.raw_values))
+            centered_card.update(centered_params)
+            return centered_card.to_spice(name=name)
+        # tuned parameters replace the generic defaults
+        polarity = "pmos" if params.vth0 < 0 else "nmos"
+        defaults = {'k1': '0.39', 'k2': '0.05', 'vfb': '0.9' if polarity == "pmos" else '-0.9', 'xt': '1.55e-7',
+                    'lint': '0', 'wint': '0'}
+        defaults.update({key: f"{value:.6e}" for key, value in {**params.extra, **(limits or {})}.items()})
+        extra = " ".join(f"{key}={value}" for key, value in defaults.items())
+        return (f".model {name} {polarity} level=54 version=4.7 toxe={params.toxe:.6e} vth0={params.vth0:.6e} u0={params.u0:.6e} vsat={params.vsat:.6e} {extra} mobmod=0 binunit=2 paramchk=1")
+    
+    def save_centered_library(self, output_path: str) -> str:
+        if isinstance(self.current_params, BSIM4BinnedParameters):
+            raise ValueError("Per-bin parameters cannot be written into a single library card, use save_centered_model")
+        # full copy of the model library, only the device card is re-written
+        library = ModelLibrary(self.model_lib_file)
+        card = library.get(self.device_model)
+        if card is None:
+            raise ValueError(f"Model {self.device_model} not found in {self.model_lib_file}")
+        card.update({'toxe': self.current_params.toxe, **self.current_params.model_values()})
+        library.write(output_path)
+        return output_path
+    
+    def format_target_results(self, final_specs: Dict[str, float], target_spec: BSIM4TargetSpec) -> List[str]:
+        # calculate vth and ion error
+        vth_error = abs((final_specs['vth'] - target_spec.vth) / target_spec.vth) * 100
+        vth_error_mv = 1000*abs(final_specs['vth'] - target_spec.vth)
+        ion_error = abs((final_specs['ion'] - target_spec.ion) / target_spec.ion) * 100
+
+        return [
+            f"  Target Vth: {target_spec.vth:.3f} V",
+            f"  Final Vth:  {final_specs['vth']:.3f} V",
+            f"  Vth Error:  {vth_error:.2f}%",
+            f"  Vth Error(mV):  {vth_error_mv:.2f}mV",
+            "",
+            f"  Target Ion: {target_spec.ion:.2e} A/um",
+            f"  Final Ion:  {final_specs['ion']:.2e} A/um",
+            f"  Ion Error:  {ion_error:.2f}%",
+            "",
+            f"  Vth (max gm): {final_specs.get('vth_gm', float('nan')):.3f} V, "
+            f"Vth (sat): {final_specs.get('vth_sat', float('nan')):.3f} V",
+            f"  SS: {final_specs.get('ss', float('nan')):.1f} mV/dec, DIBL: {final_specs.get('dibl', float('nan')):.1f} mV/V, "
+            f"Ioff: {final_specs.get('ioff', float('nan')):.2e} A/um",
+            ""
+        ] + self.format_metric_targets(final_specs, target_spec) + self.format_statistics(final_specs)
+    
+    def format_metric_targets(self, final_specs: Dict[str, float], target_spec: BSIM4TargetSpec) -> List[str]:
+        lines = []
+        for metric in target_spec.metrics:
+            unit = METRICS[metric.name].unit
+            lines.append(f"  Target {metric.name}: {metric.value:.4g} {unit}, final: {final_specs[metric.name]:.4g} {unit} "
+                         f"({self.format_metric_error(metric, final_specs[metric.name])}, weight {metric.weight:g})")
+        return lines + [""] if lines else []
+    
+    def format_statistics(self, final_specs: Dict[str, float]) -> List[str]:
+        # Monte Carlo spread, the values above are sample means
+        if 'vth_sigma' not in final_specs:
+            return []
+        return [
+            f"  Monte Carlo ({final_specs['samples']} samples):",
+            f"    Vth sigma: {final_specs['vth_sigma']*1000:.2f} mV, "
+            f"±3σ: {final_specs['vth_low']:.3f} .. {final_specs['vth_high']:.3f} V",
+            f"    Ion sigma: {final_specs['ion_sigma']/final_specs['ion']*100:.2f}%, "
+            f"±3σ: {final_specs['ion_low']:.2e} .. {final_specs['ion_high']:.2e} A/um",
+            ""
+        ]
+    
     def generate_centering_report(self) -> str:
         if not self.iteration_log:
             return "No optimization performed"
@@ -418,37 +1578,71 @@ class SkyWaterBSIM4Centering:
             final_log = self.iteration_log[-1]
             final_specs = final_log['specs']
 
-            # calculate vth and ion error
-            vth_error = abs((final_specs['vth'] - self.target_spec.vth) / self.target_spec.vth) * 100
-            vth_error_mv = 1000*abs(final_specs['vth'] - self.target_spec.vth)
-            ion_error = abs((final_specs['ion'] - self.target_spec.ion) / self.target_spec.ion) * 100
-
             report.append("Centering Results:")
-            report.append(f"  Target Vth: {self.target_spec.vth:.3f} V")
-            report.append(f"  Final Vth:  {final_specs['vth']:.3f} V")
-            report.append(f"  Vth Error:  {vth_error:.2f}%")
-            report.append(f"  Vth Error(mV):  {vth_error_mv:.2f}mV")
-            report.append("")
-            report.append(f"  Target Ion: {self.target_spec.ion:.2e} A/um")
-            report.append(f"  Final Ion:  {final_specs['ion']:.2e} A/um")
-            report.append(f"  Ion Error:  {ion_error:.2f}%")
-            report.append("")
+            if isinstance(self.target_spec, CompositeTargetSpec):
+                for name, target, weight in self.target_spec.named_targets():
+                    report.append(f"  {self.target_spec.describe(name)} (weight {weight:g}):")
+                    report.extend("  " + line for line in self.format_target_results(final_specs[name], target))
+            else:
+                report.extend(self.format_target_results(final_specs, self.target_spec))
             report.append(f"  Overall Error: {final_log['error']:.4f}")
             report.append("")
 
         initial_params = self.iteration_log[0]['params']
         final_params = self.iteration_log[-1]['params']
         report.append("Parameter Changes:")
-        for param in ['vth0', 'u0', 'vsat']:
+        for param in [name for name in final_params
+                      if name.split('[')[0] in [t.name for t in self.tunables] and name in initial_params]:
             initial = initial_params[param]
             final = final_params[param]
             change = ((final - initial) / initial) * 100 if initial != 0 else 0
             report.append(f"  {param}: {initial:.3e} → {final:.3e} ({change:+.1f}%)")
 
+        if self.sensitivities:
+            report.append("")
+            report.append("Parameter Sensitivities (dM/M per dp/p):")
+            report.extend("  " + line for line in format_sensitivities(self.sensitivities))
+
+        if self.telemetry.profile():
+            report.append("")
+            report.append("Time Profile:")
+            report.extend("  " + line for line in self.telemetry.format_profile().splitlines())
+
         return "\n".join(report)
     
+    def generate_centering_summary(self) -> Dict:
+        # machine-readable counterpart of generate_centering_report
+        summary = {
+            'model_library': self.model_lib_file,
+            'device_model': self.device_model,
+            'backend': self.backend.name,
+            'optimizer': self.optimizer.name,
+            'simulations': self.simulation_count,
+            'iterations': len(self.iteration_log),
+            'target': asdict(self.target_spec) if self.target_spec is not None else None,
+            'final_params': self.current_params.to_dict(),
+            'profile': self.telemetry.profile()
+        }
+        if self.sensitivities:
+            summary['sensitivities'] = self.sensitivities
+        if self.iteration_log:
+            best = min(self.iteration_log, key=lambda entry: entry['error'])
+            summary['initial_params'] = self.iteration_log[0]['params']
+            summary['final_specs'] = best['specs']
+            summary['error'] = best['error']
+            summary['error_history'] = [entry['error'] for entry in self.iteration_log]
+        return summary
+    
+    def close(self):
+        self.telemetry.close()
+        if self.simulation_pool is not None and not self.shared_pool:
+            self.simulation_pool.close()
+        self.simulation_pool = None
+    
     def __del__(self):
         try:
+            if getattr(self, 'simulation_pool', None) is not None and not self.shared_pool:
+                self.simulation_pool.close(wait=False)
             import shutil
             if hasattr(self, 'temp_dir') and os.path.exists(self.temp_dir):
                 shutil.rmtree(self.temp_dir, ignore_errors=True)
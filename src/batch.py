@@ -0,0 +1,145 @@
+# Parallel evaluation of simulation jobs
+# Every worker (thread or process) gets its own sandbox directory, so jobs
+# never share testbench or result files and can run at the same time.
+# A shared pool serves several centering runs (e.g. all devices of a batch):
+# one run cancelling only drops its own queued jobs.
+
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import contextvars
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, List, Optional, Union
+
+import telemetry
+from simulator import (SimulatorBackend, SharedNgspiceBackend, SimulationJob, SimulationCancelled, Vectors,
+                       create_backend)
+
+# per-process state of process pool workers
+_worker_backend = None
+_worker_sandbox = None
+
+
+def _init_process_worker(backend_spec, root_dir: str):
+    global _worker_backend, _worker_sandbox
+    if isinstance(backend_spec, str):
+        _worker_backend = create_backend(backend_spec)
+    else:
+        _worker_backend = backend_spec
+    _worker_sandbox = tempfile.mkdtemp(dir=root_dir)
+    # SimulationPool.cancel() terminates the workers, take the simulator down too
+    signal.signal(signal.SIGTERM, _stop_process_worker)
+
+
+def _stop_process_worker(signum, frame):
+    _worker_backend.cancel()
+    os._exit(1)
+
+
+def _run_in_process_worker(job: SimulationJob):
+    return _worker_backend.run(job, _worker_sandbox)
+
+
+class SimulationPool:
+
+    def __init__(self, backend: SimulatorBackend, workers: Optional[int] = None, executor: Optional[str] = None,
+                 shared: bool = False):
+        self.backend = backend
+        self.workers = workers or os.cpu_count() or 1
+        self.shared = shared
+
+        # libngspice is one session per process, so it only scales with processes
+        if executor is None:
+            executor = "process" if isinstance(backend, SharedNgspiceBackend) else "thread"
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Unknown executor: {executor}")
+        self.executor_kind = executor
+
+        self.root_dir = tempfile.mkdtemp(prefix="centering_batch_")
+        self.local = threading.local()
+        self.executor = None
+
+    def get_executor(self):
+        if self.executor is None:
+            if self.executor_kind == "process":
+                backend_spec = "shared" if isinstance(self.backend, SharedNgspiceBackend) else self.backend
+                # spawn: never fork a process that holds libngspice or Tk state
+                self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                    mp_context=multiprocessing.get_context("spawn"),
+                                                    initializer=_init_process_worker,
+                                                    initargs=(backend_spec, self.root_dir))
+            else:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        return self.executor
+
+    def _run_in_thread_worker(self, job: SimulationJob, cancelled: Optional[Callable[[], bool]] = None,
+                              context=(None, None)):
+        if cancelled is not None and cancelled():
+            raise SimulationCancelled("Simulation cancelled")
+        sandbox = getattr(self.local, 'sandbox', None)
+        if sandbox is None:
+            sandbox = tempfile.mkdtemp(dir=self.root_dir)
+            self.local.sandbox = sandbox
+        # spans of the worker join the caller's trace
+        with telemetry.attach(context), telemetry.span("simulation_job"):
+            return self.backend.run(job, sandbox)
+
+    def run(self, jobs: List[SimulationJob],
+            cancelled: Optional[Callable[[], bool]] = None) -> List[Union[Vectors, Exception]]:
+        # results come back in job order; a failed job yields its exception.
+        # cancelled() is polled so a cancel() racing with the submission is not lost
+        executor = self.get_executor()
+        if self.executor_kind == "process":
+            futures = [executor.submit(_run_in_process_worker, job) for job in jobs]
+        else:
+            context = telemetry.current_context()
+            # a context copy per job, so output routed by the caller (engine.route_output) follows it
+            futures = [executor.submit(contextvars.copy_context().run, self._run_in_thread_worker, job, cancelled,
+                                       context) for job in jobs]
+        if self.shared and cancelled is not None:
+            self.drop_when_cancelled(futures, cancelled)
+        elif cancelled is not None and cancelled():
+            self.cancel()
+
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
+
+    @staticmethod
+    def drop_when_cancelled(futures, cancelled: Callable[[], bool], poll: float = 0.05):
+        # shared pool: other runs keep their jobs, running jobs of this run finish
+        pending = set(futures)
+        while pending:
+            if cancelled():
+                for future in pending:
+                    future.cancel()
+                return
+            _, pending = wait(pending, timeout=poll, return_when=FIRST_COMPLETED)
+
+    def cancel(self):
+        # drop queued jobs and stop the running ones; run() returns their exceptions
+        executor, self.executor = self.executor, None
+        if executor is None:
+            return
+        # the workers own their simulator processes, so process workers are stopped themselves
+        # (read before shutdown, which clears the private process table)
+        processes = list((getattr(executor, '_processes', None) or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        if self.executor_kind == "process":
+            for process in processes:
+                process.terminate()
+        else:
+            self.backend.cancel()
+
+    def close(self, wait: bool = True):
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait, cancel_futures=not wait)
+            self.executor = None
+        shutil.rmtree(self.root_dir, ignore_errors=True)
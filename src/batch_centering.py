@@ -0,0 +1,299 @@
+# Headless batch centering
+# Centers many devices from a job file (YAML, JSON or CSV), one device per row,
+# as concurrent runs of the asyncio engine. NMOS and PMOS devices mix freely;
+# all devices share one simulator backend and one simulation pool, so the
+# simulator sessions are started once per batch. Iteration progress is
+# printed as it happens and Ctrl-C cancels every run, killing its simulations. For every
+# device a centered model card, a text report, a JSON summary and a log are
+# written to the output directory, plus summary.json for the whole batch.
+# Every device also keeps a checkpoint there (<name>.checkpoint.json.gz);
+# after a crash or Ctrl-C, --resume continues each device from its last
+# iteration, and devices that had finished are not centered again.
+# Exits non-zero if any device fails.
+#
+#   python batch_centering.py jobs.yaml --output-dir centered --jobs 4
+#   python batch_centering.py jobs.yaml --output-dir centered --jobs 4 --resume
+#
+# JSON/YAML: a list of devices, or {"defaults": {...}, "devices": [...]}.
+# CSV: one device per row, the header names the fields.
+# Fields: name, device_model, model_lib, vth, ion, vdd, temp, length, width,
+#         max_iterations, tolerance, optimizer, sweep (full or adaptive), corners (list), bins (list), per_bin,
+#         samples, sigma_vth0, sigma_u0, seed (Monte Carlo mean targets),
+#         tunables (list of parameter names or {name, lower, upper, log_scale}; CSV: "vth0 u0 vsat eta0"),
+#         metrics ({name: value}, or a list of {name, value, weight}; CSV: "dibl=20;ss=85")
+
+import os
+import re
+import csv
+import sys
+import json
+import time
+import asyncio
+import argparse
+from typing import Callable, Dict, List, Optional
+
+from batch import SimulationPool
+from simulator import SimulatorBackend, create_backend
+from auto_centering import (SkyWaterBSIM4Centering, BSIM4TargetSpec, BSIM4MultiTargetSpec, BSIM4GeometrySpec,
+                            BSIM4StatisticalSpec, CornerSpec, GeometryTarget, CenteringCancelled)
+from engine import CenteringRun, route_output
+from optimizers import create_optimizer
+from telemetry import Telemetry
+from tuning import MetricTarget
+
+TARGET_FIELDS = ('vth', 'ion', 'vdd', 'temp', 'length', 'width')
+CORNER_FIELDS = ('vth0_shift', 'u0_scale', 'vsat_scale')
+MISMATCH_FIELDS = ('sigma_vth0', 'sigma_u0')
+JOB_DEFAULTS = {
+    'model_lib': 'skywater_models.lib',
+    'device_model': 'sky130_fd_pr__nfet_01v8',
+    'max_iterations': 10,
+    'tolerance': 0.05,
+    'optimizer': 'lm',
+    'sweep': 'full'
+}
+
+
+def load_job_file(path: str) -> List[Dict]:
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if extension == '.csv':
+            # empty cells fall back to the defaults
+            data = [{key.strip(): value.strip() for key, value in row.items() if key and value and value.strip()}
+                    for row in csv.DictReader(f)]
+        elif extension in ('.yaml', '.yml'):
+            try:
+                import yaml
+            except ImportError:
+                raise SystemExit("YAML job files need PyYAML (pip install pyyaml), or use JSON/CSV")
+            data = yaml.safe_load(f)
+        elif extension == '.json':
+            data = json.load(f)
+        else:
+            raise SystemExit(f"Unsupported job file format: {extension} (use .yaml, .json or .csv)")
+
+    defaults = {}
+    if isinstance(data, dict):
+        defaults = data.get('defaults', {})
+        data = data.get('devices', [])
+    if not isinstance(data, list) or not data:
+        raise SystemExit(f"No devices in job file: {path}")
+
+    jobs = []
+    base_dir = os.path.dirname(os.path.abspath(path))
+    for index, row in enumerate(data):
+        job = {**JOB_DEFAULTS, **defaults, **row}
+        job.setdefault('name', f"{job['device_model']}_{index}")
+        if not re.fullmatch(r'[\w.+-]+', str(job['name'])):
+            raise SystemExit(f"Invalid device name: {job['name']!r}")
+        # model libraries are relative to the job file
+        job['model_lib'] = os.path.join(base_dir, job['model_lib'])
+        jobs.append(job)
+
+    names = [job['name'] for job in jobs]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise SystemExit(f"Duplicate device names: {', '.join(duplicates)}")
+    return jobs
+
+
+def target_values(row: Dict) -> Dict[str, float]:
+    return {key: float(row[key]) for key in TARGET_FIELDS if key in row}
+
+
+def parse_metrics(value) -> List[MetricTarget]:
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = dict(item.split('=', 1) for item in re.split(r'[;,\s]+', value.strip()) if item)
+    if isinstance(value, dict):
+        return [MetricTarget(name, float(target)) for name, target in value.items()]
+    return [MetricTarget(item['name'], float(item['value']), float(item.get('weight', 1.0))) for item in value]
+
+
+def parse_tunables(value) -> Optional[List]:
+    if not value:
+        return None
+    if isinstance(value, str):
+        return value.replace(',', ' ').replace(';', ' ').split()
+    return list(value)
+
+
+def build_target_spec(job: Dict):
+    metrics = parse_metrics(job.get('metrics'))
+    if job.get('corners'):
+        return BSIM4MultiTargetSpec([
+            CornerSpec(name=corner['name'], target=BSIM4TargetSpec(**target_values({**job, **corner}),
+                                                                   metrics=parse_metrics(corner.get('metrics')) or metrics),
+                       weight=float(corner.get('weight', 1.0)),
+                       **{key: float(corner[key]) for key in CORNER_FIELDS if key in corner})
+            for corner in job['corners']
+        ])
+    if job.get('bins'):
+        if metrics:
+            raise ValueError("metric targets are not supported for geometry bins")
+        return BSIM4GeometrySpec(
+            bins=[GeometryTarget(width=float(row['width']), length=float(row['length']), vth=float(row['vth']),
+                                 ion=float(row['ion']), weight=float(row.get('weight', 1.0)))
+                  for row in job['bins']],
+            vdd=float(job.get('vdd', 1.8)), temp=float(job.get('temp', 25)),
+            per_bin=str(job.get('per_bin', False)).lower() in ('1', 'true', 'yes'))
+    if 'vth' not in job or 'ion' not in job:
+        raise ValueError("vth and ion targets are required")
+    if job.get('samples'):
+        return BSIM4StatisticalSpec(**target_values(job), metrics=metrics, samples=int(job['samples']),
+                                    seed=int(job.get('seed', 1)),
+                                    **{key: float(job[key]) for key in MISMATCH_FIELDS if key in job})
+    return BSIM4TargetSpec(**target_values(job), metrics=metrics)
+
+
+def create_tool(job: Dict, backend: SimulatorBackend, pool: SimulationPool, log_line: Callable[[str], None],
+                trace_path: Optional[str] = None):
+    with route_output(log_line):
+        return SkyWaterBSIM4Centering(model_lib_file=job['model_lib'], device_model=job['device_model'],
+                                      backend=backend, simulation_pool=pool,
+                                      optimizer=create_optimizer(job['optimizer']),
+                                      tunables=parse_tunables(job.get('tunables')), sweep=job['sweep'],
+                                      telemetry=Telemetry(trace_path) if trace_path else None)
+
+
+def prepare_tool(tool: SkyWaterBSIM4Centering):
+    if not os.path.exists(tool.model_lib_file):
+        raise FileNotFoundError(f"Model library not found: {tool.model_lib_file}")
+    tool.extract_nominal_parameters()
+
+
+def save_outputs(tool: SkyWaterBSIM4Centering, name: str, output_dir: str, result: Dict,
+                 log_line: Callable[[str], None]):
+    with route_output(log_line):
+        result['model_card'] = tool.save_centered_model(os.path.join(output_dir, f"{name}.lib"))
+        report_path = os.path.join(output_dir, f"{name}_report.txt")
+        with open(report_path, 'w', encoding='utf-8') as f:
+            f.write(tool.generate_centering_report())
+        result['report'] = report_path
+        result.update(tool.generate_centering_summary())
+
+
+async def center_device(job: Dict, output_dir: str, backend: SimulatorBackend, pool: SimulationPool,
+                        limit: asyncio.Semaphore, trace: bool = False, resume: bool = False) -> Dict:
+    name = job['name']
+    result = {'name': name, 'device_model': job['device_model'], 'converged': False}
+    log_path = os.path.join(output_dir, f"{name}.log")
+    checkpoint = os.path.join(output_dir, f"{name}.checkpoint.json.gz")
+
+    async with limit:
+        started = time.time()
+        # a resumed device continues its log
+        with open(log_path, 'a' if resume else 'w', encoding='utf-8') as log:
+            def log_line(line: str):
+                log.write(line + "\n")
+
+            tool = None
+            run = None
+            try:
+                target = build_target_spec(job)
+                trace_path = os.path.join(output_dir, f"{name}.trace.jsonl") if trace else None
+                tool = await asyncio.to_thread(create_tool, job, backend, pool, log_line, trace_path)
+                run = CenteringRun(tool, target, max_iterations=int(job['max_iterations']),
+                                   tolerance=float(job['tolerance']), setup=prepare_tool,
+                                   checkpoint=checkpoint, resume=resume)
+                async for event in run.events():
+                    if event.kind == 'log':
+                        log_line(event.data['line'])
+                    elif event.kind == 'iteration':
+                        print(f"  {name}: iteration {event.data['iteration'] + 1}, error {event.data['error']:.4f} "
+                              f"(best {event.data['best_error']:.4f}, {event.data['simulations']} simulations)")
+                result['converged'] = await run.wait()
+                await asyncio.to_thread(save_outputs, tool, name, output_dir, result, log_line)
+            except CenteringCancelled:
+                result['error_message'] = "cancelled"
+            except Exception as e:
+                if run is None:
+                    # the engine logs errors of the run itself
+                    log_line(f"ERROR: {e}")
+                result['error_message'] = str(e)
+            finally:
+                if tool is not None:
+                    tool.close()
+
+    result['elapsed'] = time.time() - started
+    with open(os.path.join(output_dir, f"{name}.json"), 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2)
+    return result
+
+
+async def run_batch(jobs: List[Dict], output_dir: str, workers: int,
+                    simulation_workers: Optional[int] = None, trace: bool = False,
+                    resume: bool = False) -> List[Dict]:
+    os.makedirs(output_dir, exist_ok=True)
+    limit = asyncio.Semaphore(workers)
+    # one backend and pool for all devices: --simulation-workers per concurrently centered device
+    backend = create_backend()
+    pool = SimulationPool(backend, workers=workers * (simulation_workers or 1), shared=True)
+
+    async def center(job: Dict) -> Dict:
+        result = await center_device(job, output_dir, backend, pool, limit, trace, resume)
+        status = "✅" if result['converged'] else "❌"
+        print(f"{status} {result['name']} ({result['elapsed']:.1f}s)")
+        return result
+
+    try:
+        # results in job file order
+        return list(await asyncio.gather(*(center(job) for job in jobs)))
+    except asyncio.CancelledError:
+        # Ctrl-C: stop the simulations of every device
+        pool.cancel()
+        backend.cancel()
+        raise
+    finally:
+        pool.close(wait=False)
+        backend.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Center many BSIM4 devices from a job file")
+    parser.add_argument("job_file", help="YAML, JSON or CSV file with one device per row")
+    parser.add_argument("-o", "--output-dir", default="centered_models", help="directory for cards and reports")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="devices centered concurrently (default: CPU count)")
+    parser.add_argument("--simulation-workers", type=int, default=1,
+                        help="parallel simulations per device (default: 1)")
+    parser.add_argument("--trace", action="store_true",
+                        help="write per-stage timing spans to <name>.trace.jsonl")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue every device from its checkpoint in the output directory")
+    args = parser.parse_args(argv)
+
+    jobs = load_job_file(args.job_file)
+    workers = max(1, min(args.jobs, len(jobs)))
+    print(f"Centering {len(jobs)} devices with {workers} workers → {args.output_dir}")
+
+    started = time.time()
+    try:
+        results = asyncio.run(run_batch(jobs, args.output_dir, workers, args.simulation_workers, args.trace,
+                                        args.resume))
+    except KeyboardInterrupt:
+        # asyncio.run cancels the device tasks, which cancels their runs
+        print("Interrupted, running simulations were stopped (--resume continues from the checkpoints)")
+        return 130
+    failed = [result['name'] for result in results if not result['converged']]
+
+    summary = {
+        'job_file': os.path.abspath(args.job_file),
+        'devices': len(results),
+        'converged': len(results) - len(failed),
+        'failed': failed,
+        'elapsed': time.time() - started,
+        'results': results
+    }
+    with open(os.path.join(args.output_dir, "summary.json"), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"{summary['converged']}/{len(results)} devices converged in {summary['elapsed']:.1f}s")
+    if failed:
+        print(f"Not converged: {', '.join(failed)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,337 @@
+# Performance benchmarks
+# Times the centering flow end to end and the pieces that dominate it:
+#   single_simulation  one run_simulation call (cache off)
+#   optimize           a complete optimize_parameters run at fixed targets
+#   library_parse      parsing, lookups and serialization of a large synthetic .lib
+#   batch_throughput   run_simulations_batch for several worker counts
+#   import_time        cold import of the CLI and GUI modules in a fresh interpreter
+# against the analytic stub and, when available, real ngspice (subprocess and
+# shared). Every run is appended to a JSON lines history together with the git
+# revision, and --compare reports the change against the previous run of the
+# same backend, so regressions between versions are visible.
+#
+#   python benchmark.py --backend analytic subprocess --compare
+#   python benchmark.py --quick --history benchmarks.jsonl --fail-on-regression
+#   python benchmark.py --quick --backend analytic --check-import-budget
+
+import io
+import os
+import sys
+import copy
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+import contextlib
+from typing import Callable, Dict, List, Optional
+
+from auto_centering import SkyWaterBSIM4Centering, BSIM4TargetSpec
+from model_library import ModelLibrary
+from simulator import SimulationError, create_backend, probe_ngspice
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MODEL_LIB = os.path.join(REPO_DIR, "skywater_models.lib")
+DEFAULT_HISTORY = os.path.join(REPO_DIR, "benchmark_results.jsonl")
+BENCHMARK_TARGET = BSIM4TargetSpec(vth=0.42, ion=5e-4)
+BACKENDS = ("analytic", "subprocess", "shared")
+
+# cold-start budgets in ms; short-lived batch workers pay them on every launch
+IMPORT_BUDGETS = {'auto_centering': 250, 'batch_centering': 300, 'bsim4_gui': 300}
+# loaded on first use only: importing the CLI or the GUI must not pull these in.
+# Checked on every run, unlike the timings this does not depend on the machine
+DEFERRED_MODULES = ('numpy', 'matplotlib')
+IMPORT_PROBE = ("import sys, time; started = time.perf_counter(); import {module}; "
+                "elapsed = time.perf_counter() - started; "
+                "print(elapsed, *[name for name in {deferred!r} if name in sys.modules])")
+
+
+def measure(function: Callable[[], object], repeat: int) -> Dict[str, float]:
+    # wall times in seconds; 'time' is the best run (least disturbed by other load), comparisons use it
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+    return {'time': min(times), 'median': statistics.median(times), 'max': max(times), 'runs': repeat}
+
+
+def git_revision() -> str:
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                                capture_output=True, text=True, timeout=10)
+        if result.returncode == 0:
+            return result.stdout.strip()
+    except (OSError, subprocess.TimeoutExpired):
+        pass
+    return os.environ.get("GITHUB_SHA", "unknown")[:7]
+
+
+def backend_available(kind: str) -> Optional[str]:
+    # None when usable, otherwise the reason to skip it
+    if kind == "subprocess" and probe_ngspice().executable is None:
+        return "ngspice not found on PATH"
+    if kind == "shared":
+        try:
+            create_backend("shared")
+        except SimulationError as e:
+            return str(e)
+    return None
+
+
+def create_tool(backend: str, model_lib: str, workers: Optional[int] = None) -> SkyWaterBSIM4Centering:
+    tool = SkyWaterBSIM4Centering(model_lib_file=model_lib, backend=create_backend(backend),
+                                  workers=workers, use_cache=False, warm_start=False)
+    tool.extract_nominal_parameters()
+    return tool
+
+
+def bench_single_simulation(backend: str, model_lib: str, repeat: int) -> Dict:
+    tool = create_tool(backend, model_lib)
+    try:
+        params = copy.deepcopy(tool.current_params)
+        # the first run loads the circuit (shared session) and warms file caches
+        tool.run_simulation(params, BENCHMARK_TARGET)
+        return measure(lambda: tool.run_simulation(params, BENCHMARK_TARGET), repeat)
+    finally:
+        tool.close()
+
+
+def bench_optimize(backend: str, model_lib: str, repeat: int) -> Dict:
+    tool = create_tool(backend, model_lib)
+    nominal = copy.deepcopy(tool.current_params)
+    outcome = {}
+
+    def optimize():
+        tool.current_params = copy.deepcopy(nominal)
+        tool.simulation_count = 0
+        outcome['converged'] = tool.optimize_parameters(BENCHMARK_TARGET, max_iterations=10)
+        outcome['simulations'] = tool.simulation_count
+
+    try:
+        return {**measure(optimize, repeat), **outcome}
+    finally:
+        tool.close()
+
+
+def synthetic_library(models: int, params_per_model: int = 80) -> str:
+    # bsim4-like cards with '+' continuation lines, inside two .lib sections
+    lines = ["* synthetic benchmark library", ".lib tt"]
+    for i in range(models):
+        if i == models // 2:
+            lines.extend([".endl tt", ".lib ss"])
+        lines.append(f".model bench_{i}.{i % 8} nmos level=54 version=4.7 lmin={0.15 + i % 8}e-6 lmax=1e-4")
+        values = [f"p{k}={(i + 1) * (k + 1) * 1.37e-3:.6g}" for k in range(params_per_model)]
+        values[:3] = ["vth0=0.35", "u0=0.04", "vsat=8e4"]
+        lines.extend("+ " + " ".join(values[k:k + 6]) for k in range(0, len(values), 6))
+    lines.append(".endl ss")
+    return "\n".join(lines) + "\n"
+
+
+def bench_library_parse(models: int, repeat: int) -> Dict:
+    text = synthetic_library(models)
+    names = [f"bench_{i}.{i % 8}" for i in range(0, models, max(1, models // 200))]
+
+    def parse():
+        library = ModelLibrary.from_text(text)
+        for name in names:
+            library.get(name)
+        library.get(names[0]).set('vth0', 0.4)
+        library.serialize()
+
+    return {**measure(parse, repeat), 'models': models, 'megabytes': len(text) / 1e6}
+
+
+def bench_batch_throughput(backend: str, model_lib: str, worker_counts: List[int], candidates: int,
+                           repeat: int) -> Dict:
+    results = {}
+    for workers in worker_counts:
+        tool = create_tool(backend, model_lib, workers=workers)
+        nominal = tool.current_params
+        params_list = []
+        for k in range(candidates):
+            params = copy.deepcopy(nominal)
+            params.vth0 += 0.001 * k
+            params_list.append(params)
+        try:
+            # the first batch starts and warms up the pool
+            tool.run_simulations_batch(params_list, BENCHMARK_TARGET)
+            stats = measure(lambda: tool.run_simulations_batch(params_list, BENCHMARK_TARGET), repeat)
+        finally:
+            tool.close()
+        stats['simulations_per_second'] = candidates / stats['time']
+        results[f"workers={workers}"] = stats
+    return results
+
+
+def bench_import_time(module: str, repeat: int) -> Dict:
+    # a fresh interpreter per run; bytecode caches are written by the warm-up run
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    env = {**os.environ, 'PYTHONPATH': src_dir}
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    times = []
+    loaded = []
+    for _ in range(repeat + 1):
+        result = subprocess.run([sys.executable, "-c", IMPORT_PROBE.format(module=module, deferred=DEFERRED_MODULES)],
+                                cwd=src_dir, env=env, capture_output=True, text=True, timeout=60)
+        if result.returncode != 0:
+            raise RuntimeError(f"import {module} failed: {result.stderr.strip()}")
+        elapsed, *loaded = result.stdout.split()
+        times.append(float(elapsed))
+    times = times[1:]
+    return {'time': min(times), 'median': statistics.median(times), 'max': max(times), 'runs': repeat,
+            'budget': IMPORT_BUDGETS[module] / 1000, 'eager_modules': loaded}
+
+
+def check_import_budget(results: Dict) -> List[str]:
+    return [f"{module} imports in {stats['time']*1000:.0f} ms (budget {stats['budget']*1000:.0f} ms)"
+            for module, stats in results.items() if stats['time'] > stats['budget']]
+
+
+def check_eager_imports(results: Dict) -> List[str]:
+    return [f"{module} loads {', '.join(stats['eager_modules'])} at import"
+            for module, stats in results.items() if stats['eager_modules']]
+
+
+def run_benchmarks(backend: str, args) -> Dict:
+    repeat = min(args.repeat, 3) if args.quick else args.repeat
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        results['single_simulation'] = bench_single_simulation(backend, args.model_lib, 5 if args.quick else 20)
+        results['optimize'] = bench_optimize(backend, args.model_lib, repeat)
+        results['batch_throughput'] = bench_batch_throughput(backend, args.model_lib, args.workers,
+                                                             8 if args.quick else 32, repeat)
+    return results
+
+
+def flatten(results: Dict, prefix: str = "") -> Dict[str, float]:
+    # 'optimize' -> time, 'batch_throughput/workers=4' -> time, ...
+    flat = {}
+    for name, value in results.items():
+        if isinstance(value, dict) and 'time' in value:
+            flat[prefix + name] = value['time']
+        elif isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{name}/"))
+    return flat
+
+
+def load_history(path: str) -> List[Dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare(record: Dict, history: List[Dict], threshold: float) -> List[str]:
+    # regressions of record against the latest earlier run with the same backend and mode
+    previous = [entry for entry in history
+                if entry['backend'] == record['backend'] and entry.get('quick') == record.get('quick')]
+    if not previous:
+        print(f"  no earlier {record['backend']} run to compare with")
+        return []
+    baseline = previous[-1]
+    print(f"  compared with {baseline['revision']} ({baseline['timestamp']})")
+
+    regressions = []
+    old = flatten(baseline['results'])
+    for name, value in flatten(record['results']).items():
+        if name not in old or old[name] <= 0:
+            continue
+        change = value / old[name] - 1
+        marker = ""
+        if change > threshold:
+            marker = "  REGRESSION"
+            regressions.append(f"{record['backend']}:{name}")
+        print(f"  {name:<32}{old[name]*1000:>11.2f} ms → {value*1000:>9.2f} ms ({change*100:+.1f}%){marker}")
+    return regressions
+
+
+def print_results(backend: str, results: Dict):
+    print(f"\n[{backend}]")
+    for name, seconds in flatten(results).items():
+        print(f"  {name:<32}{seconds*1000:>11.2f} ms")
+    optimize = results.get('optimize')
+    if optimize:
+        print(f"  optimize: {optimize['simulations']} simulations, converged={optimize['converged']}")
+    for name, stats in results.get('batch_throughput', {}).items():
+        print(f"  batch {name}: {stats['simulations_per_second']:.1f} simulations/s")
+    for name, stats in results.get('import_time', {}).items():
+        if stats['eager_modules']:
+            print(f"  import {name}: loads {', '.join(stats['eager_modules'])}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the centering flow and simulator overhead")
+    parser.add_argument("--backend", nargs="*", choices=BACKENDS, default=list(BACKENDS),
+                        help="simulator backends to benchmark (unavailable ones are skipped)")
+    parser.add_argument("--model-lib", default=DEFAULT_MODEL_LIB, help="model library for the centering runs")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="batch worker counts")
+    parser.add_argument("--library-models", type=int, default=5000, help="cards in the synthetic .lib")
+    parser.add_argument("--repeat", type=int, default=3, help="repetitions of the longer benchmarks")
+    parser.add_argument("--quick", action="store_true", help="short runs for CI")
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help="JSON lines file the results are appended to")
+    parser.add_argument("--no-save", action="store_true", help="do not append to the history")
+    parser.add_argument("--compare", action="store_true", help="compare with the previous run in the history")
+    parser.add_argument("--threshold", type=float, default=0.2, help="slowdown reported as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit 1 when a regression is found")
+    parser.add_argument("--check-import-budget", action="store_true",
+                        help="exit 1 when a module imports slower than IMPORT_BUDGETS")
+    args = parser.parse_args(argv)
+
+    history = load_history(args.history)
+    base = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'machine': f"{platform.system()} {platform.machine()} ({os.cpu_count()} CPUs)",
+        'ngspice': probe_ngspice().version,
+        'quick': args.quick
+    }
+
+    # library parsing does not depend on the simulator
+    records = []
+    library_models = 500 if args.quick else args.library_models
+    records.append({**base, 'backend': 'model_library',
+                    'results': {'library_parse': bench_library_parse(library_models, 3 if args.quick else args.repeat)}})
+    print_results('model library', records[0]['results'])
+    imports = {module: bench_import_time(module, 3 if args.quick else args.repeat + 2) for module in IMPORT_BUDGETS}
+    records.append({**base, 'backend': 'startup', 'results': {'import_time': imports}})
+    print_results('startup', records[1]['results'])
+
+    for backend in args.backend:
+        reason = backend_available(backend)
+        if reason is not None:
+            print(f"\n[{backend}] skipped: {reason}")
+            continue
+        results = run_benchmarks(backend, args)
+        records.append({**base, 'backend': backend, 'results': results})
+        print_results(backend, results)
+
+    regressions = []
+    if args.compare:
+        print("\nComparison:")
+        for record in records:
+            regressions.extend(compare(record, history, args.threshold))
+
+    if not args.no_save:
+        with open(args.history, 'a', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+        print(f"\nResults appended to {args.history}")
+
+    if regressions:
+        print(f"Regressions above {args.threshold*100:.0f}%: {', '.join(regressions)}")
+    eager = check_eager_imports(imports)
+    for violation in eager:
+        print(f"Deferred module imported: {violation}")
+    violations = check_import_budget(imports)
+    for violation in violations:
+        print(f"Import budget exceeded: {violation}")
+    if eager or (violations and args.check_import_budget):
+        return 1
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,53 @@
 import tkinter as tk
-from tkinter import ttk, scrolledtext, messagebox
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.figure import Figure
+from tkinter import ttk, scrolledtext, messagebox, filedialog
+import os
+import time
 import threading
+import asyncio
 import queue
-import sys
-import io
-from contextlib import redirect_stdout, redirect_stderr
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+# Console text is inserted in batches at most this often, and trimmed to the last lines
+CONSOLE_INTERVAL_MS = 100
+CONSOLE_MAX_LINES = 5000
+# Queue messages handled per Tk tick, the rest waits for the next one
+MAX_MESSAGES_PER_TICK = 1000
+
+# Job queue: centered cards, reports and logs of queued jobs go here
+JOB_OUTPUT_DIR = "centered_models"
+JOB_COLUMNS = ('name', 'device', 'status', 'progress', 'error', 'simulations', 'elapsed', 'eta')
 
 # Import your existing auto-centering module
 # from auto_centering import SkyWaterBSIM4Centering, BSIM4TargetSpec
 
+@dataclass
+class DashboardJob:
+    id: int
+    fields: Dict                    # batch_centering job fields (name, device_model, vth, ion, ...)
+    status: str = "queued"          # queued, running, converged, not converged, cancelled, error
+    iteration: int = 0
+    error: float = float('nan')
+    simulations: int = 0
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    errors: List[float] = field(default_factory=list)
+    message: str = ""
+    report: str = ""
+    run: object = None              # CenteringRun once the job has started
+    cancel_requested: bool = False
+    
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+    
+    def eta(self) -> Optional[float]:
+        # remaining iterations at the mean time per iteration so far (an upper bound)
+        if self.status != "running" or self.iteration == 0:
+            return None
+        per_iteration = (time.time() - self.started) / self.iteration
+        return per_iteration * max(0, int(self.fields['max_iterations']) - self.iteration)
+
 class BSIM4CenteringGUI:
     def __init__(self, root):
         self.root = root
@@ -21,6 +57,34 @@ class BSIM4CenteringGUI:
         # Queue for thread communication
         self.queue = queue.Queue()
         
+        # Centering runs are driven by an asyncio loop in a background thread
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        self.session = None
+        self.centering_run = None
+        self.live_log = []
+        self.target_vth = None
+        self.target_ion = None
+        self.plots_dirty = False
+        
+        # Console lines waiting for the next flush
+        self.console_buffer = []
+        self.console_flush_pending = False
+        self.polling = False
+        
+        # Job queue: jobs share one backend and one simulation pool sized by Parallel Jobs
+        self.jobs = {}
+        self.job_counter = 0
+        self.job_limit = None
+        self.job_workers = 1
+        self.job_backend = None
+        self.job_pool = None
+        self.compare_lines = {}
+        self.compare_dirty = False
+        
+        # The plot tabs get their figures once the window is up
+        self.figures_created = False
+        
         # Create main container
         main_container = ttk.Frame(root, padding="10")
         main_container.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
@@ -43,6 +107,9 @@ class BSIM4CenteringGUI:
         # Status bar
         self.create_status_bar()
         
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.after_idle(self.create_figures)
+        
     def create_input_panel(self, parent):
         # Input frame
         input_frame = ttk.LabelFrame(parent, text="Input Parameters", padding="10")
@@ -111,6 +178,19 @@ class BSIM4CenteringGUI:
         
         ttk.Button(button_frame, text="Clear Results", command=self.clear_results).pack(side=tk.LEFT, padx=5)
         
+        # Job queue: the same inputs as a queued job, or a whole job file
+        ttk.Separator(input_frame, orient='horizontal').grid(row=13, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=10)
+        ttk.Label(input_frame, text="Job Queue", font=('Arial', 10, 'bold')).grid(row=14, column=0, columnspan=2, pady=(0, 10))
+        
+        ttk.Label(input_frame, text="Parallel Jobs:").grid(row=15, column=0, sticky=tk.W, pady=2)
+        self.parallel_jobs_var = tk.StringVar(value=str(min(4, os.cpu_count() or 1)))
+        ttk.Spinbox(input_frame, from_=1, to=64, textvariable=self.parallel_jobs_var, width=13).grid(row=15, column=1, pady=2)
+        
+        queue_frame = ttk.Frame(input_frame)
+        queue_frame.grid(row=16, column=0, columnspan=2, pady=10)
+        ttk.Button(queue_frame, text="Add to Queue", command=self.add_job_from_inputs).pack(side=tk.LEFT, padx=5)
+        ttk.Button(queue_frame, text="Load Job File...", command=self.load_job_file).pack(side=tk.LEFT, padx=5)
+        
     def create_results_panel(self, parent):
         # Results frame
         results_frame = ttk.LabelFrame(parent, text="Results & Visualization", padding="10")
@@ -129,10 +209,29 @@ class BSIM4CenteringGUI:
         # Summary tab
         self.create_summary_tab(notebook)
         
+        # Job queue and comparison tabs
+        self.create_jobs_tab(notebook)
+        self.create_comparison_tab(notebook)
+        self.notebook = notebook
+        
     def create_convergence_tab(self, notebook):
         conv_frame = ttk.Frame(notebook)
         notebook.add(conv_frame, text="Convergence")
+        self.conv_frame = conv_frame
         
+    def create_figures(self):
+        # matplotlib takes most of the start-up time, so it is imported after the
+        # window is shown; plotting calls this first in case that has not happened yet
+        if self.figures_created:
+            return
+        self.figures_created = True
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        self.create_convergence_figure(Figure, FigureCanvasTkAgg)
+        self.create_parameter_figure(Figure, FigureCanvasTkAgg)
+        self.create_comparison_figure(Figure, FigureCanvasTkAgg)
+        
+    def create_convergence_figure(self, Figure, FigureCanvasTkAgg):
         # Create matplotlib figure
         self.fig_conv = Figure(figsize=(8, 6), dpi=100)
         self.ax_conv = self.fig_conv.add_subplot(111)
@@ -141,13 +240,21 @@ class BSIM4CenteringGUI:
         self.ax_conv.set_title('Optimization Convergence')
         self.ax_conv.grid(True)
         
-        self.canvas_conv = FigureCanvasTkAgg(self.fig_conv, conv_frame)
+        # Lines are created once and extended with set_data as iterations arrive
+        self.line_vth_error, = self.ax_conv.plot([], [], 'b-o', label='Vth Error')
+        self.line_ion_error, = self.ax_conv.plot([], [], 'r-s', label='Ion Error')
+        self.line_total_error, = self.ax_conv.plot([], [], 'g-^', label='Total Error')
+        self.ax_conv.legend()
+        
+        self.canvas_conv = FigureCanvasTkAgg(self.fig_conv, self.conv_frame)
         self.canvas_conv.get_tk_widget().pack(fill=tk.BOTH, expand=True)
         
     def create_parameter_tab(self, notebook):
         param_frame = ttk.Frame(notebook)
         notebook.add(param_frame, text="Parameter Evolution")
+        self.param_frame = param_frame
         
+    def create_parameter_figure(self, Figure, FigureCanvasTkAgg):
         # Create matplotlib figure with subplots
         self.fig_param = Figure(figsize=(8, 6), dpi=100)
         
@@ -175,13 +282,22 @@ class BSIM4CenteringGUI:
         # vsat evolution
         self.ax_vsat = self.fig_param.add_subplot(224)
         self.ax_vsat.set_xlabel('Iteration')
-        self.ax_vsat.set_ylabel('vsat (cm/s)')
+        self.ax_vsat.set_ylabel('vsat (m/s)')
         self.ax_vsat.set_title('Saturation Velocity Evolution')
         self.ax_vsat.grid(True)
         
+        self.line_vth, = self.ax_vth.plot([], [], 'b-o')
+        self.line_vth_target = self.ax_vth.axhline(y=0, color='r', linestyle='--', label='Target', visible=False)
+        self.ax_vth.legend()
+        self.line_ion, = self.ax_ion.plot([], [], 'b-o')
+        self.line_ion_target = self.ax_ion.axhline(y=0, color='r', linestyle='--', label='Target', visible=False)
+        self.ax_ion.legend()
+        self.line_u0, = self.ax_u0.plot([], [], 'g-o')
+        self.line_vsat, = self.ax_vsat.plot([], [], 'g-o')
+        
         self.fig_param.tight_layout()
         
-        self.canvas_param = FigureCanvasTkAgg(self.fig_param, param_frame)
+        self.canvas_param = FigureCanvasTkAgg(self.fig_param, self.param_frame)
         self.canvas_param.get_tk_widget().pack(fill=tk.BOTH, expand=True)
         
     def create_summary_tab(self, notebook):
@@ -192,6 +308,46 @@ class BSIM4CenteringGUI:
         self.summary_text = scrolledtext.ScrolledText(summary_frame, wrap=tk.WORD, height=20)
         self.summary_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         
+    def create_jobs_tab(self, notebook):
+        jobs_frame = ttk.Frame(notebook)
+        notebook.add(jobs_frame, text="Job Queue")
+        
+        self.job_tree = ttk.Treeview(jobs_frame, columns=JOB_COLUMNS, show='headings', selectmode='extended')
+        for column, heading, width in zip(JOB_COLUMNS,
+                                          ('Name', 'Device', 'Status', 'Iteration', 'Error', 'Sims', 'Elapsed', 'ETA'),
+                                          (140, 190, 100, 70, 70, 50, 70, 70)):
+            self.job_tree.heading(column, text=heading)
+            self.job_tree.column(column, width=width, anchor=tk.W if column in ('name', 'device') else tk.CENTER)
+        self.job_tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.job_tree.bind('<<TreeviewSelect>>', lambda event: self.update_comparison())
+        self.job_tree.bind('<Double-1>', lambda event: self.show_job_report())
+        
+        button_frame = ttk.Frame(jobs_frame)
+        button_frame.pack(fill=tk.X, padx=5, pady=(0, 5))
+        ttk.Button(button_frame, text="Cancel Selected", command=self.cancel_selected_jobs).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Show Report", command=self.show_job_report).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Remove Finished", command=self.remove_finished_jobs).pack(side=tk.LEFT, padx=5)
+        self.jobs_status_var = tk.StringVar(value="No jobs")
+        ttk.Label(button_frame, textvariable=self.jobs_status_var).pack(side=tk.RIGHT, padx=5)
+        
+    def create_comparison_tab(self, notebook):
+        compare_frame = ttk.Frame(notebook)
+        notebook.add(compare_frame, text="Job Comparison")
+        self.compare_frame = compare_frame
+        
+    def create_comparison_figure(self, Figure, FigureCanvasTkAgg):
+        # One line per job, the selected jobs (or all) are shown
+        self.fig_compare = Figure(figsize=(8, 6), dpi=100)
+        self.ax_compare = self.fig_compare.add_subplot(111)
+        self.ax_compare.set_xlabel('Iteration')
+        self.ax_compare.set_ylabel('Error (%)')
+        self.ax_compare.set_yscale('log')
+        self.ax_compare.set_title('Convergence by Job')
+        self.ax_compare.grid(True)
+        
+        self.canvas_compare = FigureCanvasTkAgg(self.fig_compare, self.compare_frame)
+        self.canvas_compare.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        
     def create_console_panel(self, parent):
         # Console frame
         console_frame = ttk.LabelFrame(parent, text="Console Output", padding="5")
@@ -206,97 +362,329 @@ class BSIM4CenteringGUI:
         status_bar = ttk.Label(self.root, textvariable=self.status_var, relief=tk.SUNKEN)
         status_bar.grid(row=1, column=0, sticky=(tk.W, tk.E))
         
-    def run_optimization(self):
+    def read_inputs(self):
         # Validate inputs
         try:
-            vth = float(self.vth_var.get())
-            ion = float(self.ion_var.get())
-            length = float(self.length_var.get())
-            width = float(self.width_var.get())
-            vdd = float(self.vdd_var.get())
-            temp = float(self.temp_var.get())
-            iterations = int(self.iterations_var.get())
+            return (float(self.vth_var.get()), float(self.ion_var.get()), float(self.length_var.get()),
+                    float(self.width_var.get()), float(self.vdd_var.get()), float(self.temp_var.get()),
+                    int(self.iterations_var.get()))
         except ValueError:
             messagebox.showerror("Input Error", "Please enter valid numeric values for all parameters.")
+            return None
+        
+    def run_optimization(self):
+        inputs = self.read_inputs()
+        if inputs is None:
             return
+        vth, ion, length, width, vdd, temp, iterations = inputs
         
         # Clear previous results
         self.clear_results()
+        self.target_vth = vth
+        self.target_ion = ion
+        for line, value in ((self.line_vth_target, vth), (self.line_ion_target, ion)):
+            line.set_ydata([value, value])
+            line.set_visible(True)
         
         # Update UI state
         self.run_button.config(state=tk.DISABLED)
         self.stop_button.config(state=tk.NORMAL)
         self.status_var.set("Running optimization...")
         
-        # Run optimization in separate thread
-        self.optimization_thread = threading.Thread(
-            target=self.run_optimization_thread,
-            args=(vth, ion, length, width, vdd, temp, iterations)
-        )
-        self.optimization_thread.start()
+        # Run optimization on the engine loop
+        self.live_log = []
+        self.session = asyncio.run_coroutine_threadsafe(
+            self.run_optimization_session(vth, ion, length, width, vdd, temp, iterations), self.loop)
         
         # Start monitoring queue
-        self.root.after(100, self.check_queue)
+        self.start_polling()
+        
+    async def run_optimization_session(self, vth, ion, length, width, vdd, temp, iterations):
+        # Events stream back to the Tk thread through the queue while the run is going
+        from auto_centering import SkyWaterBSIM4Centering, BSIM4TargetSpec
+        from engine import CenteringRun, route_output
+        
+        def console_line(line):
+            self.queue.put(("console", line + "\n"))
         
-    def run_optimization_thread(self, vth, ion, length, width, vdd, temp, iterations):
         try:
-            # Redirect stdout and stderr to capture print statements
-            stdout_capture = io.StringIO()
-            stderr_capture = io.StringIO()
-            
-            with redirect_stdout(stdout_capture), redirect_stderr(stderr_capture):
-                # Import and run the centering tool
-                from auto_centering import SkyWaterBSIM4Centering, BSIM4TargetSpec
-                
-                # Create centering tool instance
+            with route_output(console_line):
                 centering_tool = SkyWaterBSIM4Centering(
                     model_lib_file=self.model_lib_var.get(),
                     device_model=self.device_model_var.get()
                 )
-                
-                # Check model installation
-                if not centering_tool.check_model_installation():
-                    self.queue.put(("error", "Model installation failed!"))
-                    return
-                
-                # Extract nominal parameters
-                centering_tool.extract_nominal_parameters()
-                
-                # Create target specification
-                target = BSIM4TargetSpec(
-                    vth=vth,
-                    ion=ion,
-                    vdd=vdd,
-                    temp=temp,
-                    length=length,
-                    width=width
-                )
-                
-                # Run optimization
-                success = centering_tool.optimize_parameters(target, max_iterations=iterations)
-                
-                # Get captured output
-                console_output = stdout_capture.getvalue() + stderr_capture.getvalue()
-                self.queue.put(("console", console_output))
-                
-                # Send results
-                self.queue.put(("results", {
-                    "success": success,
-                    "centering_tool": centering_tool,
-                    "iteration_log": centering_tool.iteration_log,
-                    "report": centering_tool.generate_centering_report()
-                }))
-                
         except Exception as e:
             self.queue.put(("error", str(e)))
+            return
+        
+        target = BSIM4TargetSpec(vth=vth, ion=ion, vdd=vdd, temp=temp, length=length, width=width)
+        self.centering_run = CenteringRun(centering_tool, target, max_iterations=iterations, setup=self.setup_tool)
+        
+        outcome = None
+        async for event in self.centering_run.events():
+            if event.kind == "log":
+                console_line(event.data["line"])
+            elif event.kind == "iteration":
+                self.queue.put(("iteration", event.data))
+            else:
+                outcome = event
+        
+        if outcome.kind == "error":
+            self.queue.put(("error", outcome.data["message"]))
+            return
+        
+        # Send results
+        self.queue.put(("results", {
+            "success": outcome.kind == "finished" and outcome.data["success"],
+            "cancelled": outcome.kind == "cancelled",
+            "centering_tool": centering_tool,
+            "iteration_log": centering_tool.iteration_log,
+            "report": centering_tool.generate_centering_report()
+        }))
             
+    @staticmethod
+    def setup_tool(tool):
+        # Check model installation and extract nominal parameters on the worker thread
+        if not tool.check_model_installation():
+            raise RuntimeError("Model installation failed!")
+        tool.extract_nominal_parameters()
+        
+    def add_job_from_inputs(self):
+        inputs = self.read_inputs()
+        if inputs is None:
+            return
+        vth, ion, length, width, vdd, temp, iterations = inputs
+        device_model = self.device_model_var.get()
+        self.submit_job({
+            'name': f"{device_model}_{self.job_counter + 1}", 'model_lib': os.path.abspath(self.model_lib_var.get()),
+            'device_model': device_model, 'vth': vth, 'ion': ion, 'length': length, 'width': width,
+            'vdd': vdd, 'temp': temp, 'max_iterations': iterations, 'tolerance': 0.05, 'optimizer': 'lm'
+        })
+        
+    def load_job_file(self):
+        # The batch_centering job files: YAML, JSON or CSV, one device per row
+        from batch_centering import load_job_file
+        
+        path = filedialog.askopenfilename(title="Load Job File", filetypes=[
+            ("Job files", "*.yaml *.yml *.json *.csv"), ("All files", "*.*")])
+        if not path:
+            return
+        try:
+            job_fields = load_job_file(path)
+        except (SystemExit, OSError, ValueError) as e:
+            messagebox.showerror("Job File Error", str(e))
+            return
+        for fields in job_fields:
+            self.submit_job(fields)
+        
+    def submit_job(self, fields):
+        from batch import SimulationPool
+        from simulator import SimulationError, create_backend
+        
+        if not any(job.active for job in self.jobs.values()):
+            # The parallel job count applies from the next empty queue on: it bounds
+            # both the running jobs and the simulator workers they share
+            try:
+                self.job_workers = max(1, int(self.parallel_jobs_var.get()))
+            except ValueError:
+                self.job_workers = 1
+            self.job_limit = None
+            if self.job_pool is not None and self.job_pool.workers != self.job_workers:
+                self.job_pool.close(wait=False)
+                self.job_pool = None
+        if self.job_backend is None:
+            try:
+                self.job_backend = create_backend()
+            except SimulationError as e:
+                messagebox.showerror("Simulator Error", str(e))
+                return
+        if self.job_pool is None:
+            # Every simulation of every job runs in this pool, one simulator session per worker
+            # (processes for libngspice), so jobs never queue on a single session
+            self.job_pool = SimulationPool(self.job_backend, workers=self.job_workers, shared=True)
+        
+        self.job_counter += 1
+        names = {job.fields['name'] for job in self.jobs.values()}
+        if fields['name'] in names:
+            fields = {**fields, 'name': f"{fields['name']}_{self.job_counter}"}
+        job = DashboardJob(id=self.job_counter, fields=fields)
+        self.jobs[job.id] = job
+        self.job_tree.insert('', tk.END, iid=str(job.id), values=self.job_row(job))
+        asyncio.run_coroutine_threadsafe(self.run_job(job, self.job_workers), self.loop)
+        self.update_jobs_status()
+        self.start_polling()
+        
+    async def run_job(self, job, workers):
+        # Runs on the engine loop; progress goes to the Tk thread through the queue
+        from auto_centering import CenteringCancelled
+        from batch_centering import build_target_spec, create_tool, save_outputs
+        from engine import CenteringRun
+        
+        name = job.fields['name']
+        
+        def log_line(line):
+            self.queue.put(("console", f"[{name}] {line}\n"))
+        
+        def post(kind, **data):
+            self.queue.put(("job", (job.id, kind, data)))
+        
+        if self.job_limit is None:
+            self.job_limit = asyncio.Semaphore(workers)
+        async with self.job_limit:
+            if job.cancel_requested:
+                post("cancelled")
+                return
+            post("running", started=time.time())
+            tool = None
+            try:
+                target = build_target_spec(job.fields)
+                tool = await asyncio.to_thread(create_tool, job.fields, self.job_backend, self.job_pool, log_line)
+                run = CenteringRun(tool, target, max_iterations=int(job.fields['max_iterations']),
+                                   tolerance=float(job.fields['tolerance']), setup=self.setup_tool)
+                job.run = run
+                if job.cancel_requested:
+                    run.cancel()
+                async for event in run.events():
+                    if event.kind == "log":
+                        log_line(event.data["line"])
+                    elif event.kind == "iteration":
+                        post("iteration", iteration=event.data["iteration"], error=event.data["error"],
+                             simulations=event.data["simulations"])
+                converged = await run.wait()
+                outputs = {}
+                os.makedirs(JOB_OUTPUT_DIR, exist_ok=True)
+                await asyncio.to_thread(save_outputs, tool, name, JOB_OUTPUT_DIR, outputs, log_line)
+                post("finished", converged=converged, simulations=tool.simulation_count,
+                     report=tool.generate_centering_report() + f"\n\nCentered model: {outputs['model_card']}")
+            except CenteringCancelled:
+                post("cancelled")
+            except Exception as e:
+                log_line(f"ERROR: {e}")
+                post("error", message=str(e))
+            finally:
+                if tool is not None:
+                    tool.close()
+        
+    def handle_job_event(self, job_id, kind, data):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        if kind == "running":
+            job.status = "running"
+            job.started = data["started"]
+        elif kind == "iteration":
+            job.iteration = data["iteration"] + 1
+            job.error = data["error"]
+            job.simulations = data["simulations"]
+            job.errors.append(data["error"])
+            self.compare_dirty = True
+        else:
+            job.finished = time.time()
+            if kind == "finished":
+                job.status = "converged" if data["converged"] else "not converged"
+                job.simulations = data["simulations"]
+                job.report = data["report"]
+            elif kind == "cancelled":
+                job.status = "cancelled"
+            else:
+                job.status = "error"
+                job.message = data["message"]
+        if self.job_tree.exists(str(job.id)):
+            self.job_tree.item(str(job.id), values=self.job_row(job))
+        
+    @staticmethod
+    def job_row(job):
+        def duration(seconds):
+            return "-" if seconds is None else f"{int(seconds // 60)}:{int(seconds % 60):02d}"
+        
+        elapsed = None
+        if job.started is not None:
+            elapsed = (job.finished or time.time()) - job.started
+        status = job.status if not job.message else f"{job.status}: {job.message}"
+        return (job.fields['name'], job.fields['device_model'], status,
+                f"{job.iteration}/{job.fields['max_iterations']}",
+                f"{job.error:.4f}" if job.errors else "-", job.simulations, duration(elapsed), duration(job.eta()))
+        
+    def update_jobs_status(self):
+        counts = {}
+        for job in self.jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        self.jobs_status_var.set(", ".join(f"{count} {status}" for status, count in counts.items()) or "No jobs")
+        
+    def selected_jobs(self):
+        return [self.jobs[int(iid)] for iid in self.job_tree.selection() if int(iid) in self.jobs]
+        
+    def cancel_selected_jobs(self):
+        # Queued jobs never start, running ones stop their simulations; safe in any state
+        for job in self.selected_jobs():
+            if not job.active:
+                continue
+            job.cancel_requested = True
+            if job.run is not None:
+                job.run.cancel()
+        
+    def remove_finished_jobs(self):
+        for job in [job for job in self.jobs.values() if not job.active]:
+            del self.jobs[job.id]
+            self.job_tree.delete(str(job.id))
+            line = self.compare_lines.pop(job.id, None)
+            if line is not None:
+                line.remove()
+        self.update_jobs_status()
+        self.update_comparison()
+        
+    def show_job_report(self):
+        jobs = self.selected_jobs()
+        if not jobs:
+            return
+        job = jobs[0]
+        self.summary_text.delete(1.0, tk.END)
+        self.summary_text.insert(tk.END, job.report or f"{job.fields['name']}: {job.status} {job.message}".strip())
+        self.notebook.select(2)
+        
+    def update_comparison(self):
+        # Existing lines are extended with set_data; new jobs get a line on their first iteration
+        self.compare_dirty = False
+        self.create_figures()
+        selected = {job.id for job in self.selected_jobs()}
+        for job in self.jobs.values():
+            if not job.errors:
+                continue
+            line = self.compare_lines.get(job.id)
+            if line is None:
+                line, = self.ax_compare.plot([], [], '-o', markersize=3, label=job.fields['name'])
+                self.compare_lines[job.id] = line
+            line.set_data(range(1, len(job.errors) + 1), [max(error * 100, 1e-3) for error in job.errors])
+            line.set_visible(not selected or job.id in selected)
+        visible_lines = [line for line in self.compare_lines.values() if line.get_visible()]
+        if visible_lines:
+            self.ax_compare.legend(handles=visible_lines, fontsize='small')
+        elif self.ax_compare.get_legend() is not None:
+            self.ax_compare.get_legend().remove()
+        self.ax_compare.relim(visible_only=True)
+        self.ax_compare.autoscale_view()
+        self.canvas_compare.draw_idle()
+        
+    def start_polling(self):
+        if not self.polling:
+            self.polling = True
+            self.root.after(100, self.check_queue)
+        
     def check_queue(self):
+        # Drain a bounded number of messages, then redraw once
         try:
-            while True:
+            for _ in range(MAX_MESSAGES_PER_TICK):
                 msg_type, msg_data = self.queue.get_nowait()
                 
                 if msg_type == "console":
                     self.update_console(msg_data)
+                elif msg_type == "iteration":
+                    self.live_log.append(msg_data)
+                    self.plots_dirty = True
+                    self.status_var.set(f"Iteration {msg_data['iteration'] + 1}: error {msg_data['error']:.4f} "
+                                        f"({msg_data['simulations']} simulations)")
+                elif msg_type == "job":
+                    self.handle_job_event(*msg_data)
                 elif msg_type == "results":
                     self.display_results(msg_data)
                 elif msg_type == "error":
@@ -305,99 +693,57 @@ class BSIM4CenteringGUI:
                     
         except queue.Empty:
             pass
+        
+        if self.plots_dirty:
+            self.plot_iterations(self.live_log)
+        if self.compare_dirty:
+            self.update_comparison()
+        # Elapsed time and ETA of the running jobs
+        for job in self.jobs.values():
+            if job.status == "running":
+                self.job_tree.item(str(job.id), values=self.job_row(job))
+        if self.jobs:
+            self.update_jobs_status()
             
-        # Continue checking if thread is alive
-        if hasattr(self, 'optimization_thread') and self.optimization_thread.is_alive():
+        # Continue checking while the session or a queued job is running
+        session_running = self.session is not None and not self.session.done()
+        if session_running or any(job.active for job in self.jobs.values()):
             self.root.after(100, self.check_queue)
+        elif not self.queue.empty():
+            self.root.after(0, self.check_queue)
         else:
+            self.polling = False
+        if not session_running and self.queue.empty():
             self.optimization_complete()
             
     def update_console(self, text):
+        # Lines are collected and inserted together by flush_console
+        self.console_buffer.append(text)
+        if not self.console_flush_pending:
+            self.console_flush_pending = True
+            self.root.after(CONSOLE_INTERVAL_MS, self.flush_console)
+    
+    def flush_console(self):
+        self.console_flush_pending = False
+        if not self.console_buffer:
+            return
+        text = "".join(self.console_buffer)
+        self.console_buffer = []
         self.console_text.insert(tk.END, text)
+        # Keep the widget short, very long runs would slow down every insert
+        lines = int(self.console_text.index('end-1c').split('.')[0])
+        if lines > CONSOLE_MAX_LINES:
+            self.console_text.delete(1.0, f"{lines - CONSOLE_MAX_LINES + 1}.0")
         self.console_text.see(tk.END)
-        self.root.update_idletasks()
         
     def display_results(self, results):
         if not results["iteration_log"]:
             return
-            
-        # Update convergence plot
-        iterations = []
-        vth_errors = []
-        ion_errors = []
-        total_errors = []
-        
-        target_vth = float(self.vth_var.get())
-        target_ion = float(self.ion_var.get())
-        
-        for log in results["iteration_log"]:
-            iterations.append(log["iteration"] + 1)
-            
-            vth = log["specs"]["vth"]
-            ion = log["specs"]["ion"]
-            
-            vth_error = abs((vth - target_vth) / target_vth) * 100
-            ion_error = abs((ion - target_ion) / target_ion) * 100
-            
-            vth_errors.append(vth_error)
-            ion_errors.append(ion_error)
-            total_errors.append(log["error"] * 100)
-        
-        self.ax_conv.clear()
-        self.ax_conv.plot(iterations, vth_errors, 'b-o', label='Vth Error')
-        self.ax_conv.plot(iterations, ion_errors, 'r-s', label='Ion Error')
-        self.ax_conv.plot(iterations, total_errors, 'g-^', label='Total Error')
-        self.ax_conv.set_xlabel('Iteration')
-        self.ax_conv.set_ylabel('Error (%)')
-        self.ax_conv.set_title('Optimization Convergence')
-        self.ax_conv.legend()
-        self.ax_conv.grid(True)
-        self.canvas_conv.draw()
-        
-        # Update parameter evolution plots
-        vth_values = [log["specs"]["vth"] for log in results["iteration_log"]]
-        ion_values = [log["specs"]["ion"] for log in results["iteration_log"]]
-        u0_values = [log["params"]["u0"] for log in results["iteration_log"]]
-        vsat_values = [log["params"]["vsat"] for log in results["iteration_log"]]
-        
-        # Vth plot
-        self.ax_vth.clear()
-        self.ax_vth.plot(iterations, vth_values, 'b-o')
-        self.ax_vth.axhline(y=target_vth, color='r', linestyle='--', label='Target')
-        self.ax_vth.set_xlabel('Iteration')
-        self.ax_vth.set_ylabel('Vth (V)')
-        self.ax_vth.set_title('Vth Evolution')
-        self.ax_vth.legend()
-        self.ax_vth.grid(True)
-        
-        # Ion plot
-        self.ax_ion.clear()
-        self.ax_ion.plot(iterations, ion_values, 'b-o')
-        self.ax_ion.axhline(y=target_ion, color='r', linestyle='--', label='Target')
-        self.ax_ion.set_xlabel('Iteration')
-        self.ax_ion.set_ylabel('Ion (A/μm)')
-        self.ax_ion.set_title('Ion Evolution')
-        self.ax_ion.legend()
-        self.ax_ion.grid(True)
-        
-        # u0 plot
-        self.ax_u0.clear()
-        self.ax_u0.plot(iterations, u0_values, 'g-o')
-        self.ax_u0.set_xlabel('Iteration')
-        self.ax_u0.set_ylabel('u0 (cm²/V·s)')
-        self.ax_u0.set_title('Mobility (u0) Evolution')
-        self.ax_u0.grid(True)
-        
-        # vsat plot
-        self.ax_vsat.clear()
-        self.ax_vsat.plot(iterations, vsat_values, 'g-o')
-        self.ax_vsat.set_xlabel('Iteration')
-        self.ax_vsat.set_ylabel('vsat (cm/s)')
-        self.ax_vsat.set_title('Saturation Velocity Evolution')
-        self.ax_vsat.grid(True)
         
-        self.fig_param.tight_layout()
-        self.canvas_param.draw()
+        # The live plots already hold every iteration, only resync if events were missed
+        if len(results["iteration_log"]) != len(self.live_log):
+            self.live_log = list(results["iteration_log"])
+            self.plot_iterations(self.live_log)
         
         # Update summary
         self.summary_text.delete(1.0, tk.END)
@@ -408,38 +754,79 @@ class BSIM4CenteringGUI:
             output_file = results["centering_tool"].save_centered_model()
             self.summary_text.insert(tk.END, f"\n\n✅ Centered model saved to: {output_file}")
             self.status_var.set(f"Optimization completed successfully! Model saved to {output_file}")
+        elif results["cancelled"]:
+            self.status_var.set("Optimization cancelled")
         else:
             self.status_var.set("Optimization did not converge to target specs")
+    
+    def plot_iterations(self, iteration_log):
+        # Point the existing lines at the new data and let Tk redraw when idle
+        self.plots_dirty = False
+        self.create_figures()
+        iterations = [log["iteration"] + 1 for log in iteration_log]
+        vth_values = [log["specs"]["vth"] for log in iteration_log]
+        ion_values = [log["specs"]["ion"] for log in iteration_log]
+        
+        self.line_vth_error.set_data(iterations, [abs((vth - self.target_vth) / self.target_vth) * 100
+                                                  for vth in vth_values])
+        self.line_ion_error.set_data(iterations, [abs((ion - self.target_ion) / self.target_ion) * 100
+                                                  for ion in ion_values])
+        self.line_total_error.set_data(iterations, [log["error"] * 100 for log in iteration_log])
+        self.line_vth.set_data(iterations, vth_values)
+        self.line_ion.set_data(iterations, ion_values)
+        self.line_u0.set_data(iterations, [log["params"]["u0"] for log in iteration_log])
+        self.line_vsat.set_data(iterations, [log["params"]["vsat"] for log in iteration_log])
+        
+        for ax in (self.ax_conv, self.ax_vth, self.ax_ion, self.ax_u0, self.ax_vsat):
+            ax.relim(visible_only=True)
+            ax.autoscale_view()
+        self.canvas_conv.draw_idle()
+        self.canvas_param.draw_idle()
             
     def optimization_complete(self):
         self.run_button.config(state=tk.NORMAL)
         self.stop_button.config(state=tk.DISABLED)
         
     def stop_optimization(self):
-        # This would need to be implemented with proper thread interruption
-        messagebox.showinfo("Stop", "Stop functionality not yet implemented")
+        # Kills the running simulations, the best parameters so far are kept
+        if self.centering_run is not None:
+            self.centering_run.cancel()
+            self.status_var.set("Stopping optimization...")
         
     def clear_results(self):
-        # Clear plots
-        self.ax_conv.clear()
-        self.ax_conv.set_xlabel('Iteration')
-        self.ax_conv.set_ylabel('Error (%)')
-        self.ax_conv.set_title('Optimization Convergence')
-        self.ax_conv.grid(True)
-        self.canvas_conv.draw()
-        
-        self.ax_vth.clear()
-        self.ax_ion.clear()
-        self.ax_u0.clear()
-        self.ax_vsat.clear()
-        self.fig_param.tight_layout()
-        self.canvas_param.draw()
+        # Empty the lines, the axes and legends stay
+        self.create_figures()
+        for line in (self.line_vth_error, self.line_ion_error, self.line_total_error,
+                     self.line_vth, self.line_ion, self.line_u0, self.line_vsat):
+            line.set_data([], [])
+        self.line_vth_target.set_visible(False)
+        self.line_ion_target.set_visible(False)
+        self.live_log = []
+        self.plots_dirty = False
+        self.canvas_conv.draw_idle()
+        self.canvas_param.draw_idle()
         
         # Clear text
+        self.console_buffer = []
         self.console_text.delete(1.0, tk.END)
         self.summary_text.delete(1.0, tk.END)
         self.status_var.set("Ready")
 
+    def on_close(self):
+        # Stop every run and take the simulator processes down with the window
+        if self.centering_run is not None:
+            self.centering_run.cancel()
+        for job in self.jobs.values():
+            job.cancel_requested = True
+            if job.run is not None:
+                job.run.cancel()
+        if self.job_pool is not None:
+            self.job_pool.cancel()
+            self.job_pool.close(wait=False)
+        if self.job_backend is not None:
+            self.job_backend.close()
+        self.root.destroy()
+
 def main():
     root = tk.Tk()
     app = BSIM4CenteringGUI(root)
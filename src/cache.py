@@ -0,0 +1,146 @@
+# Content-addressed on-disk cache for simulation results
+# Keys are sha256 hashes of a canonical JSON encoding of everything that
+# determines a result (parameters, the simulated parts of the target spec,
+# model file contents, ...). Entries live in a SQLite file, which gives safe
+# concurrent access from many threads and processes; the least recently used
+# entries are evicted in batches once the cache grows beyond max_entries.
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Optional, Tuple
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "auto-centering", "simulations.sqlite")
+
+_digest_cache: Dict[Tuple[str, int, int], str] = {}
+
+
+def file_digest(path: str) -> str:
+    # sha256 of the file contents, recomputed only when the file changes
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    if key not in _digest_cache:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        _digest_cache[key] = digest.hexdigest()
+    return _digest_cache[key]
+
+
+def _canonical(value):
+    if isinstance(value, float):
+        return repr(value)
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    return value
+
+
+class SimulationCache:
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = 100000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.local = threading.local()
+        self.counter_lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self.connection() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS results ("
+                         "key TEXT PRIMARY KEY, value TEXT NOT NULL, last_used REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results(last_used)")
+            # running estimate of the entry count, recounted only when it passes max_entries
+            self.entries = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def connection(self) -> sqlite3.Connection:
+        # sqlite connections must not be shared between threads
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self.local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(**parts) -> str:
+        encoded = json.dumps(_canonical(parts), sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(encoded.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, float]]:
+        try:
+            with self.connection() as conn:
+                row = conn.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+        except sqlite3.Error as e:
+            print(f"Warning: simulation cache read failed: {e}")
+            row = None
+
+        with self.counter_lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return json.loads(row[0]) if row is not None else None
+
+    def put(self, key: str, value: Dict[str, float]):
+        try:
+            with self.connection() as conn:
+                conn.execute("INSERT OR REPLACE INTO results (key, value, last_used) VALUES (?, ?, ?)",
+                             (key, json.dumps(value), time.time()))
+                with self.counter_lock:
+                    # replaced keys and other processes' writes make this an estimate
+                    self.entries += 1
+                    full = self.entries > self.max_entries
+                if full:
+                    self.evict(conn)
+        except sqlite3.Error as e:
+            print(f"Warning: simulation cache write failed: {e}")
+
+    def evict(self, conn: sqlite3.Connection):
+        # evict a tenth of the cache at once, so the count is only taken every max_entries/10 puts
+        count = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        excess = count - self.max_entries + max(1, self.max_entries // 10) if count > self.max_entries else 0
+        if excess:
+            conn.execute("DELETE FROM results WHERE key IN ("
+                         "SELECT key FROM results ORDER BY last_used LIMIT ?)", (excess,))
+        with self.counter_lock:
+            self.entries = count - excess
+
+    def clear(self):
+        with self.connection() as conn:
+            conn.execute("DELETE FROM results")
+        self.entries = 0
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, float]:
+        with self.connection() as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': entries
+        }
+
+
+def create_cache(path: Optional[str] = None) -> Optional[SimulationCache]:
+    # AUTO_CENTERING_CACHE=off disables caching, any other value is the cache file
+    setting = path or os.environ.get("AUTO_CENTERING_CACHE", DEFAULT_CACHE_PATH)
+    if setting.lower() in ("off", "none", "0", ""):
+        return None
+    try:
+        return SimulationCache(setting)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Warning: simulation cache disabled ({e})")
+        return None
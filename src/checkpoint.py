@@ -0,0 +1,90 @@
+# Checkpoints of long centering runs
+# optimize_parameters(checkpoint=path) writes the run state after every
+# iteration: current and best parameters, the iteration log, the simulation
+# count and the optimizer's state (Jacobian and damping, trust region,
+# population, RNG state, ...). resume=True continues from the checkpoint at
+# the next iteration, so completed iterations are not simulated again;
+# evaluations finished after the last checkpoint come from the simulation
+# cache. A checkpoint only resumes the run it was written for: same device,
+# model library, backend, target, tunables and optimizer.
+#
+# The file is gzip-compressed JSON and replaced atomically, so a process
+# killed while writing leaves the previous checkpoint intact.
+#
+#   tool.optimize_parameters(spec, max_iterations=40, checkpoint="nfet.ckpt.json.gz")
+#   tool.optimize_parameters(spec, max_iterations=40, checkpoint="nfet.ckpt.json.gz", resume=True)
+
+import os
+import gzip
+import json
+import hashlib
+from typing import Dict, Optional
+
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+
+CHECKPOINT_VERSION = 1
+
+
+def run_key(**parts) -> str:
+    # what must match for a checkpoint to be resumed
+    encoded = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def encode_state(value):
+    # arrays and parameter sets become tagged dicts, the rest is plain JSON
+    if isinstance(value, np.ndarray):
+        return {'__array__': value.tolist(), 'dtype': str(value.dtype)}
+    if isinstance(value, np.generic):
+        return value.item()
+    if hasattr(value, 'to_dict'):
+        # BSIM4Parameters or BSIM4BinnedParameters
+        return {'__params__': value.to_dict()}
+    if isinstance(value, dict):
+        return {key: encode_state(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode_state(item) for item in value]
+    return value
+
+
+def decode_state(value, centering):
+    # parameter sets are rebuilt on the tool's current parameters
+    if isinstance(value, dict):
+        if '__array__' in value:
+            return np.array(value['__array__'], dtype=value['dtype'])
+        if '__params__' in value:
+            return centering.parameters_from_dict(value['__params__'])
+        return {key: decode_state(item, centering) for key, item in value.items()}
+    if isinstance(value, list):
+        return [decode_state(item, centering) for item in value]
+    return value
+
+
+def save_checkpoint(path: str, key: str, state: Dict):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with gzip.open(temp_path, 'wt', encoding='utf-8') as f:
+        json.dump({'version': CHECKPOINT_VERSION, 'key': key, 'state': encode_state(state)}, f)
+    os.replace(temp_path, path)
+
+
+def load_checkpoint(path: str, key: str) -> Optional[Dict]:
+    # the encoded state, or None when there is no usable checkpoint for this run
+    if not os.path.exists(path):
+        return None
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Warning: checkpoint {path} is unreadable ({e}), starting over")
+        return None
+    if data.get('version') != CHECKPOINT_VERSION:
+        print(f"Warning: checkpoint {path} has an old format, starting over")
+        return None
+    if data.get('key') != key:
+        print(f"Warning: checkpoint {path} belongs to a different run, starting over")
+        return None
+    return data['state']
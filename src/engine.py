@@ -0,0 +1,210 @@
+# Asynchronous centering engine
+# Runs SkyWaterBSIM4Centering.optimize_parameters in a worker thread and
+# streams its progress to asyncio consumers: per-iteration events, console
+# lines ('log' events) and one terminal event (finished / cancelled / error).
+# Many runs can be driven from one event loop; cancelling a run kills the
+# simulations it has in flight.
+#
+#   run = CenteringRun(tool, spec, max_iterations=10)
+#   async for event in run.events():
+#       ...
+#   converged = await run.wait()
+
+import sys
+import asyncio
+import threading
+import contextlib
+import contextvars
+from typing import Callable, Optional
+
+from auto_centering import CenteringEvent, CenteringCancelled
+
+TERMINAL_EVENTS = ('finished', 'cancelled', 'error')
+
+
+class _ContextRoutedOutput:
+    # stdout replacement that hands complete lines to the sink of the current context
+    # (see route_output); code outside any route keeps writing to the original stream
+
+    def __init__(self, default):
+        self.default = default
+
+    def write(self, text: str) -> int:
+        route = _output_route.get()
+        if route is None:
+            return self.default.write(text)
+        route.write(text)
+        return len(text)
+
+    def flush(self):
+        self.default.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.default, name)
+
+
+class _OutputRoute:
+    # one sink, written from the run's own thread and from the pool threads it submits to;
+    # partial lines are kept per thread so concurrent prints do not interleave
+
+    def __init__(self, sink: Callable[[str], None]):
+        self.sink = sink
+        self.pending = {}   # thread ident -> text after the last newline
+        self.lock = threading.Lock()
+
+    def write(self, text: str):
+        ident = threading.get_ident()
+        with self.lock:
+            lines = (self.pending.pop(ident, "") + text).split('\n')
+            if lines[-1]:
+                self.pending[ident] = lines[-1]
+        for line in lines[:-1]:
+            self.sink(line)
+
+    def close(self):
+        with self.lock:
+            pending, self.pending = list(self.pending.values()), {}
+        for text in pending:
+            self.sink(text)
+
+
+_output_route = contextvars.ContextVar('output_route', default=None)
+_output_lock = threading.Lock()
+_output_users = 0
+
+
+@contextlib.contextmanager
+def route_output(sink: Callable[[str], None]):
+    # print() of the calling context goes to sink line by line, also from the jobs it
+    # hands to SimulationPool threads; other threads and asyncio tasks are unaffected.
+    # sys.stdout stays replaced while any route is active
+    global _output_users
+    with _output_lock:
+        if not isinstance(sys.stdout, _ContextRoutedOutput):
+            sys.stdout = _ContextRoutedOutput(sys.stdout)
+        router = sys.stdout
+        _output_users += 1
+    route = _OutputRoute(sink)
+    token = _output_route.set(route)
+    try:
+        yield
+    finally:
+        _output_route.reset(token)
+        with _output_lock:
+            _output_users -= 1
+            if not _output_users and sys.stdout is router:
+                sys.stdout = router.default
+        route.close()
+
+
+class CenteringRun:
+
+    def __init__(self, tool, target_spec, max_iterations: int = 5, tolerance: float = 0.05,
+                 setup: Optional[Callable] = None, checkpoint: Optional[str] = None, resume: bool = False):
+        # setup(tool) runs on the worker thread first, e.g. model checks and nominal extraction
+        self.tool = tool
+        self.target_spec = target_spec
+        self.max_iterations = max_iterations
+        self.tolerance = tolerance
+        self.setup = setup
+        self.checkpoint = checkpoint
+        self.resume = resume
+        self.loop = None
+        self.queue = None
+        self.done = None
+        self.thread = None
+        self.cancel_requested = False
+        self.terminal_sent = False
+
+    def start(self):
+        # must be called from the event loop that consumes the events
+        if self.thread is not None:
+            return
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        self.done = self.loop.create_future()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def cancel(self):
+        # safe from any thread, also before the run has started optimizing
+        self.cancel_requested = True
+        self.tool.cancel()
+
+    def _post(self, event: CenteringEvent):
+        if event.kind == 'start' and self.cancel_requested:
+            # optimize_parameters clears the cancel flag when it starts
+            self.tool.cancel_event.set()
+        if event.kind in TERMINAL_EVENTS:
+            self.terminal_sent = True
+        try:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, event)
+        except RuntimeError:
+            # the event loop is gone, nobody is listening any more
+            pass
+
+    def _finish(self, result: Optional[bool], error: Optional[BaseException]):
+        def resolve():
+            if self.done.done():
+                return
+            if error is not None:
+                self.done.set_exception(error)
+                # consumers that only follow events() never await the outcome
+                self.done.exception()
+            else:
+                self.done.set_result(result)
+        try:
+            self.loop.call_soon_threadsafe(resolve)
+        except RuntimeError:
+            pass
+
+    def _run(self):
+        previous_callback = self.tool.event_callback
+        self.tool.event_callback = self._post
+        result = None
+        error = None
+        try:
+            with route_output(lambda line: self._post(CenteringEvent('log', {'line': line}))):
+                try:
+                    if self.cancel_requested:
+                        raise CenteringCancelled("Centering cancelled")
+                    if self.setup is not None:
+                        self.setup(self.tool)
+                    result = self.tool.optimize_parameters(self.target_spec, max_iterations=self.max_iterations,
+                                                           tolerance=self.tolerance, checkpoint=self.checkpoint,
+                                                           resume=self.resume)
+                    if not self.terminal_sent:
+                        # optimize_parameters rejected the spec before starting
+                        self._post(CenteringEvent('finished', {'success': result, 'error': float('inf'),
+                                                               'simulations': self.tool.simulation_count}))
+                except CenteringCancelled as e:
+                    error = e
+                    if not self.terminal_sent:
+                        self._post(CenteringEvent('cancelled', {'simulations': self.tool.simulation_count}))
+                except Exception as e:
+                    error = e
+                    print(f"ERROR: {e}")
+                    self._post(CenteringEvent('error', {'message': str(e)}))
+        finally:
+            self.tool.event_callback = previous_callback
+            self._finish(result, error)
+
+    async def events(self):
+        # yields CenteringEvents up to and including the terminal one;
+        # leaving the loop early cancels the run
+        self.start()
+        try:
+            while True:
+                event = await self.queue.get()
+                yield event
+                if event.kind in TERMINAL_EVENTS:
+                    return
+        finally:
+            if self.thread.is_alive():
+                self.cancel()
+
+    async def wait(self) -> bool:
+        # converged flag; raises CenteringCancelled or the error that stopped the run
+        self.start()
+        return await self.done
+
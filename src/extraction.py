@@ -0,0 +1,139 @@
+# Vectorized I-V metric extraction
+# Metrics are computed with NumPy from full Id-Vgs sweeps: a linear sweep at
+# low Vds and a saturation sweep at Vds = VDD give Vth, Vth(gm), SS, DIBL, Ion
+# and Ioff without extra simulator passes. An adaptive linear sweep only covers
+# a window around Vth and gives no Vth(gm) or SS. Functions work along the last axis,
+# so a stack of sweeps (e.g. one per geometry or Monte Carlo sample) is
+# extracted in one call.
+
+from __future__ import annotations
+
+from typing import Dict, Iterable, Optional
+
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+
+CONSTANT_CURRENT = 140e-9   # A per square, Vth criterion Id > 140nA * W/L
+
+
+def threshold_current(width: float, length: float) -> float:
+    return CONSTANT_CURRENT * (width / length)
+
+
+def crossing_voltage(vgs, ids, level) -> np.ndarray:
+    # first point where ids rises through level, linearly interpolated;
+    # NaN when the sweep never crosses (or already starts above level)
+    vgs = np.asarray(vgs, dtype=float)
+    ids = np.asarray(ids, dtype=float)
+    level = np.asarray(level, dtype=float)[..., None]
+    vgs = np.broadcast_to(vgs, ids.shape)
+
+    above = ids >= level
+    index = np.argmax(above, axis=-1)[..., None]
+    found = np.take_along_axis(above, index, axis=-1) & (index > 0)
+    previous = np.maximum(index - 1, 0)
+
+    i0 = np.take_along_axis(ids, previous, axis=-1)
+    i1 = np.take_along_axis(ids, index, axis=-1)
+    v0 = np.take_along_axis(vgs, previous, axis=-1)
+    v1 = np.take_along_axis(vgs, index, axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        v = v0 + (level - i0) / (i1 - i0) * (v1 - v0)
+    return np.where(found, v, np.nan)[..., 0]
+
+
+def current_at(vgs, ids, voltage: float) -> np.ndarray:
+    # drain current at one gate voltage of a monotonic sweep
+    vgs = np.asarray(vgs, dtype=float)
+    ids = np.asarray(ids, dtype=float)
+    if ids.ndim == 1:
+        return np.interp(voltage, vgs, ids)
+    if vgs.ndim == 1:
+        # one shared sweep axis: a single interpolation weight for the whole stack
+        index = int(np.clip(np.searchsorted(vgs, voltage), 1, len(vgs) - 1))
+        t = float(np.clip((voltage - vgs[index - 1]) / (vgs[index] - vgs[index - 1]), 0, 1))
+        return ids[..., index - 1] + t * (ids[..., index] - ids[..., index - 1])
+    rows = zip(np.broadcast_to(vgs, ids.shape).reshape(-1, ids.shape[-1]), ids.reshape(-1, ids.shape[-1]))
+    return np.array([np.interp(voltage, v, row) for v, row in rows]).reshape(ids.shape[:-1])
+
+
+def max_gm_vth(vgs, ids, vds: float) -> np.ndarray:
+    # linear extrapolation at the point of maximum transconductance
+    vgs = np.asarray(vgs, dtype=float)
+    ids = np.asarray(ids, dtype=float)
+    gm = np.gradient(ids, vgs, axis=-1)
+    index = np.argmax(gm, axis=-1)[..., None]
+    vgs = np.broadcast_to(vgs, ids.shape)
+    g = np.take_along_axis(gm, index, axis=-1)
+    # a flat curve has no linear region, its gradient is rounding noise
+    rising = (ids[..., -1] > ids[..., 0])[..., None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vth = (np.take_along_axis(vgs, index, axis=-1)
+               - np.take_along_axis(ids, index, axis=-1) / g - vds / 2)
+    return np.where((g > 0) & rising, vth, np.nan)[..., 0]
+
+
+def subthreshold_swing(vgs, ids, level) -> np.ndarray:
+    # steepest slope below level, in mV/decade
+    vgs = np.asarray(vgs, dtype=float)
+    ids = np.asarray(ids, dtype=float)
+    level = np.asarray(level, dtype=float)[..., None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_ids = np.log10(np.where(ids > 0, ids, np.nan))
+        slope = np.diff(log_ids, axis=-1) / np.diff(vgs, axis=-1)
+    below = (ids[..., 1:] <= level) & np.isfinite(slope) & (slope > 0)
+    steepest = np.max(np.where(below, slope, 0), axis=-1)
+    with np.errstate(divide='ignore'):
+        return np.where(steepest > 0, 1000 / steepest, np.nan)
+
+
+def peak_gm(vgs, ids) -> np.ndarray:
+    vgs = np.asarray(vgs, dtype=float)
+    ids = np.asarray(ids, dtype=float)
+    return np.max(np.gradient(ids, vgs, axis=-1), axis=-1)
+
+
+def output_resistance(vds, ids, width: float) -> np.ndarray:
+    # dVds/dId over the end of an output sweep, in ohm-um
+    vds = np.asarray(vds, dtype=float)
+    ids = np.asarray(ids, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rout = (vds[..., -1] - vds[..., -2]) / (ids[..., -1] - ids[..., -2]) * width * 1e6
+    return np.where(rout > 0, rout, np.nan)
+
+
+def iv_metric_arrays(vgs_lin, id_lin, vgs_sat, id_sat, vds_lin: float, vdd: float,
+                     width: float, length: float, metrics: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+    # currents are normalized to A/um, voltages in V, SS in mV/dec, DIBL in mV/V;
+    # one value per sweep of the stack. gm and idlin are only computed when listed in metrics
+    level = threshold_current(width, length)
+    width_microns = width * 1e6
+    metrics = set(metrics or ())
+
+    vth = crossing_voltage(vgs_lin, id_lin, level)
+    vth_sat = crossing_voltage(vgs_sat, id_sat, level)
+    # a linear sweep that starts above 0V is an adaptive window around Vth,
+    # too narrow for the max-gm Vth and the subthreshold swing
+    windowed = float(np.min(vgs_lin)) > 0
+    nan = np.full(np.shape(vth), np.nan)
+    results = {
+        'vth': vth,
+        'vth_gm': nan if windowed else max_gm_vth(vgs_lin, id_lin, vds_lin),
+        'vth_sat': vth_sat,
+        'ss': nan if windowed else subthreshold_swing(vgs_lin, id_lin, level),
+        'dibl': (vth - vth_sat) / (vdd - vds_lin) * 1000,
+        'ion': current_at(vgs_sat, id_sat, vdd) / width_microns,
+        'ioff': current_at(vgs_sat, id_sat, 0.0) / width_microns
+    }
+    if 'gm' in metrics:
+        results['gm'] = peak_gm(vgs_lin, id_lin) / width_microns
+    if 'idlin' in metrics:
+        results['idlin'] = current_at(vgs_lin, id_lin, vdd) / width_microns
+    return results
+
+
+def extract_iv_metrics(vgs_lin, id_lin, vgs_sat, id_sat, vds_lin: float, vdd: float,
+                       width: float, length: float, metrics: Optional[Iterable[str]] = None) -> Dict[str, float]:
+    arrays = iv_metric_arrays(vgs_lin, id_lin, vgs_sat, id_sat, vds_lin, vdd, width, length, metrics)
+    return {name: float(value) for name, value in arrays.items()}
@@ -0,0 +1,35 @@
+# Deferred imports for fast startup
+# NumPy and matplotlib take most of the import time of the CLI and the GUI.
+# lazy_import returns a stand-in module that imports the real one on the first
+# attribute access, so short-lived batch workers, --help and the GUI window do
+# not pay for code paths they never reach. The first access may come from
+# several centering threads at once, so loading is locked (importlib's
+# LazyLoader is not thread-safe before Python 3.12). Modules that use a lazy
+# module in annotations import annotations from __future__.
+#
+#   np = lazy_import("numpy")
+#   np.array([1.0])     # numpy is loaded here
+
+import sys
+import threading
+import importlib
+from types import ModuleType
+
+
+class LazyModule(ModuleType):
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__['_lazy_lock'] = threading.Lock()
+
+    def __getattr__(self, attribute: str):
+        # only called for attributes not copied yet
+        with self.__dict__['_lazy_lock']:
+            module = importlib.import_module(self.__name__)
+            # later lookups find the module's attributes without coming here
+            self.__dict__.update(module.__dict__)
+        return getattr(module, attribute)
+
+
+def lazy_import(name: str) -> ModuleType:
+    return sys.modules.get(name) or LazyModule(name)
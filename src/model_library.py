@@ -0,0 +1,188 @@
+# SPICE model library parser
+# Parses a .lib file once into model cards indexed by name, with typed
+# parameter maps and support for '+' continuation lines and .lib sections.
+# Serializing the library only re-writes the cards that were modified; all
+# other text is emitted exactly as it was read.
+
+import re
+from typing import Dict, List, Optional, Union
+from dataclasses import dataclass, field
+
+SPICE_SUFFIXES = {
+    't': 1e12, 'g': 1e9, 'meg': 1e6, 'k': 1e3, 'mil': 25.4e-6,
+    'm': 1e-3, 'u': 1e-6, 'n': 1e-9, 'p': 1e-12, 'f': 1e-15, 'a': 1e-18
+}
+
+_NUMBER_PATTERN = re.compile(r'^([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)(meg|mil|[tgkmunpfa])?[a-z]*$', re.IGNORECASE)
+_PARAM_PATTERN = re.compile(r"([A-Za-z_][\w.]*)\s*=\s*(\{[^}]*\}|'[^']*'|[^\s=()]+)")
+
+ParamValue = Union[float, str]
+
+
+def parse_spice_number(text: str) -> Optional[float]:
+    match = _NUMBER_PATTERN.match(text.strip())
+    if not match:
+        return None
+    value = float(match.group(1))
+    suffix = match.group(2)
+    if suffix:
+        value *= SPICE_SUFFIXES[suffix.lower()]
+    return value
+
+
+def format_param_value(value: ParamValue) -> str:
+    if isinstance(value, float):
+        return f"{value:.6e}"
+    return str(value)
+
+
+@dataclass
+class ModelCard:
+    name: str
+    device_type: str
+    params: Dict[str, ParamValue] = field(default_factory=dict)
+    raw_values: Dict[str, str] = field(default_factory=dict)
+    duplicates: List[str] = field(default_factory=list)
+    section: Optional[str] = None
+    source: str = ""
+    modified: bool = False
+
+    def get(self, name: str, default: Optional[ParamValue] = None) -> Optional[ParamValue]:
+        return self.params.get(name.lower(), default)
+
+    def set(self, name: str, value: ParamValue):
+        name = name.lower()
+        self.params[name] = value
+        self.raw_values[name] = format_param_value(value)
+        self.modified = True
+
+    def update(self, values: Dict[str, ParamValue]):
+        for name, value in values.items():
+            self.set(name, value)
+
+    def to_spice(self, name: Optional[str] = None, params_per_line: int = 6) -> str:
+        lines = [f".model {name or self.name} {self.device_type}"]
+        items = [f"{key}={value}" for key, value in self.raw_values.items()]
+        for i in range(0, len(items), params_per_line):
+            lines.append("+ " + " ".join(items[i:i + params_per_line]))
+        return "\n".join(lines)
+
+
+def parse_model_statement(statement: str, section: Optional[str] = None) -> Optional[ModelCard]:
+    # statement: one .model statement with continuation lines already joined
+    parts = statement.split(None, 3)
+    if len(parts) < 3 or parts[0].lower() != '.model':
+        return None
+
+    device_type = parts[2].split('(')[0].lower()
+    card = ModelCard(name=parts[1], device_type=device_type, section=section, source=statement)
+
+    body = statement.split(None, 2)[2][len(parts[2].split('(')[0]):]
+    for key, raw in _PARAM_PATTERN.findall(body):
+        key = key.lower()
+        if key in card.raw_values and key not in card.duplicates:
+            card.duplicates.append(key)
+        # later values override earlier ones, as in ngspice
+        card.raw_values.pop(key, None)
+        card.raw_values[key] = raw
+        number = parse_spice_number(raw)
+        card.params[key] = number if number is not None else raw
+    return card
+
+
+def _strip_inline_comment(line: str) -> str:
+    for marker in (' $', '\t$', ';'):
+        index = line.find(marker)
+        if index >= 0:
+            line = line[:index]
+    return line
+
+
+class ModelLibrary:
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.entries: List[Union[str, ModelCard]] = []   # raw text blocks and model cards, in file order
+        self.models: Dict[str, List[ModelCard]] = {}
+        if path is not None:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.parse(f.read())
+
+    @classmethod
+    def from_text(cls, text: str) -> 'ModelLibrary':
+        library = cls()
+        library.parse(text)
+        return library
+
+    def parse(self, text: str):
+        lines = text.splitlines(keepends=True)
+        section = None
+        raw_block = []
+        i = 0
+        while i < len(lines):
+            line = lines[i]
+            stripped = line.strip()
+            lowered = stripped.lower()
+
+            if lowered.startswith('.model'):
+                # collect continuation lines (comment lines may be interleaved)
+                logical = [_strip_inline_comment(stripped)]
+                end = i + 1
+                j = i + 1
+                while j < len(lines):
+                    next_stripped = lines[j].strip()
+                    if next_stripped.startswith('+'):
+                        logical.append(_strip_inline_comment(next_stripped[1:]))
+                        end = j + 1
+                    elif not next_stripped.startswith('*'):
+                        break
+                    j += 1
+                statement_lines = lines[i:end]
+                j = end
+
+                card = parse_model_statement(" ".join(logical), section)
+                if card is not None:
+                    if raw_block:
+                        self.entries.append("".join(raw_block))
+                        raw_block = []
+                    card.source = "".join(statement_lines)
+                    self.entries.append(card)
+                    self.models.setdefault(card.name.lower(), []).append(card)
+                    i = j
+                    continue
+
+            if lowered.startswith('.lib') and len(stripped.split()) == 2:
+                section = stripped.split()[1]
+            elif lowered.startswith('.endl'):
+                section = None
+
+            raw_block.append(line)
+            i += 1
+
+        if raw_block:
+            self.entries.append("".join(raw_block))
+
+    def get(self, name: str, section: Optional[str] = None) -> Optional[ModelCard]:
+        for card in self.models.get(name.lower(), []):
+            if section is None or (card.section or '').lower() == section.lower():
+                return card
+        return None
+
+    def names(self) -> List[str]:
+        return [cards[0].name for cards in self.models.values()]
+
+    def serialize(self) -> str:
+        chunks = []
+        for entry in self.entries:
+            if isinstance(entry, ModelCard):
+                if entry.modified:
+                    chunks.append(entry.to_spice() + "\n")
+                else:
+                    chunks.append(entry.source)
+            else:
+                chunks.append(entry)
+        return "".join(chunks)
+
+    def write(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.serialize())
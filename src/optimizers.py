@@ -0,0 +1,645 @@
+# Optimizer strategies for the auto-centering loop
+# optimize_parameters simulates the current parameters and hands the result to
+# a strategy, which returns the next parameters to simulate.
+
+from __future__ import annotations
+
+import os
+import abc
+import dataclasses
+from typing import Dict, Optional, Sequence
+
+from lazy import lazy_import
+
+from tuning import TunableParameter, TUNABLE_PARAMETERS, resolve_tunables
+
+np = lazy_import("numpy")
+
+# shared by every strategy, so clamps and headroom always agree
+PARAMETER_BOUNDS = {name: (TUNABLE_PARAMETERS[name].lower, TUNABLE_PARAMETERS[name].upper)
+                    for name in ('vth0', 'u0', 'vsat')}
+
+
+def clamp_parameter(name: str, value: float) -> float:
+    low, high = PARAMETER_BOUNDS[name]
+    return max(low, min(high, value))
+
+
+class OptimizerStrategy(abc.ABC):
+    name = "base"
+    supports_multi_target = True
+    supports_custom_parameters = True      # any tunable parameters and metric targets
+    # saved in checkpoints: arrays, parameter sets, numbers and dicts/lists of those
+    state_attributes = ()
+
+    def set_parameters(self, parameters: Sequence[TunableParameter]):
+        # the tunable parameters of the next run, called before reset()
+        self.parameters = tuple(parameters)
+
+    def reset(self):
+        pass
+
+    def jacobian_estimate(self) -> Optional[np.ndarray]:
+        # sensitivities at the end of a run, stored with the solution for warm starts
+        return None
+
+    def warm_start(self, jacobian: np.ndarray):
+        # called after reset() with the Jacobian of a stored nearby solution
+        pass
+
+    def state_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.state_attributes}
+
+    def load_state(self, centering, state: Dict):
+        # called after reset() when a run resumes from a checkpoint
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    @abc.abstractmethod
+    def step(self, centering, params, specs: Dict[str, float], target_spec, iteration: int):
+        pass
+
+    def recover(self, centering, params, target_spec, iteration: int):
+        # called instead of step() when the simulation of params failed
+        return params
+
+
+class HeuristicOptimizer(OptimizerStrategy):
+    # the original decaying learning rate / headroom update
+    name = "heuristic"
+    supports_multi_target = False
+    supports_custom_parameters = False
+
+    def step(self, centering, params, specs, target_spec, iteration):
+        centering.current_params = params
+        centering.update_parameters_multi_param(specs, target_spec, iteration)
+        return centering.current_params
+
+
+class LevenbergMarquardtOptimizer(OptimizerStrategy):
+    # Levenberg-Marquardt on the weighted relative errors of every target.
+    # The unknowns are the tunable parameters, log-scaled ones as ln(value), so
+    # every column of the Jacobian has a comparable scale; steps are projected
+    # onto the parameter bounds.
+    # Binned parameters (one set per geometry bin) are stacked into one x; the
+    # bins do not share devices, so their Jacobian is block diagonal.
+    name = "lm"
+    state_attributes = ('damping', 'n_sets', 'x_best', 'r_best', 'J', 'J_warm')
+
+    def __init__(self, jacobian: str = "fd", damping: float = 1e-3,
+                 parameters: Optional[Sequence[TunableParameter]] = None, verbose: bool = True):
+        if jacobian not in ("fd", "broyden"):
+            raise ValueError(f"Unknown Jacobian mode: {jacobian}")
+        self.jacobian = jacobian
+        self.verbose = verbose
+        self.initial_damping = damping
+        self.set_parameters(parameters or resolve_tunables())
+        self.reset()
+
+    def set_parameters(self, parameters: Sequence[TunableParameter]):
+        super().set_parameters(parameters)
+        self.parameter_names = tuple(p.name for p in self.parameters)
+        self.fd_steps = np.array([p.fd_step for p in self.parameters])
+        self.param_lower = np.array([p.to_x(p.lower) for p in self.parameters])
+        self.param_upper = np.array([p.to_x(p.upper) for p in self.parameters])
+
+    def reset(self):
+        self.damping = self.initial_damping
+        self.n_sets = 1
+        self.x_best = None
+        self.r_best = None
+        self.J = None
+        self.J_warm = None
+
+    def jacobian_estimate(self) -> Optional[np.ndarray]:
+        J = self.J if self.J is not None else self.J_warm
+        return None if J is None else J.copy()
+
+    def warm_start(self, jacobian: np.ndarray):
+        self.J_warm = jacobian
+
+    @staticmethod
+    def parameter_sets(params) -> list:
+        return list(params.bins) if hasattr(params, 'bins') else [params]
+
+    @property
+    def lower(self) -> np.ndarray:
+        return np.tile(self.param_lower, self.n_sets)
+
+    @property
+    def upper(self) -> np.ndarray:
+        return np.tile(self.param_upper, self.n_sets)
+
+    def to_x(self, params) -> np.ndarray:
+        sets = self.parameter_sets(params)
+        self.n_sets = len(sets)
+        return np.array([parameter.to_x(p.get(parameter.name)) for p in sets for parameter in self.parameters])
+
+    def from_x(self, x: np.ndarray, template):
+        x = np.clip(x, self.lower, self.upper)
+        n = len(self.parameter_names)
+        sets = []
+        for i, p in enumerate(self.parameter_sets(template)):
+            values = {parameter.name: parameter.from_x(v)
+                      for parameter, v in zip(self.parameters, x[i * n:(i + 1) * n])}
+            sets.append(p.updated(values))
+        if hasattr(template, 'bins'):
+            return dataclasses.replace(template, bins=sets)
+        return sets[0]
+
+    def format_parameters(self, params) -> str:
+        return ", ".join(f"{p.name} → {params.get(p.name):{p.fmt}}" for p in self.parameters)
+
+    @staticmethod
+    def residuals(specs: Dict, target_spec) -> np.ndarray:
+        return np.array(target_spec.residuals(specs))
+
+    def finite_difference_jacobian(self, centering, params, r: np.ndarray, target_spec,
+                                   response=None) -> np.ndarray:
+        # response(candidate, specs) -> vector to differentiate, residuals by default
+        residual_response = response is None
+        if response is None:
+            response = lambda candidate, specs: self.residuals(specs, target_spec)
+        x = self.to_x(params)
+        n = len(self.parameter_names)
+        fd_steps = np.tile(self.fd_steps, self.n_sets)
+        steps = np.where(x + fd_steps <= self.upper, fd_steps, -fd_steps)
+        # parameter k is perturbed in every bin at once; bin i only moves its own rows
+        candidates = [self.from_x(x + steps * (np.arange(len(x)) % n == k), params) for k in range(n)]
+        rows = len(r) // self.n_sets
+
+        # one parallel batch for all columns, or a single side-by-side netlist of
+        # all perturbed copies when the spec allows it (see sensitivity.py)
+        results = None
+        if (residual_response and self.n_sets == 1 and hasattr(centering, 'side_by_side_supported')
+                and centering.side_by_side_supported(target_spec)):
+            side_by_side = centering.run_side_by_side([params] + candidates, target_spec)
+            if not centering.simulation_failed(side_by_side[0]):
+                # differences against the nominal copy of the same netlist
+                r = self.residuals(side_by_side[0], target_spec)
+                results = side_by_side[1:]
+        if results is None:
+            results = centering.run_simulations_batch(candidates, target_spec)
+        J = np.zeros((len(r), len(x)))
+        for k, specs in enumerate(results):
+            if centering.simulation_failed(specs):
+                if self.verbose:
+                    print(f"  Warning: finite difference for {self.parameter_names[k]} failed")
+                continue
+            dr = response(candidates[k], specs) - r
+            for i in range(self.n_sets):
+                column = i * n + k
+                block = slice(i * rows, (i + 1) * rows) if self.n_sets > 1 else slice(None)
+                J[block, column] = dr[block] / steps[column]
+        return J
+
+    def solve_step(self) -> np.ndarray:
+        # parameters that sit on a bound and would be pushed further out are
+        # frozen and the step is re-solved for the remaining ones
+        free = np.ones(len(self.x_best), dtype=bool)
+        dx = np.zeros(len(self.x_best))
+        for _ in range(len(self.x_best)):
+            J = self.J[:, free]
+            A = J.T @ J
+            g = J.T @ self.r_best
+            dx[:] = 0
+            dx[free] = -np.linalg.solve(A + self.damping * max(np.trace(A), 1e-12) * np.eye(len(g)), g)
+            blocked = free & (((self.x_best <= self.lower) & (dx < 0)) | ((self.x_best >= self.upper) & (dx > 0)))
+            if not blocked.any():
+                break
+            free &= ~blocked
+            if not free.any():
+                dx[:] = 0
+                break
+        return dx
+
+    def next_candidate(self, template):
+        dx = self.solve_step()
+        params = self.from_x(self.x_best + dx, template)
+        sets = self.parameter_sets(params) if self.verbose else []
+        for i, p in enumerate(sets):
+            label = f"LM step [bin{i}]" if len(sets) > 1 else "LM step"
+            print(f"  {label}: {self.format_parameters(p)} (damping: {self.damping:.1e})")
+        return params
+
+    def step(self, centering, params, specs, target_spec, iteration):
+        x = self.to_x(params)
+        r = self.residuals(specs, target_spec)
+
+        if self.x_best is None:
+            self.x_best, self.r_best = x, r
+            if self.J_warm is not None and self.J_warm.shape == (len(r), len(x)):
+                # a stored solution nearby: skip the first finite-difference batch
+                if self.verbose:
+                    print("  Using the stored Jacobian of the warm-start solution")
+                self.J = self.J_warm
+            else:
+                self.J = self.finite_difference_jacobian(centering, params, r, target_spec)
+            return self.next_candidate(params)
+
+        # secant update from the last accepted point, no extra simulations
+        if self.jacobian == "broyden":
+            dx = x - self.x_best
+            if dx @ dx > 0:
+                self.J += np.outer((r - self.r_best) - self.J @ dx, dx) / (dx @ dx)
+
+        if r @ r < self.r_best @ self.r_best:
+            self.x_best, self.r_best = x, r
+            self.damping = max(self.damping / 3, 1e-9)
+            if self.jacobian == "fd":
+                self.J = self.finite_difference_jacobian(centering, params, r, target_spec)
+        else:
+            self.damping *= 4
+            if self.verbose:
+                print("  LM step rejected, increasing damping")
+
+        return self.next_candidate(params)
+
+    def recover(self, centering, params, target_spec, iteration):
+        if self.x_best is None:
+            return params
+        self.damping *= 4
+        return self.next_candidate(params)
+
+
+class SurrogateOptimizer(OptimizerStrategy):
+    # Searches on the analytic surrogate and only confirms candidates with the
+    # real simulator. Every real result re-calibrates the surrogate (see
+    # SurrogateEvaluator); the step from the best real point is limited to a
+    # trust region in the LM x space that grows on success and shrinks when the
+    # real simulation does not confirm the improvement.
+    name = "surrogate"
+    state_attributes = ('trust_radius', 'best_params', 'best_specs', 'best_error', 'predicted_error')
+
+    def __init__(self, inner_iterations: int = 15, trust_radius: float = 0.5):
+        self.inner_iterations = inner_iterations
+        self.initial_trust_radius = trust_radius
+        self.reset()
+
+    def reset(self):
+        self.trust_radius = self.initial_trust_radius
+        self.best_params = None
+        self.best_specs = None
+        self.best_error = float('inf')
+        self.predicted_error = None
+        self.evaluator = None
+
+    def state_dict(self) -> Dict:
+        state = super().state_dict()
+        if self.evaluator is not None:
+            # the learned correction of the surrogate
+            state['evaluator'] = {'x_ref': self.evaluator.x_ref, 'c_ref': self.evaluator.c_ref, 'B': self.evaluator.B}
+        return state
+
+    def load_state(self, centering, state: Dict):
+        from surrogate import SurrogateEvaluator
+
+        state = dict(state)
+        evaluator = state.pop('evaluator', None)
+        super().load_state(centering, state)
+        if evaluator is not None:
+            self.evaluator = SurrogateEvaluator(centering, self.inner_optimizer().to_x)
+            self.evaluator.x_ref, self.evaluator.c_ref, self.evaluator.B = (evaluator['x_ref'], evaluator['c_ref'],
+                                                                            evaluator['B'])
+
+    def inner_optimizer(self) -> LevenbergMarquardtOptimizer:
+        return LevenbergMarquardtOptimizer(parameters=getattr(self, 'parameters', None), verbose=False)
+
+    def step(self, centering, params, specs, target_spec, iteration):
+        from surrogate import SurrogateEvaluator
+
+        if self.evaluator is None:
+            self.evaluator = SurrogateEvaluator(centering, self.inner_optimizer().to_x)
+
+        error = centering.calculate_error(specs, target_spec)
+        improved = error < self.best_error
+        # did the real simulation deliver at least a quarter of the predicted gain?
+        confirmed = self.predicted_error is None or (
+            self.best_error - error >= 0.25 * (self.best_error - self.predicted_error))
+        if improved:
+            if self.best_params is not None and confirmed:
+                self.trust_radius = min(self.trust_radius * 2, 4.0)
+            self.best_params, self.best_specs, self.best_error = params, specs, error
+        if not confirmed:
+            self.trust_radius /= 4
+            print(f"  Surrogate step not confirmed, trust radius → {self.trust_radius:.3f}")
+
+        self.evaluator.calibrate(params, target_spec, specs, reference=improved)
+        if not confirmed:
+            # the learned correction is off, measure its slope with one real batch
+            self.calibrate_slope(centering, target_spec)
+        return self.search(self.best_params, target_spec)
+
+    def calibrate_slope(self, centering, target_spec):
+        lm = self.inner_optimizer()
+        reference = self.evaluator.corrections(self.best_params, target_spec, self.best_specs)
+        response = lambda candidate, specs: self.evaluator.corrections(candidate, target_spec, specs)
+        self.evaluator.B = lm.finite_difference_jacobian(centering, self.best_params, reference,
+                                                         target_spec, response=response)
+
+    def search(self, start, target_spec):
+        inner = self.inner_optimizer()
+        candidate = start
+        count = self.evaluator.simulation_count
+        for i in range(self.inner_iterations):
+            specs = self.evaluator.run_simulation(candidate, target_spec)
+            if self.evaluator.simulation_failed(specs):
+                candidate = inner.recover(self.evaluator, candidate, target_spec, i)
+            else:
+                candidate = inner.step(self.evaluator, candidate, specs, target_spec, i)
+        if inner.x_best is None:
+            return start
+
+        x0 = inner.to_x(start)
+        dx = inner.x_best - x0
+        norm = np.linalg.norm(dx)
+        if norm > self.trust_radius:
+            dx *= self.trust_radius / norm
+        params = inner.from_x(x0 + dx, start)
+        predicted = self.evaluator.calculate_error(self.evaluator.run_simulation(params, target_spec), target_spec)
+        self.predicted_error = predicted
+        for i, p in enumerate(inner.parameter_sets(params)):
+            label = f"Surrogate step [bin{i}]" if hasattr(params, 'bins') else "Surrogate step"
+            print(f"  {label}: {inner.format_parameters(p)}")
+        print(f"  ({self.evaluator.simulation_count - count} surrogate evaluations, predicted error {predicted:.4f})")
+        return params
+
+    def recover(self, centering, params, target_spec, iteration):
+        if self.best_params is None:
+            return params
+        self.trust_radius /= 4
+        return self.search(self.best_params, target_spec)
+
+
+class PopulationOptimizer(OptimizerStrategy):
+    # Global search: every step evaluates one generation of candidates as a
+    # single parallel batch, so the population size is what uses the cores.
+    # The search runs in the LM x space scaled to the unit box of the bounds.
+    # When the population has collapsed (spread below tolerance) or the best
+    # error has not improved for `patience` generations, the search stops and,
+    # with refine=True, hands the best point to Levenberg-Marquardt.
+    state_attributes = ('stopped', 'generation', 'stall', 'best_params', 'best_error')
+    search_attributes = ()      # set by start(), saved once the search has started
+
+    def __init__(self, population: Optional[int] = None, tolerance: float = 1e-3, patience: int = 3,
+                 refine: bool = True, seed: Optional[int] = None):
+        self.population = population
+        self.tolerance = tolerance
+        self.patience = patience
+        self.refine = refine
+        self.seed = seed
+        self.reset()
+
+    def reset(self):
+        self.rng = np.random.default_rng(self.seed)
+        self.space = None
+        self.local = None
+        self.stopped = False
+        self.generation = 0
+        self.stall = 0
+        self.best_params = None
+        self.best_error = float('inf')
+
+    def jacobian_estimate(self) -> Optional[np.ndarray]:
+        return self.local.jacobian_estimate() if self.local is not None else None
+
+    def state_dict(self) -> Dict:
+        state = super().state_dict()
+        state['rng'] = self.rng.bit_generator.state
+        if self.space is not None:
+            state['sets'] = self.space.n_sets
+            state.update({name: getattr(self, name) for name in self.search_attributes})
+        if self.local is not None:
+            state['local'] = self.local.state_dict()
+        return state
+
+    def load_state(self, centering, state: Dict):
+        state = dict(state)
+        self.rng.bit_generator.state = state.pop('rng')
+        sets = state.pop('sets', None)
+        if sets is not None:
+            self.space = LevenbergMarquardtOptimizer(parameters=self.parameters, verbose=False)
+            self.space.n_sets = sets
+        local = state.pop('local', None)
+        if local is not None:
+            self.local = LevenbergMarquardtOptimizer(parameters=self.parameters)
+            self.local.load_state(centering, local)
+        super().load_state(centering, state)
+
+    @abc.abstractmethod
+    def default_population(self, dimension: int) -> int:
+        pass
+
+    @abc.abstractmethod
+    def start(self, u0: np.ndarray, size: int):
+        pass
+
+    @abc.abstractmethod
+    def ask(self) -> np.ndarray:
+        pass
+
+    @abc.abstractmethod
+    def tell(self, candidates: np.ndarray, errors: np.ndarray):
+        pass
+
+    @abc.abstractmethod
+    def spread(self) -> float:
+        pass
+
+    def to_unit(self, params) -> np.ndarray:
+        x = self.space.to_x(params)
+        return (x - self.space.lower) / (self.space.upper - self.space.lower)
+
+    def from_unit(self, u: np.ndarray, template):
+        return self.space.from_x(self.space.lower + np.clip(u, 0, 1) * (self.space.upper - self.space.lower),
+                                 template)
+
+    def population_size(self, centering, dimension: int) -> int:
+        # at least one candidate per simulation worker
+        if self.population:
+            return max(4, self.population)
+        pool = centering.simulation_pool
+        workers = pool.workers if pool is not None else centering.workers or os.cpu_count() or 1
+        return max(self.default_population(dimension), workers)
+
+    def step(self, centering, params, specs, target_spec, iteration):
+        if self.local is not None:
+            return self.local.step(centering, params, specs, target_spec, iteration)
+        error = centering.calculate_error(specs, target_spec)
+        if error < self.best_error:
+            self.best_params, self.best_error = params, error
+        return self.search(centering, params, target_spec)
+
+    def search(self, centering, params, target_spec):
+        if self.stopped:
+            return self.best_params
+        if self.space is None:
+            self.space = LevenbergMarquardtOptimizer(parameters=self.parameters, verbose=False)
+            u0 = self.to_unit(params)
+            self.start(u0, self.population_size(centering, len(u0)))
+
+        candidates = self.ask()
+        trial_params = [self.from_unit(u, params) for u in candidates]
+        # candidates spread over the whole box, far outside an adaptive Vth window
+        with centering.full_sweeps():
+            results = centering.run_simulations_batch(trial_params, target_spec)
+        errors = np.array([centering.calculate_error(specs, target_spec) for specs in results])
+        self.tell(candidates, errors)
+        self.generation += 1
+
+        best = int(np.argmin(errors))
+        if errors[best] < self.best_error:
+            self.best_params, self.best_error = trial_params[best], float(errors[best])
+            self.stall = 0
+        else:
+            self.stall += 1
+        spread = self.spread()
+        print(f"  {self.name} generation {self.generation}: best error {self.best_error:.4f} "
+              f"({len(candidates)} candidates, {int(np.isfinite(errors).sum())} valid, spread {spread:.2e})")
+        if self.best_params is None:
+            return params
+        for i, p in enumerate(self.space.parameter_sets(self.best_params)):
+            label = f"Best [bin{i}]" if hasattr(self.best_params, 'bins') else "Best"
+            print(f"  {label}: {self.space.format_parameters(p)}")
+
+        if spread < self.tolerance or self.stall >= self.patience:
+            self.stopped = True
+            reason = "population converged" if spread < self.tolerance else f"no improvement in {self.stall} generations"
+            if self.refine:
+                print(f"  Global search stopped ({reason}), refining with Levenberg-Marquardt")
+                self.local = LevenbergMarquardtOptimizer(parameters=self.parameters)
+            else:
+                print(f"  Global search stopped ({reason})")
+        return self.best_params
+
+    def recover(self, centering, params, target_spec, iteration):
+        # the population does not need the current point to simulate
+        if self.local is not None:
+            return self.local.recover(centering, params, target_spec, iteration)
+        start = self.best_params if self.best_params is not None else params
+        return self.search(centering, start, target_spec)
+
+
+class CMAESOptimizer(PopulationOptimizer):
+    # (mu/mu_w, lambda) CMA-ES with cumulative step-size adaptation. Samples
+    # outside the box are clipped and the update uses the clipped steps.
+    name = "cmaes"
+    search_attributes = ('size', 'mu', 'weights', 'mueff', 'cc', 'cs', 'c1', 'cmu', 'damps', 'chi_n',
+                         'mean', 'sigma', 'C', 'pc', 'ps')
+
+    def __init__(self, population: Optional[int] = None, sigma: float = 0.3, **kwargs):
+        self.initial_sigma = sigma
+        super().__init__(population, **kwargs)
+
+    def default_population(self, dimension: int) -> int:
+        return 4 + int(3 * np.log(dimension))
+
+    def start(self, u0: np.ndarray, size: int):
+        n = len(u0)
+        self.size = size
+        self.mu = size // 2
+        weights = np.log(self.mu + 0.5) - np.log(np.arange(1, self.mu + 1))
+        self.weights = weights / weights.sum()
+        self.mueff = 1 / np.sum(self.weights ** 2)
+        self.cc = (4 + self.mueff / n) / (n + 4 + 2 * self.mueff / n)
+        self.cs = (self.mueff + 2) / (n + self.mueff + 5)
+        self.c1 = 2 / ((n + 1.3) ** 2 + self.mueff)
+        self.cmu = min(1 - self.c1, 2 * (self.mueff - 2 + 1 / self.mueff) / ((n + 2) ** 2 + self.mueff))
+        self.damps = 1 + 2 * max(0.0, np.sqrt((self.mueff - 1) / (n + 1)) - 1) + self.cs
+        self.chi_n = np.sqrt(n) * (1 - 1 / (4 * n) + 1 / (21 * n ** 2))
+        self.mean = u0.copy()
+        self.sigma = self.initial_sigma
+        self.C = np.eye(n)
+        self.pc = np.zeros(n)
+        self.ps = np.zeros(n)
+
+    def ask(self) -> np.ndarray:
+        D2, B = np.linalg.eigh(self.C)
+        z = self.rng.standard_normal((self.size, len(self.mean)))
+        return np.clip(self.mean + self.sigma * (z * np.sqrt(np.maximum(D2, 1e-20))) @ B.T, 0, 1)
+
+    def tell(self, candidates: np.ndarray, errors: np.ndarray):
+        if not np.isfinite(errors).any():
+            # nothing simulated, search closer to the mean
+            self.sigma /= 2
+            return
+        n = len(self.mean)
+        y = (candidates[np.argsort(errors)[:self.mu]] - self.mean) / self.sigma
+        y_w = self.weights @ y
+        self.mean = self.mean + self.sigma * y_w
+
+        D2, B = np.linalg.eigh(self.C)
+        inv_sqrt_C = B @ np.diag(1 / np.sqrt(np.maximum(D2, 1e-20))) @ B.T
+        self.ps = (1 - self.cs) * self.ps + np.sqrt(self.cs * (2 - self.cs) * self.mueff) * inv_sqrt_C @ y_w
+        norm_ps = np.linalg.norm(self.ps)
+        hsig = norm_ps / np.sqrt(1 - (1 - self.cs) ** (2 * (self.generation + 1))) / self.chi_n < 1.4 + 2 / (n + 1)
+        self.pc = (1 - self.cc) * self.pc + hsig * np.sqrt(self.cc * (2 - self.cc) * self.mueff) * y_w
+        self.C = ((1 - self.c1 - self.cmu) * self.C
+                  + self.c1 * (np.outer(self.pc, self.pc) + (1 - hsig) * self.cc * (2 - self.cc) * self.C)
+                  + self.cmu * (y.T * self.weights) @ y)
+        self.sigma *= np.exp(self.cs / self.damps * (norm_ps / self.chi_n - 1))
+
+    def spread(self) -> float:
+        return float(self.sigma * np.sqrt(np.max(np.diag(self.C))))
+
+
+class DifferentialEvolutionOptimizer(PopulationOptimizer):
+    # DE/rand/1/bin. The first generation is the start point plus uniform
+    # samples of the whole box; every later generation is one trial per member.
+    name = "de"
+    search_attributes = ('members', 'errors')
+
+    def __init__(self, population: Optional[int] = None, mutation: float = 0.7, crossover: float = 0.9, **kwargs):
+        self.mutation = mutation
+        self.crossover = crossover
+        super().__init__(population, **kwargs)
+
+    def default_population(self, dimension: int) -> int:
+        return max(8, 5 * dimension)
+
+    def start(self, u0: np.ndarray, size: int):
+        self.members = self.rng.uniform(0, 1, (size, len(u0)))
+        self.members[0] = u0
+        self.errors = None
+
+    def ask(self) -> np.ndarray:
+        if self.errors is None:
+            return self.members.copy()
+        size, n = self.members.shape
+        trials = self.members.copy()
+        for i in range(size):
+            a, b, c = self.rng.choice([k for k in range(size) if k != i], 3, replace=False)
+            mutant = self.members[a] + self.mutation * (self.members[b] - self.members[c])
+            cross = self.rng.uniform(size=n) < self.crossover
+            cross[self.rng.integers(n)] = True
+            trials[i] = np.where(cross, mutant, self.members[i])
+        return np.clip(trials, 0, 1)
+
+    def tell(self, candidates: np.ndarray, errors: np.ndarray):
+        if self.errors is None:
+            self.errors = errors
+            return
+        better = errors <= self.errors
+        self.members[better] = candidates[better]
+        self.errors = np.where(better, errors, self.errors)
+
+    def spread(self) -> float:
+        valid = self.members[np.isfinite(self.errors)] if self.errors is not None else self.members
+        return float(np.max(np.std(valid, axis=0))) if len(valid) > 1 else 0.0
+
+
+OPTIMIZERS = {
+    'heuristic': HeuristicOptimizer,
+    'lm': LevenbergMarquardtOptimizer,
+    'broyden': lambda: LevenbergMarquardtOptimizer(jacobian="broyden"),
+    'surrogate': SurrogateOptimizer,
+    'cmaes': CMAESOptimizer,
+    'de': DifferentialEvolutionOptimizer,
+}
+
+
+def create_optimizer(name: str = "lm") -> OptimizerStrategy:
+    try:
+        return OPTIMIZERS[name.lower()]()
+    except KeyError:
+        raise ValueError(f"Unknown optimizer: {name} (choose from {', '.join(OPTIMIZERS)})")
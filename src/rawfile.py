@@ -0,0 +1,169 @@
+# SPICE rawfile reader
+# Reads ngspice rawfiles in binary (`set filetype=binary`) and ascii format.
+# Binary files are memory-mapped and every vector is a zero-copy NumPy view
+# into the mapping, so large sweeps are not copied or parsed. Real and complex
+# data and files with several plots are supported. This module has no
+# simulator dependencies so the GUI can load rawfiles directly.
+
+from __future__ import annotations
+
+import mmap
+from typing import Dict, List, Tuple
+from dataclasses import dataclass, field
+
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+
+
+class RawfileError(ValueError):
+    pass
+
+
+@dataclass
+class RawPlot:
+    title: str
+    plotname: str
+    flags: str
+    variables: List[Tuple[str, str]]                            # (name, type) in file order
+    data: Dict[str, np.ndarray] = field(default_factory=dict)   # name -> values
+
+    @property
+    def is_complex(self) -> bool:
+        return 'complex' in self.flags.lower()
+
+    @property
+    def scale(self) -> np.ndarray:
+        # the first variable is the sweep / time / frequency axis
+        return self.data[self.variables[0][0]]
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.data[name.lower()]
+
+    def __contains__(self, name: str) -> bool:
+        return name.lower() in self.data
+
+
+def _unique_names(names: List[str]) -> List[str]:
+    seen = {}
+    unique = []
+    for name in names:
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        unique.append(name if count == 0 else f"{name}#{count}")
+    return unique
+
+
+def _parse_header(buffer, offset: int) -> Tuple[Dict[str, str], List[Tuple[str, str]], str, int]:
+    # returns header fields, variables, data format ("binary"/"values") and data offset
+    header = {}
+    variables = []
+    size = len(buffer)
+    in_variables = False
+    while offset < size:
+        end = buffer.find(b'\n', offset)
+        if end < 0:
+            end = size
+        line = bytes(buffer[offset:end]).decode('latin-1').rstrip('\r')
+        offset = end + 1
+
+        key, _, value = line.partition(':')
+        key = key.strip().lower()
+        if key in ('binary', 'values'):
+            return header, variables, key, offset
+        if key == 'variables':
+            in_variables = True
+            continue
+        if in_variables and line[:1] in (' ', '\t'):
+            parts = line.split()
+            if len(parts) >= 3:
+                variables.append((parts[1].lower(), parts[2].lower()))
+            continue
+        in_variables = False
+        if key:
+            header[key] = value.strip()
+    raise RawfileError("Rawfile ends inside a header")
+
+
+def _read_plots(buffer) -> List[RawPlot]:
+    plots = []
+    offset = 0
+    size = len(buffer)
+    while offset < size:
+        # skip blank lines between plots
+        while offset < size and buffer[offset:offset + 1] in (b'\n', b'\r', b' ', b'\t'):
+            offset += 1
+        if offset >= size:
+            break
+
+        header, variables, data_format, offset = _parse_header(buffer, offset)
+        if not variables:
+            raise RawfileError("Rawfile plot without variables")
+        flags = header.get('flags', 'real')
+        n_points = int(header.get('no. points', 0))
+        names = _unique_names([name for name, _ in variables])
+        variables = list(zip(names, [kind for _, kind in variables]))
+        plot = RawPlot(title=header.get('title', ''), plotname=header.get('plotname', ''),
+                       flags=flags, variables=variables)
+        value_type = '<c16' if plot.is_complex else '<f8'
+
+        if data_format == 'binary':
+            # one record per point, fields are strided views into the buffer
+            record = np.dtype([(name, value_type) for name in names])
+            if offset + n_points * record.itemsize > size:
+                raise RawfileError(f"Truncated binary rawfile ({n_points} points expected)")
+            table = np.frombuffer(buffer, dtype=record, count=n_points, offset=offset)
+            plot.data = {name: table[name] for name in names}
+            offset += n_points * record.itemsize
+        else:
+            offset, plot.data = _read_ascii_values(buffer, offset, names, n_points, plot.is_complex)
+        plots.append(plot)
+    return plots
+
+
+def _read_ascii_values(buffer, offset: int, names: List[str], n_points: int,
+                       complex_data: bool) -> Tuple[int, Dict[str, np.ndarray]]:
+    # each point is "<index> <value> <value> ...", complex values are "re,im"
+    stride = len(names) + 1
+    tokens = []
+    size = len(buffer)
+    while offset < size and len(tokens) < n_points * stride:
+        end = buffer.find(b'\n', offset)
+        if end < 0:
+            end = size
+        tokens.extend(bytes(buffer[offset:end]).split())
+        offset = end + 1
+    if len(tokens) < n_points * stride:
+        raise RawfileError(f"Truncated ascii rawfile ({n_points} points expected)")
+
+    table = np.array(tokens, dtype=object).reshape(n_points, stride)[:, 1:]
+    if complex_data:
+        pairs = np.array([token.split(b',') for token in table.ravel()], dtype=float)
+        values = (pairs[:, 0] + 1j * pairs[:, 1]).reshape(n_points, len(names))
+    else:
+        values = table.astype(float)
+    return offset, {name: values[:, i] for i, name in enumerate(names)}
+
+
+def read_rawfile(path: str) -> List[RawPlot]:
+    # the mapping stays alive as long as any returned array references it
+    with open(path, 'rb') as f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty file, nothing to map
+            raise RawfileError(f"Empty rawfile: {path}")
+    try:
+        return _read_plots(buffer)
+    except RawfileError:
+        raise
+    except (ValueError, IndexError) as e:
+        raise RawfileError(f"Malformed rawfile {path}: {e}")
+
+
+def read_vectors(path: str) -> Dict[str, np.ndarray]:
+    # all vectors of the last plot, the common case of one analysis per file
+    plots = read_rawfile(path)
+    if not plots:
+        raise RawfileError(f"No plots in rawfile: {path}")
+    return plots[-1].data
@@ -0,0 +1,51 @@
+# Parameter sensitivities
+# The nominal parameters and one copy per tunable parameter, each moved by its
+# finite-difference step, are simulated side by side in one netlist (see
+# SkyWaterBSIM4Centering.run_side_by_side). The normalized sensitivity of
+# metric M to parameter p is (dM/|M|) / (dp/|p|): +1 means Ion rises 1% per
+# 1% of u0. Parameters at zero (e.g. k2 = 0) are reported per unit instead.
+#
+#   table = tool.sensitivity_analysis(spec=BSIM4TargetSpec(vth=0.42, ion=5e-4))
+#   table['ion']['u0']   # ~0.6
+
+import math
+from typing import Dict, List, Sequence
+
+from tuning import TunableParameter
+
+
+def perturbed_value(parameter: TunableParameter, value: float) -> float:
+    # one finite-difference step in optimizer units, away from the upper bound
+    x = parameter.to_x(value)
+    step = parameter.fd_step if x + parameter.fd_step <= parameter.to_x(parameter.upper) else -parameter.fd_step
+    return parameter.from_x(x + step)
+
+
+def normalized_sensitivities(params_list: List, results: List[Dict[str, float]],
+                             names: Sequence[str]) -> Dict[str, Dict[str, float]]:
+    # params_list/results: nominal first, then one perturbed set per name; {metric: {parameter: S}}
+    nominal, base = params_list[0], results[0]
+    table = {}
+    for metric, value in base.items():
+        row = {}
+        for name, params, specs in zip(names, params_list[1:], results[1:]):
+            dp = params.get(name) - nominal.get(name)
+            measured = specs.get(metric, float('nan'))
+            if dp == 0 or not math.isfinite(measured) or not math.isfinite(value) or value == 0:
+                row[name] = float('nan')
+                continue
+            relative_dp = dp / abs(nominal.get(name)) if nominal.get(name) != 0 else dp
+            row[name] = (measured - value) / abs(value) / relative_dp
+        table[metric] = row
+    return table
+
+
+def format_sensitivities(table: Dict[str, Dict[str, float]]) -> List[str]:
+    if not table:
+        return []
+    names = list(next(iter(table.values())))
+    lines = [f"{'Metric':<10}" + "".join(f"{name:>10}" for name in names)]
+    for metric, row in table.items():
+        lines.append(f"{metric:<10}" + "".join(f"{row[name]:>+10.3f}" if math.isfinite(row[name]) else f"{'-':>10}"
+                                              for name in names))
+    return lines
@@ -0,0 +1,473 @@
+# Simulator backends for the auto-centering tool
+# A backend takes a SimulationJob (circuit + model alterations + analyses) and
+# returns the requested vectors. Backends are pluggable so the centering flow
+# can run on a persistent libngspice session, on `ngspice -b` subprocesses or
+# on any local stand-in simulator that implements SimulatorBackend.
+
+from __future__ import annotations
+
+import os
+import re
+import abc
+import json
+import time
+import shutil
+import subprocess
+import threading
+import ctypes
+import ctypes.util
+from collections import deque
+from typing import Dict, List, Optional
+from dataclasses import dataclass, field, asdict
+
+from lazy import lazy_import
+
+from rawfile import RawfileError, read_vectors
+from telemetry import span
+
+np = lazy_import("numpy")
+
+
+class SimulationError(Exception):
+    pass
+
+
+class SimulationCancelled(SimulationError):
+    pass
+
+
+Vectors = Dict[str, Dict[str, 'np.ndarray']]    # analysis name -> {vector name: values}
+
+
+@dataclass
+class Analysis:
+    name: str                   # key of this analysis in the results
+    command: str                # ngspice analysis command, e.g. "op"
+    vectors: Dict[str, str] = field(default_factory=dict)   # result name -> ngspice expression
+    setup: List[str] = field(default_factory=list)          # control commands run before the analysis
+
+
+@dataclass
+class SimulationJob:
+    circuit: List[str]          # netlist lines without .control block
+    alter: Dict[str, Dict[str, float]] = field(default_factory=dict)   # model -> {param: value}
+    analyses: List[Analysis] = field(default_factory=list)
+
+
+class SimulatorBackend(abc.ABC):
+    name = "base"
+
+    @abc.abstractmethod
+    def run(self, job: SimulationJob, workdir: str) -> Vectors:
+        pass
+
+    def cancel(self):
+        # abort the jobs that are running right now (called from another thread)
+        pass
+
+    def close(self):
+        pass
+
+
+def altermod_commands(alter: Dict[str, Dict[str, float]]) -> List[str]:
+    commands = []
+    for model, values in alter.items():
+        for param, value in values.items():
+            commands.append(f"altermod {model} {param} = {value:.9e}")
+    return commands
+
+
+class SubprocessNgspiceBackend(SimulatorBackend):
+    # one `ngspice -b` process per job (original behaviour, always available)
+    name = "subprocess"
+
+    def __init__(self, executable: str = "ngspice", timeout: float = 30):
+        self.executable = executable
+        self.timeout = timeout
+        self.processes = set()
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        # process pool workers get their own process table
+        return {'executable': self.executable, 'timeout': self.timeout}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def create_control_block(self, job: SimulationJob) -> List[str]:
+        lines = [".control", "set filetype=binary"]
+        lines.extend(altermod_commands(job.alter))
+        for analysis in job.analyses:
+            lines.extend(analysis.setup)
+            lines.append(analysis.command)
+            for vec_name, expression in analysis.vectors.items():
+                lines.append(f"let {vec_name} = {expression}")
+            lines.append(f"write {analysis.name}.raw {' '.join(analysis.vectors)}")
+        lines.append("quit")
+        lines.append(".endc")
+        return lines
+
+    def run(self, job: SimulationJob, workdir: str) -> Vectors:
+        lines = [line for line in job.circuit if line.strip().lower() != ".end"]
+        lines.extend(self.create_control_block(job))
+        lines.append(".end")
+
+        netlist_file = os.path.join(workdir, "testbench.cir")
+        with span("write_netlist"):
+            with open(netlist_file, 'w') as f:
+                f.write("\n".join(lines))
+
+            for analysis in job.analyses:
+                raw_file = os.path.join(workdir, f"{analysis.name}.raw")
+                if os.path.exists(raw_file):
+                    os.remove(raw_file)
+
+        # process start-up and solve, ngspice -b does not report them separately
+        with span("ngspice", executable=self.executable) as record:
+            try:
+                process = subprocess.Popen([self.executable, "-b", netlist_file], stdout=subprocess.PIPE,
+                                           stderr=subprocess.PIPE, text=True, cwd=workdir)
+            except OSError as e:
+                raise SimulationError(f"Could not start {self.executable}: {e}")
+
+            process.cancelled = False
+            with self.lock:
+                self.processes.add(process)
+            try:
+                _, stderr = process.communicate(timeout=self.timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.communicate()
+                raise SimulationError("Simulation timeout")
+            finally:
+                with self.lock:
+                    self.processes.discard(process)
+                record.set(exit_status=process.returncode, cancelled=process.cancelled)
+
+        if process.cancelled:
+            raise SimulationCancelled("Simulation cancelled")
+        if process.returncode != 0:
+            raise SimulationError(f"ngspice exited with {process.returncode}: {stderr}")
+
+        results = {}
+        for analysis in job.analyses:
+            raw_file = os.path.join(workdir, f"{analysis.name}.raw")
+            if not os.path.exists(raw_file):
+                raise SimulationError(f"No output for analysis '{analysis.name}': {stderr}")
+            with span("read_rawfile", analysis=analysis.name):
+                try:
+                    data = read_vectors(raw_file)
+                except RawfileError as e:
+                    raise SimulationError(str(e))
+                # zero-copy views into the memory-mapped rawfile
+                results[analysis.name] = {vec_name: np.real(data.get(vec_name.lower(), np.zeros(0)))
+                                          for vec_name in analysis.vectors}
+        return results
+
+    def cancel(self):
+        with self.lock:
+            for process in self.processes:
+                process.cancelled = True
+                process.kill()
+
+
+class _VectorInfo(ctypes.Structure):
+    _fields_ = [
+        ("v_name", ctypes.c_char_p),
+        ("v_type", ctypes.c_int),
+        ("v_flags", ctypes.c_short),
+        ("v_realdata", ctypes.POINTER(ctypes.c_double)),
+        ("v_compdata", ctypes.c_void_p),
+        ("v_length", ctypes.c_int),
+    ]
+
+
+_SendChar = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_void_p)
+_SendStat = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_void_p)
+_ControlledExit = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_int, ctypes.c_bool, ctypes.c_bool,
+                                   ctypes.c_int, ctypes.c_void_p)
+_BGThreadRunning = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_bool, ctypes.c_int, ctypes.c_void_p)
+
+BACKGROUND_POLL = 0.05      # s, how often a background analysis checks for cancellation
+
+
+NGSPICE_PROBE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "auto-centering", "ngspice_probe.json")
+NGSPICE_PROBE_MAX_AGE = 3600    # s, a probe that found nothing is repeated after this
+
+
+@dataclass
+class NgspiceProbe:
+    executable: Optional[str] = None    # absolute path of ngspice on PATH
+    version: Optional[str] = None       # from `ngspice -v`, e.g. "42"
+    library: Optional[str] = None       # libngspice path or soname
+    mtime: Optional[float] = None       # of the executable, an upgrade invalidates the probe
+    created: float = 0.0
+
+
+_ngspice_probe = None
+_ngspice_probe_lock = threading.Lock()
+
+
+def _probe_key() -> str:
+    return json.dumps([os.environ.get(name, "") for name in ("PATH", "NGSPICE_LIBRARY_PATH", "LD_LIBRARY_PATH")])
+
+
+def _probe_valid(probe: NgspiceProbe) -> bool:
+    if probe.executable is None and probe.library is None:
+        return time.time() - probe.created < NGSPICE_PROBE_MAX_AGE
+    if probe.executable is not None:
+        try:
+            if os.path.getmtime(probe.executable) != probe.mtime:
+                return False
+        except OSError:
+            return False
+    # find_library returns a soname, only paths can be checked
+    return probe.library is None or not os.path.isabs(probe.library) or os.path.exists(probe.library)
+
+
+def _run_probe() -> NgspiceProbe:
+    probe = NgspiceProbe(executable=shutil.which("ngspice"), library=ctypes.util.find_library("ngspice"),
+                         created=time.time())
+    if probe.executable is not None:
+        probe.mtime = os.path.getmtime(probe.executable)
+        try:
+            result = subprocess.run([probe.executable, "-v"], capture_output=True, text=True, timeout=10,
+                                    stdin=subprocess.DEVNULL)
+            match = re.search(r"ngspice-(\S+)", result.stdout + result.stderr)
+            probe.version = match.group(1) if match else None
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+    return probe
+
+
+def probe_ngspice(refresh: bool = False) -> NgspiceProbe:
+    # which, find_library and `ngspice -v` cost tens of milliseconds in every
+    # worker process: the result is kept per process and in NGSPICE_PROBE_PATH,
+    # keyed by the search paths
+    global _ngspice_probe
+    key = _probe_key()
+    with _ngspice_probe_lock:
+        if not refresh and _ngspice_probe is not None and _ngspice_probe[0] == key:
+            return _ngspice_probe[1]
+        probe = None
+        if not refresh:
+            try:
+                with open(NGSPICE_PROBE_PATH, 'r', encoding='utf-8') as f:
+                    cached = json.load(f)
+                if cached.get('key') == key:
+                    probe = NgspiceProbe(**cached['probe'])
+                    probe = probe if _probe_valid(probe) else None
+            except (OSError, ValueError, KeyError, TypeError):
+                probe = None
+        if probe is None:
+            probe = _run_probe()
+            try:
+                os.makedirs(os.path.dirname(NGSPICE_PROBE_PATH), exist_ok=True)
+                temp_path = f"{NGSPICE_PROBE_PATH}.{os.getpid()}"
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump({'key': key, 'probe': asdict(probe)}, f)
+                # concurrent workers may race, the file is replaced atomically
+                os.replace(temp_path, NGSPICE_PROBE_PATH)
+            except OSError:
+                pass
+        _ngspice_probe = (key, probe)
+        return probe
+
+
+def find_ngspice_library() -> Optional[str]:
+    path = os.environ.get("NGSPICE_LIBRARY_PATH")
+    if path and os.path.exists(path):
+        return path
+    return probe_ngspice().library
+
+
+class SharedNgspiceBackend(SimulatorBackend):
+    # persistent libngspice session: the circuit is loaded once and every
+    # following job only issues altermod commands and re-runs the analyses
+    name = "shared"
+
+    def __init__(self, library_path: Optional[str] = None):
+        library_path = library_path or find_ngspice_library()
+        if not library_path:
+            raise SimulationError("libngspice not found (set NGSPICE_LIBRARY_PATH)")
+
+        try:
+            self.lib = ctypes.CDLL(library_path)
+        except OSError as e:
+            raise SimulationError(f"Could not load {library_path}: {e}")
+
+        self.lib.ngSpice_Command.argtypes = [ctypes.c_char_p]
+        self.lib.ngSpice_Command.restype = ctypes.c_int
+        self.lib.ngSpice_Circ.argtypes = [ctypes.POINTER(ctypes.c_char_p)]
+        self.lib.ngSpice_Circ.restype = ctypes.c_int
+        self.lib.ngGet_Vec_Info.argtypes = [ctypes.c_char_p]
+        self.lib.ngGet_Vec_Info.restype = ctypes.POINTER(_VectorInfo)
+        self.lib.ngSpice_running.restype = ctypes.c_bool
+
+        self.output = deque(maxlen=500)
+        self.errors = []
+        self.lock = threading.Lock()
+        self.loaded_circuit = None
+        self.cancel_requested = False
+        self.background_done = threading.Event()
+
+        # keep references to the callbacks, ngspice calls them until unload
+        self._send_char = _SendChar(self._on_send_char)
+        self._send_stat = _SendStat(lambda text, ident, user: 0)
+        self._controlled_exit = _ControlledExit(self._on_exit)
+        self._bg_running = _BGThreadRunning(self._on_bg_running)
+        self.lib.ngSpice_Init(self._send_char, self._send_stat, self._controlled_exit,
+                              None, None, self._bg_running, None)
+
+    def _on_send_char(self, text, ident, user):
+        line = text.decode(errors='replace') if text else ""
+        self.output.append(line)
+        if line.startswith("stderr") and "error" in line.lower():
+            self.errors.append(line[len("stderr "):])
+        return 0
+
+    def _on_exit(self, status, unload, quit_request, ident, user):
+        self.loaded_circuit = None
+        return 0
+
+    def _on_bg_running(self, not_running, ident, user):
+        if not_running:
+            self.background_done.set()
+        return 0
+
+    def command(self, command: str):
+        self.errors = []
+        if self.lib.ngSpice_Command(command.encode()) != 0:
+            raise SimulationError(f"ngspice command failed: {command}")
+        if self.errors:
+            raise SimulationError(f"{command}: {'; '.join(self.errors)}")
+
+    def run_analysis(self, command: str):
+        # in libngspice's background thread, so cancel() can halt it mid-analysis
+        self.errors = []
+        self.background_done.clear()
+        if self.lib.ngSpice_Command(f"bg_{command}".encode()) != 0:
+            raise SimulationError(f"ngspice command failed: {command}")
+        while not self.background_done.wait(BACKGROUND_POLL):
+            if self.cancel_requested:
+                self.lib.ngSpice_Command(b"bg_halt")
+                while self.lib.ngSpice_running():
+                    self.background_done.wait(BACKGROUND_POLL)
+                # a halted analysis would be resumed by the next one, the circuit is loaded afresh
+                self.lib.ngSpice_Command(b"remcirc")
+                self.loaded_circuit = None
+                raise SimulationCancelled("Simulation cancelled")
+            if not self.lib.ngSpice_running():
+                break
+        if self.errors:
+            raise SimulationError(f"{command}: {'; '.join(self.errors)}")
+
+    def load_circuit(self, circuit: List[str]):
+        lines = list(circuit)
+        if not lines or lines[-1].strip().lower() != ".end":
+            lines.append(".end")
+        array = (ctypes.c_char_p * (len(lines) + 1))()
+        array[:-1] = [line.encode() for line in lines]
+        array[len(lines)] = None
+
+        if self.loaded_circuit is not None:
+            self.lib.ngSpice_Command(b"remcirc")
+            self.loaded_circuit = None
+
+        self.errors = []
+        if self.lib.ngSpice_Circ(array) != 0 or self.errors:
+            self.loaded_circuit = None
+            raise SimulationError(f"Could not load circuit: {'; '.join(self.errors)}")
+        self.loaded_circuit = lines
+
+    def get_vector(self, name: str) -> np.ndarray:
+        info = self.lib.ngGet_Vec_Info(name.encode())
+        if not info or not info.contents.v_realdata:
+            raise SimulationError(f"Vector '{name}' not found")
+        length = info.contents.v_length
+        # copy: ngspice frees the vector with the next `destroy all`
+        return np.ctypeslib.as_array(info.contents.v_realdata, shape=(length,)).copy()
+
+    def check_cancelled(self):
+        if self.cancel_requested:
+            raise SimulationCancelled("Simulation cancelled")
+
+    def run(self, job: SimulationJob, workdir: str) -> Vectors:
+        # the session is shared, time spent waiting for it shows up as ngspice_wait
+        with span("ngspice_wait"):
+            self.lock.acquire()
+        try:
+            self.cancel_requested = False
+            with span("load_circuit") as record:
+                record.set(reused=self.loaded_circuit == job.circuit)
+                if self.loaded_circuit != job.circuit:
+                    self.load_circuit(job.circuit)
+                else:
+                    # drop plots of the previous job so memory stays flat
+                    self.command("destroy all")
+
+                for command in altermod_commands(job.alter):
+                    self.command(command)
+
+            results = {}
+            for analysis in job.analyses:
+                self.check_cancelled()
+                with span("ngspice", analysis=analysis.name):
+                    for command in analysis.setup:
+                        self.command(command)
+                    self.run_analysis(analysis.command)
+                with span("read_vectors", analysis=analysis.name):
+                    for vec_name, expression in analysis.vectors.items():
+                        self.command(f"let {vec_name} = {expression}")
+                    results[analysis.name] = {vec_name: self.get_vector(vec_name)
+                                              for vec_name in analysis.vectors}
+            return results
+        finally:
+            self.lock.release()
+
+    def cancel(self):
+        # the running analysis is halted within BACKGROUND_POLL, later ones are not started
+        self.cancel_requested = True
+
+    def close(self):
+        try:
+            self.lib.ngSpice_Command(b"remcirc")
+        except Exception:
+            pass
+        self.loaded_circuit = None
+
+
+_shared_backend = None
+_shared_backend_lock = threading.Lock()
+
+
+def get_shared_backend() -> SharedNgspiceBackend:
+    # libngspice keeps global state, so there is one session per process
+    global _shared_backend
+    with _shared_backend_lock:
+        if _shared_backend is None:
+            _shared_backend = SharedNgspiceBackend()
+        return _shared_backend
+
+
+def create_backend(kind: Optional[str] = None) -> SimulatorBackend:
+    kind = (kind or os.environ.get("AUTO_CENTERING_BACKEND", "auto")).lower()
+
+    if kind == "subprocess":
+        return SubprocessNgspiceBackend(probe_ngspice().executable or "ngspice")
+
+    if kind == "analytic":
+        # compact-model stand-in, no ngspice needed
+        from surrogate import AnalyticBackend
+        return AnalyticBackend()
+
+    if kind in ("shared", "auto"):
+        try:
+            return get_shared_backend()
+        except SimulationError as e:
+            if kind == "shared":
+                raise
+            print(f"Shared ngspice session unavailable ({e}), using ngspice subprocess")
+            return SubprocessNgspiceBackend(probe_ngspice().executable or "ngspice")
+
+    raise ValueError(f"Unknown simulator backend: {kind}")
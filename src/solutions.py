@@ -0,0 +1,181 @@
+# Persistent store of centered solutions for warm starts
+# Every converged centering run records its target, final parameters and the
+# optimizer's Jacobian estimate. A new run looks up the stored solutions of the
+# same device, model library and backend, and starts from the nearest one in
+# target space, or from an inverse-distance interpolation of the nearest few,
+# instead of the nominal parameters. Entries live in SQLite like the
+# simulation cache.
+
+from __future__ import annotations
+
+import os
+import json
+import math
+import time
+import sqlite3
+import hashlib
+import threading
+from dataclasses import asdict
+from typing import Dict, List, Optional, Tuple
+
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+
+DEFAULT_SOLUTIONS_PATH = os.path.join(os.path.expanduser("~"), ".cache", "auto-centering", "solutions.sqlite")
+
+# distances are measured in these units, roughly "one routine retarget"
+FEATURE_SCALES = {'vth': 0.05, 'ion': 0.2, 'vdd': 0.1, 'temp': 25.0, 'length': 0.25, 'width': 0.25}
+LOG_FEATURES = ('ion', 'length', 'width')
+
+
+def _feature(name: str, value: float) -> float:
+    value = math.log(value) if name in LOG_FEATURES else value
+    return value / FEATURE_SCALES[name]
+
+
+def _without_targets(value):
+    # spec structure without the vth/ion values, which are the searched coordinates
+    if isinstance(value, dict):
+        return {key: _without_targets(item) for key, item in value.items() if key not in ('vth', 'ion')}
+    if isinstance(value, (list, tuple)):
+        return [_without_targets(item) for item in value]
+    return value
+
+
+def target_features(spec) -> Tuple[str, List[float]]:
+    # (signature, coordinates): only solutions with the same signature are comparable
+    if hasattr(spec, 'named_targets'):
+        structure = json.dumps(_without_targets(asdict(spec)), sort_keys=True)
+        signature = f"{type(spec).__name__}:{structure}"
+        features = []
+        for _, target, _ in spec.named_targets():
+            features += [_feature('vth', target.vth), _feature('ion', abs(target.ion))]
+        return signature, features
+    features = [_feature(name, abs(getattr(spec, name)) if name in LOG_FEATURES else getattr(spec, name))
+                for name in FEATURE_SCALES]
+    extra = {key: value for key, value in asdict(spec).items() if key not in FEATURE_SCALES}
+    if extra:
+        # e.g. Monte Carlo settings: centered means are not comparable to nominal solutions
+        return f"{type(spec).__name__}:{json.dumps(extra, sort_keys=True)}", features
+    return "single", features
+
+
+def interpolate_parameters(neighbours: List[Dict[str, float]], weights: np.ndarray) -> Dict[str, float]:
+    # vth0 is blended linearly, the positive scale parameters (u0, vsat, toxe) geometrically
+    weights = weights / weights.sum()
+    result = {}
+    for name in neighbours[0]:
+        values = np.array([params[name] for params in neighbours], dtype=float)
+        if name.split('[')[0] == 'vth0' or np.any(values <= 0):
+            result[name] = float(weights @ values)
+        else:
+            result[name] = float(np.exp(weights @ np.log(values)))
+    return result
+
+
+class SolutionStore:
+
+    def __init__(self, path: str = DEFAULT_SOLUTIONS_PATH):
+        self.path = path
+        self.local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self.connection() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS solutions ("
+                         "id INTEGER PRIMARY KEY, scope TEXT NOT NULL, signature TEXT NOT NULL, "
+                         "features TEXT NOT NULL, params TEXT NOT NULL, jacobian TEXT, optimizer TEXT, "
+                         "error REAL NOT NULL, created REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS solutions_scope ON solutions(scope, signature)")
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self.local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_scope(**parts) -> str:
+        # device model, model library digest, backend, ... : solutions never cross scopes
+        encoded = json.dumps(parts, sort_keys=True)
+        return hashlib.sha256(encoded.encode()).hexdigest()
+
+    def add(self, scope: str, spec, params: Dict[str, float], error: float,
+            jacobian: Optional[np.ndarray] = None, optimizer: Optional[str] = None):
+        signature, features = target_features(spec)
+        try:
+            with self.connection() as conn:
+                # re-centering the same target replaces its entry
+                conn.execute("DELETE FROM solutions WHERE scope = ? AND signature = ? AND features = ?",
+                             (scope, signature, json.dumps(features)))
+                conn.execute("INSERT INTO solutions (scope, signature, features, params, jacobian, optimizer, "
+                             "error, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                             (scope, signature, json.dumps(features), json.dumps(params),
+                              json.dumps(jacobian.tolist()) if jacobian is not None else None,
+                              optimizer, error, time.time()))
+        except sqlite3.Error as e:
+            print(f"Warning: solution store write failed: {e}")
+
+    def nearest(self, scope: str, spec, k: int = 3, max_distance: float = 10.0) -> Optional[Dict]:
+        # {'params', 'jacobian', 'optimizer', 'distance', 'neighbours'} or None;
+        # an exact match is returned as is, otherwise the k nearest are interpolated
+        signature, features = target_features(spec)
+        try:
+            with self.connection() as conn:
+                rows = conn.execute("SELECT features, params, jacobian, optimizer FROM solutions "
+                                    "WHERE scope = ? AND signature = ?", (scope, signature)).fetchall()
+        except sqlite3.Error as e:
+            print(f"Warning: solution store read failed: {e}")
+            return None
+        if not rows:
+            return None
+
+        points = np.array([json.loads(row[0]) for row in rows])
+        distances = np.linalg.norm(points - np.array(features), axis=1)
+        order = np.argsort(distances)[:k]
+        order = order[distances[order] <= max_distance]
+        if len(order) == 0:
+            return None
+
+        nearest = rows[order[0]]
+        params = [json.loads(rows[i][1]) for i in order]
+        # parameter sets of a different shape (e.g. bins) cannot be blended
+        order = [i for i, p in zip(order, params) if p.keys() == params[0].keys()]
+        params = [p for p in params if p.keys() == params[0].keys()]
+        if distances[order[0]] < 1e-9:
+            order, params = order[:1], params[:1]
+        if len(order) == 1:
+            blended = params[0]
+        else:
+            blended = interpolate_parameters(params, 1 / distances[order])
+        return {
+            'params': blended,
+            'jacobian': np.array(json.loads(nearest[2])) if nearest[2] is not None else None,
+            'optimizer': nearest[3],
+            'distance': float(distances[order[0]]),
+            'neighbours': len(order)
+        }
+
+    def count(self, scope: Optional[str] = None) -> int:
+        with self.connection() as conn:
+            if scope is None:
+                return conn.execute("SELECT COUNT(*) FROM solutions").fetchone()[0]
+            return conn.execute("SELECT COUNT(*) FROM solutions WHERE scope = ?", (scope,)).fetchone()[0]
+
+    def clear(self):
+        with self.connection() as conn:
+            conn.execute("DELETE FROM solutions")
+
+
+def create_solution_store(path: Optional[str] = None) -> Optional[SolutionStore]:
+    # AUTO_CENTERING_SOLUTIONS=off disables warm starts, any other value is the store file
+    setting = path or os.environ.get("AUTO_CENTERING_SOLUTIONS", DEFAULT_SOLUTIONS_PATH)
+    if setting.lower() in ("off", "none", "0", ""):
+        return None
+    try:
+        return SolutionStore(setting)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Warning: solution store disabled ({e})")
+        return None
@@ -0,0 +1,313 @@
+# Analytic device model stand-in for the simulator
+# AnalyticBackend runs the same SimulationJobs as the ngspice backends, but
+# evaluates a compact long-channel MOSFET approximation (threshold, mobility
+# with temperature dependence, velocity saturation, DIBL via eta0, swing via
+# nfactor, channel length modulation via pclm) with NumPy instead
+# of calling SPICE. A job costs well under a millisecond, so it is used as a
+# surrogate inside the optimizer and lets the whole centering flow run in CI
+# without ngspice installed. Absolute numbers are only roughly SPICE-like; the
+# SurrogateEvaluator corrects them against real simulation results.
+
+from __future__ import annotations
+
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from lazy import lazy_import
+
+from simulator import SimulatorBackend, SimulationJob, SimulationError, Vectors
+from model_library import ModelLibrary, parse_model_statement, parse_spice_number
+from telemetry import span
+
+np = lazy_import("numpy")
+
+EPSILON_OX = 3.9 * 8.854e-12    # F/m
+
+
+def compact_drain_current(vgs, vds, width: float, length: float, temp: float,
+                          vth0: float, u0: float, vsat: float, toxe: float,
+                          eta0: float = 0.08, nfactor: float = 1.0, pclm: float = 1.3) -> np.ndarray:
+    # smooth square law with velocity saturation, vectorized over vgs/vds (NMOS polarity);
+    # device parameters may be arrays that broadcast against the bias, e.g. one row per device
+    vgs = np.asarray(vgs, dtype=float)
+    vds = np.asarray(vds, dtype=float)
+    t_ratio = (temp + 273.15) / 300.15
+    vt = 0.02585 * t_ratio
+    n = 1 + 0.4 * nfactor
+
+    vth = vth0 - 1e-3 * (temp - 25) - 0.25 * eta0 * np.maximum(vds, 0) * np.minimum(1.0, 0.15e-6 / length)
+    mobility = np.where(u0 > 1, u0, u0 * 1e4) * 1e-4 * t_ratio ** -1.5    # m^2/V-s
+    cox = EPSILON_OX / toxe
+
+    vov = 2 * n * vt * np.logaddexp(0, (vgs - vth) / (2 * n * vt))
+    mobility_eff = mobility / (1 + 0.2 * vov)
+    esat_l = 2 * vsat / mobility_eff * length     # vsat in m/s, as in BSIM4
+    vdsat = vov * esat_l / (vov + esat_l)
+    vd = np.minimum(np.maximum(vds, 0), vdsat)
+    ids = mobility_eff * cox * width / length * (vov * vd - vd * vd / 2) / (1 + vd / esat_l)
+    return ids * (1 + 0.065 / pclm * np.maximum(vds - vd, 0))
+
+
+class AnalyticBackend(SimulatorBackend):
+    # understands the testbenches built by SkyWaterBSIM4Centering: MOSFETs and
+    # grounded voltage sources, dc sweeps and op, altermod/alter/option temp
+    name = "analytic"
+
+    def __init__(self):
+        self.libraries: Dict[Tuple[str, int], ModelLibrary] = {}
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        # process pool workers re-read the libraries they need
+        return {}
+
+    def __setstate__(self, state):
+        self.__init__()
+
+    def load_library(self, path: str) -> ModelLibrary:
+        key = (os.path.abspath(path), os.stat(path).st_mtime_ns)
+        with self.lock:
+            if key not in self.libraries:
+                self.libraries[key] = ModelLibrary(path)
+            return self.libraries[key]
+
+    def parse_circuit(self, circuit: List[str]):
+        models = {}
+        devices = []
+        sources = {}
+        temp = 27.0
+        includes = []
+
+        # join '+' continuation lines first
+        statements = []
+        for line in circuit:
+            stripped = line.strip()
+            if stripped.startswith('+') and statements:
+                statements[-1] += " " + stripped[1:]
+            elif stripped and not stripped.startswith('*'):
+                statements.append(stripped)
+
+        for statement in statements:
+            lowered = statement.lower()
+            parts = statement.split()
+            if lowered.startswith('.temp'):
+                temp = float(parts[1])
+            elif lowered.startswith('.include') or lowered.startswith('.lib '):
+                includes.append(parts[1].strip('"\''))
+            elif lowered.startswith('.model'):
+                card = parse_model_statement(statement)
+                if card is not None:
+                    models[card.name.lower()] = card
+            elif lowered.startswith('m'):
+                values = dict(re.findall(r'(\w+)\s*=\s*(\S+)', statement))
+                values = {key.lower(): parse_spice_number(value) for key, value in values.items()}
+                devices.append({
+                    'drain': parts[1].lower(), 'gate': parts[2].lower(), 'source': parts[3].lower(),
+                    'model': parts[5].lower(),
+                    'l': values.get('l') or 1e-6, 'w': values.get('w') or 1e-6,
+                    # BSIM4 instance mismatch parameters
+                    'delvto': values.get('delvto') or 0.0, 'mulu0': values.get('mulu0') or 1.0
+                })
+            elif lowered.startswith('v'):
+                value = parts[4] if len(parts) > 4 and parts[3].lower() == 'dc' else parts[3]
+                if parts[2] != '0':
+                    raise SimulationError(f"Only grounded sources are supported: {statement}")
+                sources[parts[0].lower()] = (parts[1].lower(), parse_spice_number(value))
+
+        for path in includes:
+            library = self.load_library(path)
+            for device in devices:
+                if device['model'] not in models:
+                    card = library.get(device['model'])
+                    if card is not None:
+                        models[device['model']] = card
+
+        parameters = {}
+        for device in devices:
+            card = models.get(device['model'])
+            if card is None:
+                raise SimulationError(f"Model {device['model']} not found")
+            parameters[device['model']] = {
+                'type': card.device_type,
+                'vth0': card.get('vth0', 0.4), 'u0': card.get('u0', 400.0),
+                'vsat': card.get('vsat', 8e4), 'toxe': card.get('toxe', 4e-9),
+                'eta0': card.get('eta0', 0.08), 'nfactor': card.get('nfactor', 1.0), 'pclm': card.get('pclm', 1.3)
+            }
+        return parameters, devices, sources, temp
+
+    def run(self, job: SimulationJob, workdir: Optional[str] = None) -> Vectors:
+        parameters, devices, sources, temp = self.parse_circuit(job.circuit)
+        state = {'temp': temp, 'sources': {name: value for name, (_, value) in sources.items()}}
+        self.apply_alter(parameters, job.alter)
+
+        results = {}
+        for analysis in job.analyses:
+            for command in analysis.setup:
+                self.apply_command(command, parameters, state)
+            voltages = self.node_voltages(analysis.command, sources, state)
+            currents = self.source_currents(parameters, devices, sources, voltages, state['temp'])
+            results[analysis.name] = {name: self.evaluate(expression, voltages, currents)
+                                      for name, expression in analysis.vectors.items()}
+        return results
+
+    @staticmethod
+    def apply_alter(parameters: Dict, alter: Dict[str, Dict[str, float]]):
+        for model, values in alter.items():
+            if model.lower() in parameters:
+                parameters[model.lower()].update(values)
+
+    def apply_command(self, command: str, parameters: Dict, state: Dict):
+        parts = command.replace('=', ' = ').split()
+        keyword = parts[0].lower()
+        if keyword == 'altermod':
+            self.apply_alter(parameters, {parts[1]: {parts[2].lower(): float(parts[4])}})
+        elif keyword == 'alter':
+            state['sources'][parts[1].lower()] = float(parts[-1])
+        elif keyword == 'option' and parts[1].lower() == 'temp':
+            state['temp'] = float(parts[-1])
+        else:
+            raise SimulationError(f"Unsupported command for the analytic backend: {command}")
+
+    @staticmethod
+    def node_voltages(command: str, sources: Dict, state: Dict) -> Dict[str, np.ndarray]:
+        parts = command.split()
+        voltages = {'0': np.zeros(1)}
+        for name, (node, _) in sources.items():
+            voltages[node] = np.full(1, state['sources'][name])
+        if parts[0].lower() == 'dc':
+            start, stop, step = (float(value) for value in parts[2:5])
+            sweep = start + step * np.arange(int(round((stop - start) / step)) + 1)
+            voltages[sources[parts[1].lower()][0]] = sweep
+        elif parts[0].lower() != 'op':
+            raise SimulationError(f"Unsupported analysis for the analytic backend: {command}")
+        length = max(len(v) for v in voltages.values())
+        return {node: np.broadcast_to(v, (length,)) for node, v in voltages.items()}
+
+    @staticmethod
+    def source_currents(parameters: Dict, devices: List[Dict], sources: Dict,
+                        voltages: Dict[str, np.ndarray], temp: float) -> Dict[str, np.ndarray]:
+        zero = np.zeros_like(voltages['0'])
+        node_currents = {}
+        if not devices:
+            return {name: zero for name in sources}
+        # all devices in one call, one row each (Monte Carlo testbenches have thousands)
+        def column(values):
+            return np.array(values, dtype=float)[:, None]
+        models = [parameters[device['model']] for device in devices]
+        sign = column([-1.0 if p['type'] == 'pmos' else 1.0 for p in models])
+        vs = np.array([voltages.get(device['source'], zero) for device in devices])
+        vgs = np.array([voltages.get(device['gate'], zero) for device in devices]) - vs
+        vds = np.array([voltages.get(device['drain'], zero) for device in devices]) - vs
+        ids = sign * compact_drain_current(
+            sign * vgs, sign * vds, column([device['w'] for device in devices]),
+            column([device['l'] for device in devices]), temp,
+            np.abs(column([p['vth0'] for p in models]) + column([device['delvto'] for device in devices])),
+            column([p['u0'] for p in models]) * column([device['mulu0'] for device in devices]),
+            column([p['vsat'] for p in models]), column([p['toxe'] for p in models]),
+            eta0=column([p['eta0'] for p in models]), nfactor=column([p['nfactor'] for p in models]),
+            pclm=column([p['pclm'] for p in models]))
+        for device, current in zip(devices, ids):
+            node_currents[device['drain']] = node_currents.get(device['drain'], zero) + current
+        # a source that sinks the drain current reports a negative current, as in SPICE
+        return {name: -node_currents.get(node, zero) for name, (node, _) in sources.items()}
+
+    @staticmethod
+    def evaluate(expression: str, voltages: Dict[str, np.ndarray], currents: Dict[str, np.ndarray]) -> np.ndarray:
+        expression = expression.strip().lower()
+        if expression.startswith('abs(') and expression.endswith(')'):
+            return np.abs(AnalyticBackend.evaluate(expression[4:-1], voltages, currents))
+        match = re.fullmatch(r'v\((\w+)\)', expression)
+        if match:
+            return np.array(voltages.get(match.group(1), np.zeros_like(voltages['0'])))
+        match = re.fullmatch(r'i\((\w+)\)', expression)
+        if match and match.group(1) in currents:
+            return np.array(currents[match.group(1)])
+        raise SimulationError(f"Unsupported vector expression for the analytic backend: {expression}")
+
+
+class SurrogateEvaluator:
+    # Runs the centering jobs on the analytic backend and corrects the results
+    # towards the real simulator (output space mapping): per target, Vth gets an
+    # offset and Ion a ratio. The correction is exact at the reference point and
+    # varies linearly around it; the slope is learned with Broyden updates from
+    # every real result, so model-form errors of the surrogate shrink as the
+    # optimizer proceeds. Exposes the part of the SkyWaterBSIM4Centering
+    # interface the optimizer strategies use.
+
+    def __init__(self, centering, to_x, backend: Optional[AnalyticBackend] = None):
+        self.centering = centering
+        self.to_x = to_x                # params -> optimizer unknowns
+        self.backend = backend or AnalyticBackend()
+        self.x_ref = None
+        self.c_ref = None
+        self.B = None
+        self.simulation_count = 0
+
+    def raw_results(self, params, spec) -> Dict:
+        # the analytic model is cheap, its candidates may be far from the last Vth
+        with self.centering.full_sweeps():
+            jobs = self.centering.build_simulation_jobs(params, spec)
+        self.simulation_count += 1
+        try:
+            vectors_list = [self.backend.run(job) for job in jobs]
+        except SimulationError as e:
+            print(f"Surrogate error: {e}")
+            return self.centering.failed_results(spec)
+        return self.centering.extract_job_results(vectors_list, spec)
+
+    def corrections(self, params, spec, real_results: Dict) -> np.ndarray:
+        # flattened (vth offset, ln ion ratio) per target
+        return np.array(self._corrections(real_results, self.raw_results(params, spec)))
+
+    def calibrate(self, params, spec, real_results: Dict, reference: bool = True):
+        # learn from one real result; reference=True makes it the new expansion point
+        if self.simulation_failed(real_results):
+            return
+        x = self.to_x(params)
+        c = self.corrections(params, spec, real_results)
+        if not np.all(np.isfinite(c)):
+            return
+        if self.B is None or self.B.shape != (len(c), len(x)):
+            self.B = np.zeros((len(c), len(x)))
+        elif self.x_ref is not None:
+            dx = x - self.x_ref
+            if dx @ dx > 0:
+                self.B += np.outer(c - self.c_ref - self.B @ dx, dx) / (dx @ dx)
+        if reference or self.x_ref is None:
+            self.x_ref, self.c_ref = x, c
+
+    @classmethod
+    def _corrections(cls, real: Dict, surrogate: Dict) -> List[float]:
+        if 'vth' in real:
+            if surrogate['vth'] == 0 or surrogate['ion'] == 0:
+                return [np.nan, np.nan]
+            return [real['vth'] - surrogate['vth'], np.log(real['ion'] / surrogate['ion'])]
+        return [c for name in real for c in cls._corrections(real[name], surrogate[name])]
+
+    @classmethod
+    def _apply(cls, results: Dict, corrections: List[float]) -> Dict:
+        if 'vth' in results:
+            vth_offset, ion_log_ratio = corrections.pop(0), corrections.pop(0)
+            if results['vth'] == 0 or results['ion'] == 0:
+                return results
+            return {**results, 'vth': results['vth'] + vth_offset, 'ion': results['ion'] * np.exp(ion_log_ratio)}
+        return {name: cls._apply(results[name], corrections) for name in results}
+
+    def run_simulation(self, params, spec) -> Dict:
+        with span("surrogate_evaluation"):
+            results = self.raw_results(params, spec)
+            if self.x_ref is None:
+                return results
+            corrections = self.c_ref + self.B @ (self.to_x(params) - self.x_ref)
+            return self._apply(results, list(corrections))
+
+    def run_simulations_batch(self, params_list, spec) -> List[Dict]:
+        return [self.run_simulation(params, spec) for params in params_list]
+
+    def simulation_failed(self, results) -> bool:
+        return self.centering.simulation_failed(results)
+
+    def calculate_error(self, results, spec) -> float:
+        return self.centering.calculate_error(results, spec)
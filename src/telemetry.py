@@ -0,0 +1,180 @@
+# Structured telemetry
+# Spans time the stages of a centering run: iterations, optimizer steps,
+# netlist generation, cache lookups, simulator start-up and solve, rawfile
+# parsing and metric extraction. A finished span is one record in the style of
+# an OpenTelemetry span (name, trace/span/parent ids, start, duration, status,
+# attributes). Records are streamed as JSON lines (AUTO_CENTERING_TRACE=
+# trace.jsonl); in memory only per-trace stage totals for the end-of-run
+# profile and the most recent records are kept, so long runs stay flat.
+# Code without a handle on the tracer (simulator backends, pool workers) uses
+# the module level span(), which records into the tracer active on the
+# current thread and costs nothing when there is none.
+
+import os
+import json
+import time
+import uuid
+import threading
+import contextlib
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field, asdict
+from typing import Deque, Dict, Optional, Tuple
+
+# active tracer and span of the current thread
+_context = threading.local()
+
+MAX_RECORDS = 10000     # recent spans kept in memory, the JSONL file has all of them
+MAX_TRACES = 100        # traces (runs) whose profile is kept
+
+
+@dataclass
+class SpanRecord:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start: float                    # epoch seconds
+    duration: float = 0.0           # seconds
+    status: str = "ok"              # ok / error
+    attributes: Dict = field(default_factory=dict)
+    thread: str = ""
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+
+class _NullSpan:
+
+    def set(self, **attributes):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Telemetry:
+
+    def __init__(self, path: Optional[str] = None):
+        self.trace_id = uuid.uuid4().hex
+        self.records: Deque[SpanRecord] = deque(maxlen=MAX_RECORDS)
+        self.traces: OrderedDict = OrderedDict()    # trace id -> {'wall': s, 'stages': {name: totals}}
+        self.lock = threading.Lock()
+        self.path = path
+        self.file = None
+        if path:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            # line buffered: every span is on disk as soon as it ends
+            self.file = open(path, 'a', encoding='utf-8', buffering=1)
+
+    def new_trace(self) -> str:
+        # one trace per optimization run
+        self.trace_id = uuid.uuid4().hex
+        return self.trace_id
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attributes):
+        tracer, parent = current_context()
+        if tracer is not self:
+            parent = None
+        record = SpanRecord(name=name, trace_id=self.trace_id, span_id=uuid.uuid4().hex[:16],
+                            parent_id=parent.span_id if parent is not None else None,
+                            start=time.time(), attributes=attributes,
+                            thread=threading.current_thread().name)
+        _context.tracer, _context.span = self, record
+        started = time.perf_counter()
+        try:
+            yield record
+        except BaseException as e:
+            record.status = "error"
+            record.attributes['exception'] = type(e).__name__
+            raise
+        finally:
+            record.duration = time.perf_counter() - started
+            _context.tracer, _context.span = tracer, parent
+            self.record(record)
+
+    def record(self, record: SpanRecord):
+        with self.lock:
+            self.records.append(record)
+            self.accumulate(record)
+            if self.file is not None:
+                self.file.write(json.dumps(asdict(record), default=str) + "\n")
+
+    def accumulate(self, record: SpanRecord):
+        # running per-stage totals of the record's trace, the oldest traces are dropped
+        trace = self.traces.get(record.trace_id)
+        if trace is None:
+            trace = self.traces[record.trace_id] = {'wall': 0.0, 'stages': {}}
+            while len(self.traces) > MAX_TRACES:
+                self.traces.popitem(last=False)
+        if record.parent_id is None:
+            trace['wall'] += record.duration
+        stage = trace['stages'].setdefault(record.name, {'calls': 0, 'total': 0.0, 'max': 0.0, 'errors': 0})
+        stage['calls'] += 1
+        stage['total'] += record.duration
+        stage['max'] = max(stage['max'], record.duration)
+        stage['errors'] += record.status != "ok"
+        if 'hit' in record.attributes:
+            stage['hits'] = stage.get('hits', 0) + bool(record.attributes['hit'])
+
+    def profile(self, trace_id: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+        # per span name: calls, total/mean/max seconds, errors and share of the root spans' wall time
+        trace_id = trace_id or self.trace_id
+        with self.lock:
+            trace = self.traces.get(trace_id, {'wall': 0.0, 'stages': {}})
+            wall = trace['wall']
+            stages = {name: dict(stage) for name, stage in trace['stages'].items()}
+        for stage in stages.values():
+            stage['mean'] = stage['total'] / stage['calls']
+            stage['share'] = stage['total'] / wall if wall > 0 else 0.0
+        return dict(sorted(stages.items(), key=lambda item: -item[1]['total']))
+
+    def format_profile(self, trace_id: Optional[str] = None) -> str:
+        stages = self.profile(trace_id)
+        lines = [f"{'Stage':<20}{'Calls':>7}{'Total (s)':>11}{'Mean (ms)':>11}{'Max (ms)':>10}{'Share':>8}"]
+        for name, stage in stages.items():
+            extra = f"  {stage['hits']}/{stage['calls']} hits" if 'hits' in stage else ""
+            extra += f"  {stage['errors']} errors" if stage['errors'] else ""
+            lines.append(f"{name:<20}{stage['calls']:>7}{stage['total']:>11.3f}{stage['mean']*1000:>11.2f}"
+                         f"{stage['max']*1000:>10.2f}{stage['share']*100:>7.1f}%{extra}")
+        return "\n".join(lines)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def current_context() -> Tuple[Optional[Telemetry], Optional[SpanRecord]]:
+    return getattr(_context, 'tracer', None), getattr(_context, 'span', None)
+
+
+@contextlib.contextmanager
+def attach(context: Tuple[Optional[Telemetry], Optional[SpanRecord]]):
+    # continue a trace on another thread (pool workers)
+    previous = current_context()
+    _context.tracer, _context.span = context
+    try:
+        yield
+    finally:
+        _context.tracer, _context.span = previous
+
+
+def span(name: str, **attributes):
+    tracer = getattr(_context, 'tracer', None)
+    if tracer is None:
+        return contextlib.nullcontext(_NULL_SPAN)
+    return tracer.span(name, **attributes)
+
+
+def create_telemetry(path: Optional[str] = None) -> Telemetry:
+    # AUTO_CENTERING_TRACE=<file> streams the spans as JSON lines, spans are always profiled in memory
+    setting = path or os.environ.get("AUTO_CENTERING_TRACE", "")
+    if setting.lower() in ("off", "none", "0", ""):
+        return Telemetry()
+    try:
+        return Telemetry(setting)
+    except OSError as e:
+        print(f"Warning: telemetry file disabled ({e})")
+        return Telemetry()
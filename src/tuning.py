@@ -0,0 +1,126 @@
+# Declarative centering configuration
+# TunableParameter describes a BSIM4 model parameter the optimizer may move:
+# bounds, whether it is optimized on a log scale, the finite-difference step
+# and the BSIM4 default used when the model card does not set it.
+# MetricTarget is a measured I-V metric with a target value and a weight; the
+# testbench and the extraction only measure what the targets ask for.
+#
+#   tool = SkyWaterBSIM4Centering(tunables=['vth0', 'u0', 'vsat', 'eta0'])
+#   spec = BSIM4TargetSpec(vth=0.42, ion=5e-4, metrics=[MetricTarget('dibl', 20.0)])
+
+import math
+from dataclasses import dataclass, replace
+from typing import Dict, Optional, Sequence, Tuple, Union
+
+
+@dataclass(frozen=True)
+class TunableParameter:
+    name: str                   # BSIM4 model parameter, lower case
+    lower: float
+    upper: float
+    log_scale: bool = False     # optimize ln(value), for positive scale parameters
+    fd_step: float = 0.02       # finite-difference step in optimizer units (ln units if log_scale)
+    default: float = 0.0        # BSIM4 default when the card does not set it
+    fmt: str = ".4g"            # console format
+
+    def __post_init__(self):
+        if not self.lower < self.upper:
+            raise ValueError(f"{self.name}: lower bound must be below the upper bound")
+        if self.log_scale and self.lower <= 0:
+            raise ValueError(f"{self.name}: log-scaled parameters need positive bounds")
+
+    def clamp(self, value: float) -> float:
+        return max(self.lower, min(self.upper, value))
+
+    def to_x(self, value: float) -> float:
+        return math.log(value) if self.log_scale else value
+
+    def from_x(self, x: float) -> float:
+        # exp(log(bound)) may round to just outside the bound
+        return self.clamp(math.exp(x)) if self.log_scale else float(x)
+
+
+TUNABLE_PARAMETERS = {p.name: p for p in (
+    # |vth0| of thin-oxide core devices
+    TunableParameter('vth0', 0.1, 0.9, fd_step=0.005, default=0.7, fmt=".3f"),              # V
+    # inversion-layer mobility: holes ~50, electrons stay below the bulk 1400
+    TunableParameter('u0', 50, 1000, log_scale=True, default=670, fmt=".1f"),               # cm^2/V-s
+    # silicon saturates near 1e5 m/s; up to 3x for velocity overshoot in short channels
+    TunableParameter('vsat', 5e4, 3e5, log_scale=True, default=8e4, fmt=".2e"),             # m/s
+    TunableParameter('toxe', 1e-9, 1e-8, log_scale=True, default=3e-9, fmt=".3e"),          # m
+    TunableParameter('k1', 0.05, 1.5, log_scale=True, default=0.53),                        # V^0.5
+    TunableParameter('k2', -0.5, 0.5, fd_step=0.005, default=-0.0186),
+    TunableParameter('eta0', 1e-3, 1.0, log_scale=True, default=0.08),                      # DIBL
+    TunableParameter('dsub', 0.05, 2.0, log_scale=True, default=0.56),
+    TunableParameter('voff', -0.3, 0.1, fd_step=0.005, default=-0.08),                      # V
+    TunableParameter('nfactor', 0.2, 4.0, log_scale=True, default=1.0),                     # subthreshold swing
+    TunableParameter('rdsw', 10, 2000, log_scale=True, default=200),                        # ohm-um
+    TunableParameter('pclm', 0.1, 10, log_scale=True, default=1.3),                         # output resistance
+    TunableParameter('pdiblc2', 1e-5, 0.1, log_scale=True, default=0.0086),
+)}
+
+DEFAULT_TUNABLES = ('vth0', 'u0', 'vsat')
+
+
+def resolve_tunables(tunables: Optional[Sequence[Union[str, TunableParameter, Dict]]] = None
+                     ) -> Tuple[TunableParameter, ...]:
+    # names use the registry, dicts override registry fields (or define a new parameter)
+    resolved = []
+    for item in tunables or DEFAULT_TUNABLES:
+        if isinstance(item, TunableParameter):
+            parameter = item
+        elif isinstance(item, str):
+            if item.lower() not in TUNABLE_PARAMETERS:
+                raise ValueError(f"Unknown tunable parameter: {item} (give bounds as "
+                                 f"{{'name': ..., 'lower': ..., 'upper': ...}})")
+            parameter = TUNABLE_PARAMETERS[item.lower()]
+        else:
+            fields = {**item, 'name': str(item['name']).lower()}
+            base = TUNABLE_PARAMETERS.get(fields['name'])
+            parameter = replace(base, **fields) if base is not None else TunableParameter(**fields)
+        resolved.append(parameter)
+    names = [parameter.name for parameter in resolved]
+    if len(set(names)) != len(names):
+        raise ValueError("Tunable parameters must be unique")
+    return tuple(resolved)
+
+
+@dataclass(frozen=True)
+class Metric:
+    unit: str
+    log_scale: bool = False     # error in decades instead of relative
+    analysis: str = "lin"       # sweep the metric is measured on (lin, sat, out)
+
+
+# vth and ion are always measured; the rest only when targeted
+METRICS = {
+    'vth': Metric("V"),
+    'ion': Metric("A/um", analysis="sat"),
+    'vth_gm': Metric("V"),
+    'vth_sat': Metric("V", analysis="sat"),
+    'ss': Metric("mV/dec"),
+    'dibl': Metric("mV/V", analysis="sat"),
+    'ioff': Metric("A/um", log_scale=True, analysis="sat"),
+    'gm': Metric("S/um"),                       # peak transconductance of the linear sweep
+    'idlin': Metric("A/um"),                    # linear current at Vgs = VDD
+    'rout': Metric("ohm-um", analysis="out"),   # output resistance at Vgs = Vds = VDD
+}
+
+
+@dataclass
+class MetricTarget:
+    name: str
+    value: float
+    weight: float = 1.0
+
+    def __post_init__(self):
+        if self.name not in METRICS or self.name in ('vth', 'ion'):
+            raise ValueError(f"Unknown target metric: {self.name} "
+                             f"(choose from {', '.join(name for name in METRICS if name not in ('vth', 'ion'))})")
+        if self.value == 0 or (METRICS[self.name].log_scale and self.value < 0):
+            raise ValueError(f"Invalid {self.name} target: {self.value}")
+
+    def error(self, measured: float) -> float:
+        if METRICS[self.name].log_scale:
+            return math.log10(measured / self.value) if measured > 0 else float('nan')
+        return (measured - self.value) / abs(self.value)
@@ -0,0 +1,35 @@
+# Test setup: the modules live flat in src/, and every test runs on the analytic
+# backend without the on-disk simulation cache or solution store
+
+import os
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(REPO_DIR, "src")
+MODEL_LIB = os.path.join(REPO_DIR, "skywater_models.lib")
+sys.path.insert(0, SRC_DIR)
+
+os.environ["AUTO_CENTERING_BACKEND"] = "analytic"
+os.environ["AUTO_CENTERING_CACHE"] = "off"
+os.environ["AUTO_CENTERING_SOLUTIONS"] = "off"
+os.environ.pop("AUTO_CENTERING_TRACE", None)
+
+
+@pytest.fixture
+def make_tool():
+    # centering tools on the bundled library with extracted nominal parameters, closed after the test
+    from auto_centering import SkyWaterBSIM4Centering
+    tools = []
+
+    def make(device_model: str = "sky130_fd_pr__nfet_01v8", **options):
+        options.setdefault('warm_start', False)
+        tool = SkyWaterBSIM4Centering(model_lib_file=MODEL_LIB, device_model=device_model, **options)
+        tool.extract_nominal_parameters()
+        tools.append(tool)
+        return tool
+
+    yield make
+    for tool in tools:
+        tool.close()
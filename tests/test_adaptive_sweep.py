@@ -0,0 +1,74 @@
+import copy
+
+import pytest
+
+from auto_centering import ADAPTIVE_STEP, ADAPTIVE_WINDOW, BSIM4TargetSpec
+from cache import SimulationCache
+
+SPEC = BSIM4TargetSpec(vth=0.42, ion=5e-4)
+
+
+def lin_command(tool, params, spec=SPEC):
+    job = tool.build_simulation_job(params, spec)
+    return next(analysis.command for analysis in job.analyses if analysis.name == 'lin')
+
+
+def test_window_follows_last_vth(make_tool):
+    tool = make_tool(sweep='adaptive')
+    params = tool.current_params
+    assert lin_command(tool, params) == "dc Vgs1 0 1.8 0.02"
+
+    tool.vth_brackets[""] = (0.5, abs(params.vth0))
+    assert lin_command(tool, params) == f"dc Vgs1 {0.5 - ADAPTIVE_WINDOW:.6g} {0.5 + ADAPTIVE_WINDOW:.6g} {ADAPTIVE_STEP:.6g}"
+
+    # the window moves with vth0
+    shifted = copy.deepcopy(params)
+    shifted.vth0 = params.vth0 + 0.1
+    assert lin_command(tool, shifted) == f"dc Vgs1 {0.6 - ADAPTIVE_WINDOW:.6g} {0.6 + ADAPTIVE_WINDOW:.6g} {ADAPTIVE_STEP:.6g}"
+
+
+def test_full_sweep_when_window_hits_0v_or_vdd(make_tool):
+    tool = make_tool(sweep='adaptive')
+    params = tool.current_params
+    tool.vth_brackets[""] = (ADAPTIVE_WINDOW / 2, abs(params.vth0))
+    assert lin_command(tool, params) == "dc Vgs1 0 1.8 0.02"
+    tool.vth_brackets[""] = (SPEC.vdd - ADAPTIVE_WINDOW / 2, abs(params.vth0))
+    assert lin_command(tool, params) == "dc Vgs1 0 1.8 0.02"
+
+
+def test_full_mode_ignores_brackets(make_tool):
+    tool = make_tool()
+    tool.vth_brackets[""] = (0.5, abs(tool.current_params.vth0))
+    assert lin_command(tool, tool.current_params) == "dc Vgs1 0 1.8 0.02"
+
+
+def test_missed_window_repeats_with_full_sweep(make_tool):
+    expected = make_tool().run_simulation(make_tool().current_params, SPEC)
+
+    tool = make_tool(sweep='adaptive')
+    params = tool.current_params
+    # a window far above the real Vth: no crossing of the threshold current
+    tool.vth_brackets[""] = (1.5, abs(params.vth0))
+    results = tool.run_simulation(params, SPEC)
+    assert tool.simulation_count == 2
+    assert results['vth'] == pytest.approx(expected['vth'])
+    assert results['ion'] == pytest.approx(expected['ion'])
+    # the brackets are restored for the next iteration
+    assert tool.vth_brackets[""] == (1.5, abs(params.vth0))
+
+
+def test_cache_keys_carry_the_window(make_tool, tmp_path):
+    tool = make_tool(sweep='adaptive', cache=SimulationCache(str(tmp_path / "cache.sqlite")))
+    params = tool.current_params
+    full = tool.simulation_cache_key(params, SPEC)
+    assert full == make_tool(cache=tool.cache).simulation_cache_key(params, SPEC)
+
+    tool.vth_brackets[""] = (0.5, abs(params.vth0))
+    window = tool.simulation_cache_key(params, SPEC)
+    tool.vth_brackets[""] = (0.55, abs(params.vth0))
+    moved = tool.simulation_cache_key(params, SPEC)
+    assert len({full, window, moved}) == 3
+
+    # a window falling back to the full sweep shares the full-sweep results
+    tool.vth_brackets[""] = (ADAPTIVE_WINDOW / 2, abs(params.vth0))
+    assert tool.simulation_cache_key(params, SPEC) == full
@@ -0,0 +1,132 @@
+import threading
+
+from auto_centering import BSIM4TargetSpec
+from batch import SimulationPool
+from simulator import SimulationError
+from surrogate import AnalyticBackend
+
+SPEC = BSIM4TargetSpec(vth=0.42, ion=5e-4)
+
+
+class RecordingBackend(AnalyticBackend):
+    # analytic results; records the sandbox of every job, fails jobs marked in the
+    # circuit and can hold jobs at a gate
+    name = "recording"
+
+    def __init__(self, gate: threading.Event = None):
+        super().__init__()
+        self.gate = gate
+        self.started = threading.Semaphore(0)
+        self.workdirs = []
+
+    def run(self, job, workdir=None):
+        with self.lock:
+            self.workdirs.append((threading.get_ident(), workdir))
+        self.started.release()
+        if self.gate is not None:
+            self.gate.wait(10)
+        if "* fail" in job.circuit:
+            raise SimulationError("marked to fail")
+        return super().run(job, workdir)
+
+
+def candidate_jobs(tool, count: int):
+    params_list = [tool.current_params.updated({'vth0': 0.30 + 0.02 * i}) for i in range(count)]
+    return params_list, [tool.build_simulation_job(params, SPEC) for params in params_list]
+
+
+def test_results_come_back_in_job_order(make_tool):
+    tool = make_tool()
+    params_list, jobs = candidate_jobs(tool, 8)
+    pool = SimulationPool(AnalyticBackend(), workers=4)
+    try:
+        outcomes = pool.run(jobs)
+    finally:
+        pool.close()
+    serial = [tool.extract_results(AnalyticBackend().run(job), SPEC)['vth'] for job in jobs]
+    assert [tool.extract_results(vectors, SPEC)['vth'] for vectors in outcomes] == serial
+    assert serial == sorted(serial)
+
+
+def test_run_simulations_batch_matches_single_runs(make_tool):
+    tool = make_tool(workers=3)
+    params_list, _ = candidate_jobs(tool, 5)
+    batch = tool.run_simulations_batch(params_list, SPEC)
+    single = [tool.run_simulation(params, SPEC) for params in params_list]
+    assert [result['vth'] for result in batch] == [result['vth'] for result in single]
+    assert [result['ion'] for result in batch] == [result['ion'] for result in single]
+
+
+def test_every_worker_has_its_own_sandbox(make_tool):
+    _, jobs = candidate_jobs(make_tool(), 12)
+    backend = RecordingBackend()
+    pool = SimulationPool(backend, workers=3)
+    try:
+        pool.run(jobs)
+        root = pool.root_dir
+    finally:
+        pool.close()
+    sandboxes = {}
+    for thread, workdir in backend.workdirs:
+        assert workdir.startswith(root)
+        sandboxes.setdefault(thread, set()).add(workdir)
+    # one sandbox per worker thread, never shared between workers
+    assert all(len(dirs) == 1 for dirs in sandboxes.values())
+    assert len({dirs.pop() for dirs in sandboxes.values()}) == len(sandboxes)
+
+
+def test_failed_job_returns_its_exception_in_its_slot(make_tool):
+    _, jobs = candidate_jobs(make_tool(), 4)
+    jobs[2].circuit = jobs[2].circuit + ["* fail"]
+    pool = SimulationPool(RecordingBackend(), workers=2)
+    try:
+        outcomes = pool.run(jobs)
+    finally:
+        pool.close()
+    assert isinstance(outcomes[2], SimulationError)
+    assert all(isinstance(outcomes[i], dict) for i in (0, 1, 3))
+
+
+def run_in_thread(pool, jobs, cancelled=None):
+    outcome = {}
+    thread = threading.Thread(target=lambda: outcome.setdefault('results', pool.run(jobs, cancelled=cancelled)))
+    thread.start()
+    return thread, outcome
+
+
+def test_cancel_drops_queued_jobs(make_tool):
+    _, jobs = candidate_jobs(make_tool(), 4)
+    gate = threading.Event()
+    backend = RecordingBackend(gate)
+    pool = SimulationPool(backend, workers=1)
+    thread, outcome = run_in_thread(pool, jobs)
+    assert backend.started.acquire(timeout=10)
+    pool.cancel()
+    gate.set()
+    thread.join(10)
+    pool.close()
+    # the running job finishes, the queued ones never start
+    assert isinstance(outcome['results'][0], dict)
+    assert all(isinstance(result, Exception) for result in outcome['results'][1:])
+    assert len(backend.workdirs) == 1
+
+
+def test_shared_pool_drops_only_the_cancelled_runs_jobs(make_tool):
+    _, jobs = candidate_jobs(make_tool(), 6)
+    gate = threading.Event()
+    backend = RecordingBackend(gate)
+    pool = SimulationPool(backend, workers=1, shared=True)
+    cancelled = threading.Event()
+    first, first_outcome = run_in_thread(pool, jobs[:3], cancelled=cancelled.is_set)
+    assert backend.started.acquire(timeout=10)
+    second, second_outcome = run_in_thread(pool, jobs[3:])
+    cancelled.set()
+    gate.set()
+    first.join(10)
+    second.join(10)
+    pool.close()
+    assert isinstance(first_outcome['results'][0], dict)
+    assert all(isinstance(result, Exception) for result in first_outcome['results'][1:])
+    # the other run keeps its jobs and the pool keeps working
+    assert all(isinstance(result, dict) for result in second_outcome['results'])
+    assert len(backend.workdirs) == 4
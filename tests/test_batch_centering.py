@@ -0,0 +1,145 @@
+import json
+import os
+
+import pytest
+
+from auto_centering import BSIM4GeometrySpec, BSIM4MultiTargetSpec, BSIM4StatisticalSpec, BSIM4TargetSpec
+from batch_centering import JOB_DEFAULTS, build_target_spec, load_job_file, main, parse_tunables
+from conftest import MODEL_LIB
+
+
+def write(path, text: str) -> str:
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+def test_csv_empty_cells_use_the_defaults(tmp_path):
+    path = write(tmp_path / "jobs.csv",
+                 "name,device_model,vth,ion,tolerance,metrics,tunables\n"
+                 "n1,,0.42,5e-4,,dibl=20;ss=85,vth0 u0 vsat eta0\n"
+                 "p1,sky130_fd_pr__pfet_01v8,-0.42,3e-4,0.01,,\n")
+    n1, p1 = load_job_file(path)
+    assert n1['device_model'] == JOB_DEFAULTS['device_model']
+    assert n1['tolerance'] == JOB_DEFAULTS['tolerance']
+    assert 'metrics' not in p1 and 'tunables' not in p1
+    assert p1['device_model'] == "sky130_fd_pr__pfet_01v8" and p1['tolerance'] == "0.01"
+
+    spec = build_target_spec(n1)
+    assert type(spec) is BSIM4TargetSpec and (spec.vth, spec.ion) == (0.42, 5e-4)
+    assert [(metric.name, metric.value) for metric in spec.metrics] == [('dibl', 20.0), ('ss', 85.0)]
+    assert parse_tunables(n1['tunables']) == ['vth0', 'u0', 'vsat', 'eta0']
+    assert build_target_spec(p1).metrics == [] and parse_tunables(p1.get('tunables')) is None
+
+
+def test_defaults_merge_under_each_device(tmp_path):
+    path = write(tmp_path / "jobs.json", json.dumps({
+        'defaults': {'vdd': 1.2, 'optimizer': 'broyden', 'metrics': {'dibl': 20}},
+        'devices': [{'name': 'a', 'vth': 0.4, 'ion': 4e-4},
+                    {'name': 'b', 'vth': 0.45, 'ion': 4e-4, 'vdd': 1.8, 'optimizer': 'lm'}]
+    }))
+    a, b = load_job_file(path)
+    assert (a['vdd'], a['optimizer']) == (1.2, 'broyden')
+    assert (b['vdd'], b['optimizer']) == (1.8, 'lm')
+    assert a['max_iterations'] == JOB_DEFAULTS['max_iterations']
+    assert build_target_spec(a).vdd == 1.2
+    assert build_target_spec(b).metrics[0].name == 'dibl'
+
+
+def test_unnamed_devices_are_numbered(tmp_path):
+    path = write(tmp_path / "jobs.json", json.dumps([{'vth': 0.4, 'ion': 4e-4}, {'vth': 0.45, 'ion': 4e-4}]))
+    assert [job['name'] for job in load_job_file(path)] == [f"{JOB_DEFAULTS['device_model']}_{i}" for i in range(2)]
+
+
+def test_duplicate_and_invalid_names(tmp_path):
+    path = write(tmp_path / "jobs.json", json.dumps([{'name': 'a', 'vth': 0.4, 'ion': 4e-4},
+                                                     {'name': 'a', 'vth': 0.45, 'ion': 4e-4}]))
+    with pytest.raises(SystemExit, match="Duplicate device names: a"):
+        load_job_file(path)
+    path = write(tmp_path / "jobs.json", json.dumps([{'name': '../a', 'vth': 0.4, 'ion': 4e-4}]))
+    with pytest.raises(SystemExit, match="Invalid device name"):
+        load_job_file(path)
+
+
+def test_empty_and_unsupported_job_files(tmp_path):
+    with pytest.raises(SystemExit, match="No devices"):
+        load_job_file(write(tmp_path / "jobs.json", json.dumps({'devices': []})))
+    with pytest.raises(SystemExit, match="Unsupported job file format"):
+        load_job_file(write(tmp_path / "jobs.txt", "vth=0.4"))
+
+
+def test_model_libraries_are_relative_to_the_job_file(tmp_path):
+    (tmp_path / "jobs").mkdir()
+    path = write(tmp_path / "jobs" / "jobs.json", json.dumps([
+        {'name': 'relative', 'vth': 0.4, 'ion': 4e-4, 'model_lib': '../models/custom.lib'},
+        {'name': 'absolute', 'vth': 0.4, 'ion': 4e-4, 'model_lib': MODEL_LIB},
+        {'name': 'default', 'vth': 0.4, 'ion': 4e-4}
+    ]))
+    relative, absolute, default = load_job_file(path)
+    assert os.path.normpath(relative['model_lib']) == str(tmp_path / "models" / "custom.lib")
+    assert absolute['model_lib'] == MODEL_LIB
+    assert default['model_lib'] == str(tmp_path / "jobs" / JOB_DEFAULTS['model_lib'])
+
+
+def test_spec_kinds():
+    job = {**JOB_DEFAULTS, 'vth': 0.42, 'ion': 5e-4}
+    corners = build_target_spec({**job, 'corners': [{'name': 'tt'}, {'name': 'ss', 'temp': 125, 'vth0_shift': 0.03}]})
+    assert type(corners) is BSIM4MultiTargetSpec
+    assert corners.corners[1].target.temp == 125 and corners.corners[1].vth0_shift == 0.03
+    assert corners.corners[1].target.vth == 0.42
+
+    rows = [{'width': 1e-6, 'length': 0.15e-6, 'vth': 0.42, 'ion': 5e-4},
+            {'width': 2e-6, 'length': 0.5e-6, 'vth': 0.45, 'ion': 3e-4}]
+    bins = build_target_spec({**job, 'per_bin': 'true', 'bins': rows})
+    assert type(bins) is BSIM4GeometrySpec and bins.per_bin and len(bins.bins) == 2
+
+    statistical = build_target_spec({**job, 'samples': '200', 'sigma_vth0': '0.02'})
+    assert type(statistical) is BSIM4StatisticalSpec
+    assert (statistical.samples, statistical.sigma_vth0, statistical.seed) == (200, 0.02, 1)
+
+    with pytest.raises(ValueError, match="vth and ion"):
+        build_target_spec({**JOB_DEFAULTS, 'vth': 0.42})
+    with pytest.raises(ValueError, match="geometry bins"):
+        build_target_spec({**job, 'metrics': 'dibl=20', 'bins': rows})
+
+
+def test_metric_list_form():
+    job = {**JOB_DEFAULTS, 'vth': 0.42, 'ion': 5e-4, 'metrics': [{'name': 'ss', 'value': 85, 'weight': 2}]}
+    metric = build_target_spec(job).metrics[0]
+    assert (metric.name, metric.value, metric.weight) == ('ss', 85.0, 2.0)
+
+
+def test_main_centers_every_device(tmp_path, capsys):
+    path = write(tmp_path / "jobs.json", json.dumps({
+        'defaults': {'model_lib': MODEL_LIB, 'tolerance': 0.02},
+        'devices': [{'name': 'n1', 'vth': 0.42, 'ion': 5e-4},
+                    {'name': 'p1', 'device_model': 'sky130_fd_pr__pfet_01v8', 'vth': -0.42, 'ion': 3e-4}]
+    }))
+    output_dir = tmp_path / "out"
+    assert main([path, "--output-dir", str(output_dir), "--jobs", "2"]) == 0
+
+    summary = json.loads((output_dir / "summary.json").read_text())
+    assert (summary['devices'], summary['converged'], summary['failed']) == (2, 2, [])
+    assert [result['name'] for result in summary['results']] == ['n1', 'p1']
+    for name, polarity in (('n1', 'nmos'), ('p1', 'pmos')):
+        result = json.loads((output_dir / f"{name}.json").read_text())
+        assert result['converged'] and result['error'] < 0.02
+        assert result['model_card'] == str(output_dir / f"{name}.lib")
+        assert f"{polarity[0]}ch_centered {polarity}" in (output_dir / f"{name}.lib").read_text()
+        assert (output_dir / f"{name}_report.txt").read_text()
+        assert (output_dir / f"{name}.log").exists()
+        assert (output_dir / f"{name}.checkpoint.json.gz").exists()
+    assert "2/2 devices converged" in capsys.readouterr().out
+
+
+def test_main_fails_when_a_device_fails(tmp_path):
+    path = write(tmp_path / "jobs.json", json.dumps([
+        {'name': 'ok', 'model_lib': MODEL_LIB, 'vth': 0.42, 'ion': 5e-4},
+        {'name': 'missing', 'model_lib': 'missing.lib', 'vth': 0.42, 'ion': 5e-4}
+    ]))
+    output_dir = tmp_path / "out"
+    assert main([path, "--output-dir", str(output_dir)]) == 1
+    summary = json.loads((output_dir / "summary.json").read_text())
+    assert summary['failed'] == ['missing'] and summary['converged'] == 1
+    result = json.loads((output_dir / "missing.json").read_text())
+    assert "Model library not found" in result['error_message']
+    assert not (output_dir / "missing.lib").exists()
@@ -0,0 +1,54 @@
+from auto_centering import BSIM4TargetSpec, BSIM4StatisticalSpec, netlist_spec
+from cache import SimulationCache
+from tuning import MetricTarget
+
+
+def test_get_put_and_stats(tmp_path):
+    cache = SimulationCache(str(tmp_path / "cache.sqlite"))
+    key = SimulationCache.make_key(params={'vth0': 0.35, 'u0': 400.0}, backend="analytic")
+    assert cache.get(key) is None
+    cache.put(key, {'vth': 0.42, 'ion': 5e-4})
+    assert cache.get(key) == {'vth': 0.42, 'ion': 5e-4}
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'hit_rate': 0.5, 'entries': 1}
+
+
+def test_keys_ignore_argument_order_but_not_values():
+    key = SimulationCache.make_key(a=1.0, b=[1, 2])
+    assert key == SimulationCache.make_key(b=[1, 2], a=1.0)
+    assert key != SimulationCache.make_key(a=1.0 + 1e-12, b=[1, 2])
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = SimulationCache(str(tmp_path / "cache.sqlite"), max_entries=10)
+    for i in range(10):
+        cache.put(str(i), {'i': i})
+    # reading an entry makes it recent
+    assert cache.get("0") == {'i': 0}
+    cache.put("10", {'i': 10})
+
+    # one put over the limit evicts a tenth of the cache plus the excess: the two oldest
+    assert cache.stats()['entries'] == 9
+    assert cache.get("1") is None and cache.get("2") is None
+    assert cache.get("0") == {'i': 0}
+    assert cache.get("10") == {'i': 10}
+
+
+def test_entry_count_survives_reopening(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = SimulationCache(path, max_entries=100)
+    for i in range(150):
+        cache.put(str(i), {'i': i})
+    assert cache.stats()['entries'] <= 100
+    reopened = SimulationCache(path, max_entries=20)
+    reopened.put("new", {'i': -1})
+    assert reopened.stats()['entries'] <= 20
+    assert reopened.get("new") == {'i': -1}
+
+
+def test_netlist_spec_ignores_targets():
+    spec = BSIM4TargetSpec(vth=0.42, ion=5e-4, metrics=[MetricTarget('ss', 80)])
+    retargeted = BSIM4TargetSpec(vth=0.45, ion=6e-4, metrics=[MetricTarget('ss', 90, weight=2)])
+    assert netlist_spec(spec) == netlist_spec(retargeted)
+    assert netlist_spec(spec) != netlist_spec(BSIM4TargetSpec(vth=0.42, ion=5e-4, vdd=1.2))
+    assert netlist_spec(spec) != netlist_spec(BSIM4TargetSpec(vth=0.42, ion=5e-4, metrics=[MetricTarget('dibl', 20.0)]))
+    assert netlist_spec(BSIM4StatisticalSpec(vth=0.42, ion=5e-4)) != netlist_spec(BSIM4TargetSpec(vth=0.42, ion=5e-4))
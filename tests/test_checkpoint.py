@@ -0,0 +1,97 @@
+import pytest
+
+from auto_centering import BSIM4TargetSpec, CenteringCancelled, SkyWaterBSIM4Centering
+from conftest import MODEL_LIB
+from checkpoint import load_checkpoint
+from optimizers import CMAESOptimizer, create_optimizer
+
+SPEC = BSIM4TargetSpec(vth=0.42, ion=5e-4)
+ITERATIONS = 6
+TOLERANCE = 1e-4    # not reached, every run takes all iterations
+
+
+def create_tool(optimizer: str) -> SkyWaterBSIM4Centering:
+    strategy = CMAESOptimizer(population=6, seed=3) if optimizer == "cmaes" else create_optimizer(optimizer)
+    tool = SkyWaterBSIM4Centering(model_lib_file=MODEL_LIB, optimizer=strategy, warm_start=False)
+    tool.extract_nominal_parameters()
+    return tool
+
+
+def interrupt_after(tool: SkyWaterBSIM4Centering, iterations: int):
+    # cancels the run like a killed process, in the iteration after `iterations` checkpointed ones
+    def callback(event):
+        if event.kind == 'iteration' and event.data['iteration'] == iterations:
+            tool.cancel()
+    tool.event_callback = callback
+
+
+def history(tool: SkyWaterBSIM4Centering):
+    return [(entry['params'], entry['error']) for entry in tool.iteration_log]
+
+
+@pytest.mark.parametrize("optimizer", ["lm", "broyden", "cmaes"])
+def test_resumed_run_matches_uninterrupted_run(tmp_path, optimizer):
+    path = str(tmp_path / "run.ckpt.json.gz")
+    uninterrupted = create_tool(optimizer)
+    uninterrupted.optimize_parameters(SPEC, max_iterations=ITERATIONS, tolerance=TOLERANCE)
+
+    interrupted = create_tool(optimizer)
+    interrupt_after(interrupted, 3)
+    with pytest.raises(CenteringCancelled):
+        interrupted.optimize_parameters(SPEC, max_iterations=ITERATIONS, tolerance=TOLERANCE, checkpoint=path)
+    interrupted.close()
+
+    resumed = create_tool(optimizer)
+    iterations = []
+    resumed.event_callback = lambda event: event.kind == 'iteration' and iterations.append(event.data['iteration'])
+    resumed.optimize_parameters(SPEC, max_iterations=ITERATIONS, tolerance=TOLERANCE, checkpoint=path, resume=True)
+    # checkpointed iterations are not run again (strategies whose step does not simulate
+    # also checkpoint the cancelled iteration)
+    assert iterations[0] >= 3 and iterations == list(range(iterations[0], ITERATIONS))
+    assert history(resumed) == history(uninterrupted)
+    assert resumed.current_params.to_dict() == uninterrupted.current_params.to_dict()
+    assert resumed.best_error == uninterrupted.best_error
+    uninterrupted.close()
+    resumed.close()
+
+
+def test_finished_run_is_not_repeated(tmp_path):
+    path = str(tmp_path / "run.ckpt.json.gz")
+    tool = create_tool("lm")
+    tool.optimize_parameters(SPEC, max_iterations=3, tolerance=TOLERANCE, checkpoint=path)
+    final = tool.current_params.to_dict()
+    simulations = tool.simulation_count
+    tool.close()
+
+    again = create_tool("lm")
+    again.optimize_parameters(SPEC, max_iterations=3, tolerance=TOLERANCE, checkpoint=path, resume=True)
+    # the simulation count is restored from the checkpoint, nothing is simulated again
+    assert again.simulation_count == simulations
+    assert again.current_params.to_dict() == final
+    again.close()
+
+
+@pytest.mark.parametrize("optimizer", ["lm", "cmaes"])
+def test_finished_run_continues_with_more_iterations(tmp_path, optimizer):
+    # the final checkpoint holds the last iterate and optimizer state, not the restored best parameters
+    path = str(tmp_path / "run.ckpt.json.gz")
+    uninterrupted = create_tool(optimizer)
+    uninterrupted.optimize_parameters(SPEC, max_iterations=ITERATIONS, tolerance=TOLERANCE)
+
+    tool = create_tool(optimizer)
+    tool.optimize_parameters(SPEC, max_iterations=3, tolerance=TOLERANCE, checkpoint=path)
+    tool.close()
+    resumed = create_tool(optimizer)
+    resumed.optimize_parameters(SPEC, max_iterations=ITERATIONS, tolerance=TOLERANCE, checkpoint=path, resume=True)
+    assert history(resumed) == history(uninterrupted)
+    assert resumed.current_params.to_dict() == uninterrupted.current_params.to_dict()
+    uninterrupted.close()
+    resumed.close()
+
+
+def test_checkpoint_of_another_run_is_ignored(tmp_path):
+    path = str(tmp_path / "run.ckpt.json.gz")
+    tool = create_tool("lm")
+    tool.optimize_parameters(SPEC, max_iterations=2, tolerance=TOLERANCE, checkpoint=path)
+    tool.close()
+    assert load_checkpoint(path, "another run") is None
@@ -0,0 +1,78 @@
+import pytest
+
+from auto_centering import BSIM4MultiTargetSpec, BSIM4TargetSpec, CornerSpec
+from surrogate import AnalyticBackend
+
+CORNERS = [
+    CornerSpec("tt", BSIM4TargetSpec(vth=0.42, ion=5e-4)),
+    CornerSpec("ss_hot", BSIM4TargetSpec(vth=0.40, ion=3.5e-4, vdd=1.62, temp=125),
+               vth0_shift=0.03, u0_scale=0.9, vsat_scale=0.95),
+    CornerSpec("ff_cold", BSIM4TargetSpec(vth=0.48, ion=6.5e-4, vdd=1.98, temp=-40),
+               vth0_shift=-0.03, u0_scale=1.1, vsat_scale=1.05),
+]
+SPEC = BSIM4MultiTargetSpec(CORNERS)
+
+
+class RecordingBackend(AnalyticBackend):
+    # analytic results, keeps every simulated job
+
+    def __init__(self):
+        super().__init__()
+        self.jobs = []
+
+    def run(self, job, workdir=None):
+        with self.lock:
+            self.jobs.append(job)
+        return super().run(job, workdir)
+
+
+@pytest.mark.parametrize("device, sign", [("sky130_fd_pr__nfet_01v8", 1), ("sky130_fd_pr__pfet_01v8", -1)])
+def test_every_corner_sets_its_temperature_supply_and_shifts(make_tool, device, sign):
+    tool = make_tool(device)
+    params = tool.current_params
+    job = tool.build_simulation_job(params, SPEC)
+    analyses = {analysis.name: analysis for analysis in job.analyses}
+    assert len(analyses) == 2 * len(CORNERS)
+    for corner in CORNERS:
+        lin = analyses[f"{corner.name}_lin"]
+        assert f"altermod {device} vth0 = {params.vth0 + sign * corner.vth0_shift:.9e}" in lin.setup
+        assert f"altermod {device} u0 = {params.u0 * corner.u0_scale:.9e}" in lin.setup
+        assert f"altermod {device} vsat = {params.vsat * corner.vsat_scale:.9e}" in lin.setup
+        assert f"option temp = {corner.target.temp}" in lin.setup
+        assert f"alter Vds2 dc = {sign * corner.target.vdd}" in lin.setup
+        assert lin.command == f"dc Vgs1 0 {sign * corner.target.vdd} {sign * 0.02}"
+        assert analyses[f"{corner.name}_sat"].command == f"dc Vgs2 0 {sign * corner.target.vdd} {sign * 0.02}"
+
+
+def test_one_netlist_per_candidate(make_tool):
+    backend = RecordingBackend()
+    tool = make_tool(backend=backend)
+    params_list = [tool.current_params.updated({'vth0': 0.30 + 0.03 * i}) for i in range(3)]
+    results = tool.run_simulations_batch(params_list, SPEC)
+    assert len(backend.jobs) == 3
+    assert tool.simulation_count == 3
+    for params, candidate in zip(params_list, results):
+        assert set(candidate) == {corner.name for corner in CORNERS}
+        # each corner matches a single-target run of its shifted parameters
+        for corner in CORNERS:
+            shifted = params.updated({'vth0': params.vth0 + corner.vth0_shift, 'u0': params.u0 * corner.u0_scale,
+                                      'vsat': params.vsat * corner.vsat_scale})
+            single = tool.run_simulation(shifted, corner.target)
+            for name in ('vth', 'ion', 'ss', 'dibl'):
+                assert candidate[corner.name][name] == pytest.approx(single[name], rel=1e-6)
+
+
+def test_corners_differ(make_tool):
+    tool = make_tool()
+    results = tool.run_simulation(tool.current_params, SPEC)
+    # slow/hot at low supply has the lowest current, fast/cold at high supply the highest
+    assert results['ss_hot']['ion'] < results['tt']['ion'] < results['ff_cold']['ion']
+
+
+def test_corner_names_and_geometry_are_checked():
+    with pytest.raises(ValueError, match="unique"):
+        BSIM4MultiTargetSpec([CORNERS[0], CORNERS[0]])
+    with pytest.raises(ValueError, match="Invalid corner name"):
+        BSIM4MultiTargetSpec([CornerSpec("ss hot", CORNERS[1].target)])
+    with pytest.raises(ValueError, match="same device length and width"):
+        BSIM4MultiTargetSpec([CORNERS[0], CornerSpec("wide", BSIM4TargetSpec(vth=0.42, ion=5e-4, width=2e-6))])
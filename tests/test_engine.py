@@ -0,0 +1,210 @@
+import asyncio
+import sys
+import threading
+
+import pytest
+
+from auto_centering import BSIM4TargetSpec, CenteringCancelled, SkyWaterBSIM4Centering
+from batch import SimulationPool
+from conftest import MODEL_LIB
+from engine import CenteringRun, route_output
+from surrogate import AnalyticBackend
+
+NMOS = ("sky130_fd_pr__nfet_01v8", BSIM4TargetSpec(vth=0.42, ion=5e-4))
+PMOS = ("sky130_fd_pr__pfet_01v8", BSIM4TargetSpec(vth=-0.42, ion=3e-4))
+
+
+class GatedBackend(AnalyticBackend):
+    # analytic results; prints the simulated device (from the pool thread on a pool).
+    # Jobs of the held device wait for the gate once `after` of them have run
+    name = "gated"
+
+    def __init__(self, gate: threading.Event = None, held: str = "", after: int = 0):
+        super().__init__()
+        self.gate = gate
+        self.held = held
+        self.after = after
+        self.runs = 0
+
+    def run(self, job, workdir=None):
+        device = next(line.split()[5] for line in job.circuit if line.startswith("M"))
+        if self.gate is not None and device.startswith(self.held):
+            with self.lock:
+                self.runs += 1
+                hold = self.runs > self.after
+            if hold:
+                self.gate.wait(10)
+        print(f"backend: {device}")
+        return super().run(job, workdir)
+
+
+def new_tool(device: str, backend, pool=None):
+    tool = SkyWaterBSIM4Centering(model_lib_file=MODEL_LIB, device_model=device, backend=backend,
+                                  simulation_pool=pool, warm_start=False)
+    tool.extract_nominal_parameters()
+    return tool
+
+
+async def follow(run: CenteringRun, on_event=None):
+    events = []
+    async for event in run.events():
+        events.append(event)
+        if on_event is not None:
+            on_event(event)
+    return events
+
+
+def test_event_stream(make_tool):
+    tool = make_tool()
+    run = CenteringRun(tool, NMOS[1], max_iterations=10, tolerance=0.01)
+
+    async def main():
+        events = await follow(run)
+        return events, await run.wait()
+
+    events, converged = asyncio.run(main())
+    assert converged
+    kinds = [event.kind for event in events if event.kind != 'log']
+    assert kinds[0] == 'start' and kinds[-1] == 'finished'
+    iterations = [event.data for event in events if event.kind == 'iteration']
+    assert [data['iteration'] for data in iterations] == list(range(len(iterations)))
+    assert iterations[-1]['best_error'] < 0.01
+    assert events[-1].data['success'] and events[-1].data['simulations'] == tool.simulation_count
+    # console output arrives as log events
+    assert any(event.data['line'].startswith("Target: Vth=0.420V") for event in events if event.kind == 'log')
+
+
+def test_cancel_stops_the_run():
+    # the optimizer step after the first iteration waits until the run is cancelled
+    gate = threading.Event()
+    tool = new_tool(NMOS[0], GatedBackend(gate, after=1))
+    run = CenteringRun(tool, NMOS[1], max_iterations=10, tolerance=0.01)
+
+    def on_event(event):
+        if event.kind == 'iteration':
+            run.cancel()
+            gate.set()
+
+    async def main():
+        events = await follow(run, on_event)
+        with pytest.raises(CenteringCancelled):
+            await run.wait()
+        return events
+
+    try:
+        events = asyncio.run(main())
+    finally:
+        tool.close()
+    assert [event.kind for event in events if event.kind != 'log'] == ['start', 'iteration', 'cancelled']
+    run.thread.join(5)
+    assert not run.thread.is_alive()
+    assert tool.best_error > 0.01
+
+
+def test_cancelled_device_is_closed_and_not_converged(tmp_path, monkeypatch):
+    # the batch closes the tool of a device cancelled mid-run and records it as not converged
+    import batch_centering
+
+    class CancelledRun(CenteringRun):
+        def _post(self, event):
+            super()._post(event)
+            if event.kind == 'iteration':
+                self.cancel()
+
+    tools = []
+
+    def create_tool(*args, **kwargs):
+        tools.append(original(*args, **kwargs))
+        return tools[-1]
+
+    original = batch_centering.create_tool
+    monkeypatch.setattr(batch_centering, "CenteringRun", CancelledRun)
+    monkeypatch.setattr(batch_centering, "create_tool", create_tool)
+    job = {**batch_centering.JOB_DEFAULTS, 'name': 'n1', 'model_lib': MODEL_LIB, 'vth': 0.42, 'ion': 5e-4,
+           'tolerance': 0.001}
+    backend = AnalyticBackend()
+    pool = SimulationPool(backend, workers=2, shared=True)
+
+    async def main():
+        return await batch_centering.center_device(job, str(tmp_path), backend, pool, asyncio.Semaphore(1))
+
+    try:
+        result = asyncio.run(main())
+    finally:
+        pool.close()
+    assert result['converged'] is False and result['error_message'] == "cancelled"
+    assert tools[0].simulation_pool is None
+    assert not (tmp_path / "n1.lib").exists()
+    assert "Optimization cancelled" in (tmp_path / "n1.log").read_text()
+
+
+def test_cancel_before_start(make_tool):
+    tool = make_tool()
+    run = CenteringRun(tool, NMOS[1], max_iterations=10)
+    run.cancel()
+
+    async def main():
+        events = await follow(run)
+        with pytest.raises(CenteringCancelled):
+            await run.wait()
+        return events
+
+    events = asyncio.run(main())
+    assert [event.kind for event in events if event.kind != 'log'] == ['cancelled']
+    assert tool.simulation_count == 0
+
+
+def test_concurrent_runs_keep_their_output_apart():
+    # an NMOS and a PMOS run converge on one shared pool while a third run, held at its
+    # first simulation, is cancelled; the backend prints from the pool threads and each
+    # line must reach the run that submitted the job
+    gate = threading.Event()
+    held = "sky130_fd_pr__nfet_g5v0d10v5"
+    backend = GatedBackend(gate, held=held)
+    pool = SimulationPool(backend, workers=4, shared=True)
+    tools = [new_tool(device, backend, pool) for device in (NMOS[0], PMOS[0], held)]
+    runs = [CenteringRun(tool, spec, max_iterations=10, tolerance=0.01)
+            for tool, spec in zip(tools, (NMOS[1], PMOS[1], NMOS[1]))]
+    stdout = sys.stdout
+
+    def cancel_on_start(event):
+        if event.kind == 'start':
+            runs[2].cancel()
+            gate.set()
+
+    async def main():
+        streams = await asyncio.gather(follow(runs[0]), follow(runs[1]), follow(runs[2], cancel_on_start))
+        outcomes = await asyncio.gather(*(run.wait() for run in runs), return_exceptions=True)
+        return streams, outcomes
+
+    try:
+        streams, outcomes = asyncio.run(main())
+    finally:
+        for tool in tools:
+            tool.close()
+        pool.close()
+    assert outcomes[0] is True and outcomes[1] is True
+    assert isinstance(outcomes[2], CenteringCancelled)
+    assert streams[2][-1].kind == 'cancelled'
+    for (device, spec), events in zip((NMOS, PMOS), streams):
+        lines = [event.data['line'] for event in events if event.kind == 'log']
+        backend_lines = [line for line in lines if line.startswith("backend:")]
+        # side-by-side netlists simulate copies of the model, <device>_set<i>
+        assert backend_lines and all(line.startswith(f"backend: {device}") for line in backend_lines)
+        targets = [line for line in lines if line.startswith("Target: Vth")]
+        assert targets == [f"Target: Vth={spec.vth:.3f}V, Ion={spec.ion:.2e}A/um"]
+    # the routing is undone once the last run has finished
+    assert sys.stdout is stdout
+
+
+def test_route_output_outside_runs(capsys):
+    lines = []
+    with route_output(lines.append):
+        print("routed")
+        print("partial", end="")
+        thread = threading.Thread(target=print, args=("other thread",))
+        thread.start()
+        thread.join()
+    print("after")
+    assert lines == ["routed", "partial"]
+    assert capsys.readouterr().out == "other thread\nafter\n"
@@ -0,0 +1,110 @@
+import math
+
+import numpy as np
+import pytest
+
+from auto_centering import LINEAR_VDS, BSIM4TargetSpec
+from extraction import (CONSTANT_CURRENT, extract_iv_metrics, iv_metric_arrays, output_resistance,
+                        threshold_current)
+from tuning import MetricTarget
+
+W = 2e-6
+L = 0.3e-6
+VDD = 1.8
+VGS = np.linspace(0, VDD, 91)
+LEVEL = CONSTANT_CURRENT * W / L
+
+
+def test_threshold_current_scales_with_w_over_l():
+    assert threshold_current(W, L) == pytest.approx(140e-9 * W / L)
+    assert threshold_current(2 * W, L) == pytest.approx(2 * threshold_current(W, L))
+
+
+def test_linear_curves():
+    # Id = g * Vgs: every metric is known exactly and linear interpolation is exact
+    g = 1e-6
+    id_lin = g * VGS
+    id_sat = g * (VGS + 0.05)
+    metrics = extract_iv_metrics(VGS, id_lin, VGS, id_sat, LINEAR_VDS, VDD, W, L, metrics=['gm', 'idlin'])
+    assert metrics['vth'] == pytest.approx(LEVEL / g)
+    assert metrics['vth_sat'] == pytest.approx(LEVEL / g - 0.05)
+    assert metrics['dibl'] == pytest.approx(50 / (VDD - LINEAR_VDS))
+    assert metrics['ion'] == pytest.approx(g * (VDD + 0.05) / 2)
+    assert metrics['ioff'] == pytest.approx(g * 0.05 / 2)
+    assert metrics['gm'] == pytest.approx(g / 2)
+    assert metrics['idlin'] == pytest.approx(g * VDD / 2)
+
+
+def test_gm_and_idlin_only_when_listed():
+    metrics = extract_iv_metrics(VGS, 1e-6 * VGS, VGS, 1e-6 * VGS, LINEAR_VDS, VDD, W, L)
+    assert 'gm' not in metrics and 'idlin' not in metrics
+
+
+def test_max_gm_vth_extrapolates_the_linear_region():
+    vt = 0.4
+    id_lin = 1e-4 * np.maximum(VGS - vt, 0)
+    metrics = extract_iv_metrics(VGS, id_lin, VGS, id_lin, LINEAR_VDS, VDD, W, L)
+    assert metrics['vth_gm'] == pytest.approx(vt - LINEAR_VDS / 2)
+
+
+def test_subthreshold_swing():
+    # 75 mV per decade up to well above the threshold current
+    id_lin = 1e-12 * 10 ** (VGS / 0.075)
+    metrics = extract_iv_metrics(VGS, id_lin, VGS, id_lin, LINEAR_VDS, VDD, W, L)
+    assert metrics['ss'] == pytest.approx(75)
+    assert metrics['vth'] == pytest.approx(0.075 * math.log10(LEVEL / 1e-12), abs=2e-3)
+
+
+def test_output_resistance():
+    vds = np.array([1.7, 1.75, 1.8])
+    ids = np.array([1e-4, 1.01e-4, 1.02e-4])
+    assert float(output_resistance(vds, ids, W)) == pytest.approx(0.05 / 1e-6 * 2)
+    # falling current: no resistance
+    assert np.isnan(output_resistance(vds, ids[::-1], W))
+
+
+def test_flat_and_non_crossing_curves_give_nan():
+    flat = np.full_like(VGS, LEVEL / 10)
+    metrics = extract_iv_metrics(VGS, flat, VGS, flat, LINEAR_VDS, VDD, W, L)
+    assert math.isnan(metrics['vth']) and math.isnan(metrics['vth_sat'])
+    assert math.isnan(metrics['ss']) and math.isnan(metrics['vth_gm']) and math.isnan(metrics['dibl'])
+
+    # a sweep already above the threshold current at its first point has no crossing either
+    above = LEVEL * (2 + VGS)
+    assert math.isnan(extract_iv_metrics(VGS, above, VGS, above, LINEAR_VDS, VDD, W, L)['vth'])
+
+
+def test_windowed_sweep_has_no_gm_vth_or_ss():
+    window = np.linspace(0.4, 0.52, 31)
+    metrics = extract_iv_metrics(window, 2e-6 * window, VGS, 2e-6 * VGS, LINEAR_VDS, VDD, W, L)
+    assert metrics['vth'] == pytest.approx(LEVEL / 2e-6)
+    assert math.isnan(metrics['vth_gm']) and math.isnan(metrics['ss'])
+
+
+def test_stacked_sweeps_match_single_extraction():
+    gains = np.array([1e-6, 2e-6, 4e-6])
+    stack = gains[:, None] * VGS
+    arrays = iv_metric_arrays(VGS, stack, VGS, stack, LINEAR_VDS, VDD, W, L, metrics=['gm'])
+    for i, g in enumerate(gains):
+        single = extract_iv_metrics(VGS, stack[i], VGS, stack[i], LINEAR_VDS, VDD, W, L, metrics=['gm'])
+        for name, value in single.items():
+            assert arrays[name][i] == pytest.approx(value, nan_ok=True)
+        assert arrays['vth'][i] == pytest.approx(LEVEL / g)
+
+
+def test_failed_extraction_is_a_failed_simulation(make_tool):
+    tool = make_tool()
+    spec = BSIM4TargetSpec(vth=0.42, ion=5e-4, length=L, width=W)
+    flat = {'vgs': list(VGS), 'id': [LEVEL / 10] * len(VGS)}
+    results = tool.parse_simulation_results({'lin': flat, 'sat': flat}, spec)
+    assert results['vth'] == 0
+    assert tool.simulation_failed(results)
+
+    # a requested metric that cannot be measured fails the whole simulation:
+    # Vth is in this window, the subthreshold swing is not
+    window = np.linspace(0.4, 0.52, 31)
+    lin = {'vgs': list(window), 'id': list(2e-6 * window)}
+    sat = {'vgs': list(VGS), 'id': list(2e-6 * VGS)}
+    assert tool.parse_simulation_results({'lin': lin, 'sat': sat}, spec)['vth'] == pytest.approx(LEVEL / 2e-6)
+    spec.metrics = [MetricTarget('ss', 80)]
+    assert tool.parse_simulation_results({'lin': lin, 'sat': sat}, spec) == {'vth': 0, 'ion': 0}
@@ -0,0 +1,79 @@
+import pytest
+
+from auto_centering import (BSIM4BinnedParameters, BSIM4GeometrySpec, BSIM4TargetSpec, GeometryTarget,
+                            geometry_edges)
+from model_library import ModelLibrary
+from optimizers import create_optimizer
+
+DEVICE = "sky130_fd_pr__nfet_01v8"
+ROWS = [
+    GeometryTarget(width=1e-6, length=0.15e-6, vth=0.42, ion=6.0e-4),
+    GeometryTarget(width=5e-6, length=1e-6, vth=0.40, ion=1.5e-4),
+    GeometryTarget(width=0.5e-6, length=0.5e-6, vth=0.45, ion=2.0e-4, weight=2.0),
+]
+
+
+def test_shared_netlist_has_one_device_pair_per_row(make_tool):
+    tool = make_tool()
+    job = tool.generate_geometry_netlist(tool.current_params, BSIM4GeometrySpec(ROWS))
+    devices = [line for line in job.circuit if line.startswith("M")]
+    assert len(devices) == 2 * len(ROWS)
+    for i, row in enumerate(ROWS):
+        assert f"M{i}v d{i}v g1 0 0 {DEVICE} L={row.length} W={row.width}" in devices
+        assert f"M{i}i d{i}i g2 0 0 {DEVICE} L={row.length} W={row.width}" in devices
+    assert list(job.alter) == [DEVICE]
+    assert [analysis.name for analysis in job.analyses] == ['lin', 'sat']
+    assert set(job.analyses[0].vectors) == {'vgs', 'id0', 'id1', 'id2'}
+
+
+def test_per_bin_netlist_copies_the_model(make_tool):
+    tool = make_tool()
+    params = BSIM4BinnedParameters([tool.current_params.updated({'vth0': 0.3 + 0.05 * i}) for i in range(len(ROWS))])
+    job = tool.generate_geometry_netlist(params, BSIM4GeometrySpec(ROWS, per_bin=True))
+    assert list(job.alter) == [f"{DEVICE}_bin{i}" for i in range(len(ROWS))]
+    assert [job.alter[f"{DEVICE}_bin{i}"]['vth0'] for i in range(len(ROWS))] == pytest.approx([0.3, 0.35, 0.4])
+    for i in range(len(ROWS)):
+        assert any(line.lower().startswith(f".model {DEVICE}_bin{i} ") for line in job.circuit)
+        assert sum(f" {DEVICE}_bin{i} " in line for line in job.circuit if line.startswith("M")) == 2
+
+
+def test_each_row_matches_a_single_geometry_run(make_tool):
+    tool = make_tool()
+    spec = BSIM4GeometrySpec(ROWS, vdd=1.8, temp=25)
+    results = tool.run_simulation(tool.current_params, spec)
+    for i, row in enumerate(ROWS):
+        single = tool.run_simulation(tool.current_params, BSIM4TargetSpec(vth=row.vth, ion=row.ion, vdd=1.8, temp=25,
+                                                                          length=row.length, width=row.width))
+        assert results[f"bin{i}"]['vth'] == pytest.approx(single['vth'], abs=1e-6)
+        assert results[f"bin{i}"]['ion'] == pytest.approx(single['ion'], rel=1e-9)
+
+
+def test_duplicate_geometries_are_rejected():
+    with pytest.raises(ValueError, match="W/L"):
+        BSIM4GeometrySpec([ROWS[0], GeometryTarget(width=1e-6, length=0.15e-6, vth=0.4, ion=5e-4)])
+
+
+def test_geometry_edges():
+    assert geometry_edges([1.0, 4.0, 4.0]) == pytest.approx([0.5, 2.0, 8.0])
+    assert geometry_edges([2.0]) == pytest.approx([2.0 / 1.1, 2.2])
+
+
+def test_per_bin_fit_writes_a_binned_model(make_tool, tmp_path):
+    tool = make_tool(optimizer=create_optimizer('lm'))
+    spec = BSIM4GeometrySpec(ROWS, per_bin=True)
+    assert tool.optimize_parameters(spec, max_iterations=10, tolerance=0.02)
+    results = tool.run_simulation(tool.current_params, spec)
+    for i, row in enumerate(ROWS):
+        assert results[f"bin{i}"]['vth'] == pytest.approx(row.vth, rel=0.02)
+        assert results[f"bin{i}"]['ion'] == pytest.approx(row.ion, rel=0.02)
+
+    path = tool.save_centered_model(str(tmp_path / "binned.lib"))
+    cards = [card for cards in ModelLibrary(path).models.values() for card in cards]
+    # 3 distinct lengths x 3 distinct widths
+    assert sorted(card.name for card in cards) == [f"nch_centered.{i}" for i in range(9)]
+    for i, row in enumerate(ROWS):
+        # the simulator's bin choice: lmin <= L < lmax, wmin <= W < wmax
+        selected = [card for card in cards if card.get('lmin') <= row.length < card.get('lmax')
+                    and card.get('wmin') <= row.width < card.get('wmax')]
+        assert len(selected) == 1
+        assert selected[0].get('vth0') == pytest.approx(tool.current_params.bins[i].vth0)
@@ -0,0 +1,20 @@
+import subprocess
+import sys
+
+import pytest
+
+from conftest import SRC_DIR
+
+# numpy is loaded on first use and matplotlib by the GUI window; importing the
+# CLI or GUI modules must not pull them in (timing-independent, unlike benchmark.py)
+DEFERRED_MODULES = ('numpy', 'matplotlib')
+
+
+@pytest.mark.parametrize("module", ["auto_centering", "batch_centering", "bsim4_gui"])
+def test_import_defers_numpy_and_matplotlib(module):
+    probe = f"import sys, {module}; print(*[name for name in {DEFERRED_MODULES!r} if name in sys.modules])"
+    result = subprocess.run([sys.executable, "-c", probe], cwd=SRC_DIR, capture_output=True, text=True, timeout=60)
+    if result.returncode != 0 and "tkinter" in result.stderr:
+        pytest.skip("tkinter is not installed")
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == []
@@ -0,0 +1,48 @@
+from model_library import ModelLibrary
+
+LIBRARY = """* test library
+.lib tt
+.model nch nmos level=54
++ vth0=0.35 u0=0.067 $ first mobility
+* interleaved comment
++ vsat=8e4 u0=670 toxe=3.05n
+.endl tt
+.model pch pmos level=54 vth0=-0.4 vth0=-0.45
+"""
+
+
+def test_duplicate_parameters_use_last_value():
+    card = ModelLibrary.from_text(LIBRARY).get("nch")
+    assert card.get("u0") == 670
+    assert card.duplicates == ["u0"]
+    assert card.section == "tt"
+    assert card.get("toxe") == 3.05e-9
+
+
+def test_duplicates_are_reported_once_per_parameter():
+    card = ModelLibrary.from_text(LIBRARY).get("PCH")
+    assert card.get("vth0") == -0.45
+    assert card.duplicates == ["vth0"]
+    assert list(card.raw_values) == ["level", "vth0"]
+
+
+def test_duplicate_model_cards_are_kept_in_file_order():
+    library = ModelLibrary.from_text(LIBRARY + ".lib ss\n.model nch nmos level=54 vth0=0.4\n.endl ss\n")
+    assert library.names() == ["nch", "pch"]
+    assert library.get("nch").get("vth0") == 0.35
+    assert library.get("nch", section="ss").get("vth0") == 0.4
+
+
+def test_unmodified_library_serializes_verbatim():
+    assert ModelLibrary.from_text(LIBRARY).serialize() == LIBRARY
+
+
+def test_modified_card_drops_duplicates():
+    library = ModelLibrary.from_text(LIBRARY)
+    library.get("nch").set("vth0", 0.42)
+    reparsed = ModelLibrary.from_text(library.serialize())
+    card = reparsed.get("nch")
+    assert card.get("vth0") == 0.42
+    assert card.get("u0") == 670
+    assert card.duplicates == []
+    assert reparsed.get("pch").duplicates == ["vth0"]
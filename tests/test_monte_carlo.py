@@ -0,0 +1,59 @@
+import math
+
+import numpy as np
+import pytest
+
+import auto_centering
+from auto_centering import MC_SAMPLES_PER_JOB, BSIM4StatisticalSpec
+
+
+@pytest.mark.parametrize("samples", [2, MC_SAMPLES_PER_JOB, MC_SAMPLES_PER_JOB + 1, 2 * MC_SAMPLES_PER_JOB + 201])
+def test_samples_split_into_jobs(make_tool, samples):
+    tool = make_tool()
+    spec = BSIM4StatisticalSpec(vth=0.42, ion=5e-4, samples=samples)
+    jobs = tool.build_simulation_jobs(tool.current_params, spec)
+    assert len(jobs) == math.ceil(samples / MC_SAMPLES_PER_JOB)
+    devices = [sum(line.startswith("M") for line in job.circuit) for job in jobs]
+    # a Vth and an Ion device per sample
+    assert sum(devices) == 2 * samples
+    assert all(count == 2 * MC_SAMPLES_PER_JOB for count in devices[:-1])
+
+
+def test_samples_are_seeded():
+    spec = BSIM4StatisticalSpec(vth=0.42, ion=5e-4, samples=50, seed=7)
+    delvto, mulu0 = spec.mismatch_samples()
+    again = BSIM4StatisticalSpec(vth=0.42, ion=5e-4, samples=50, seed=7).mismatch_samples()
+    assert np.array_equal(delvto, again[0]) and np.array_equal(mulu0, again[1])
+    assert not np.array_equal(delvto, BSIM4StatisticalSpec(vth=0.42, ion=5e-4, samples=50, seed=8).mismatch_samples()[0])
+
+
+def test_statistics_cover_every_sample(make_tool, monkeypatch):
+    # small jobs, so a hundred samples run as three netlists
+    monkeypatch.setattr(auto_centering, "MC_SAMPLES_PER_JOB", 40)
+    tool = make_tool()
+    spec = BSIM4StatisticalSpec(vth=0.42, ion=5e-4, samples=101, sigma_vth0=0.02, sigma_u0=0.05)
+    params = tool.current_params
+    assert len(tool.build_simulation_jobs(params, spec)) == 3
+    results = tool.run_simulation(params, spec)
+    assert results['samples'] == spec.samples
+
+    # every sample on its own: mismatch as a model shift of a nominal testbench
+    nominal = auto_centering.BSIM4TargetSpec(vth=spec.vth, ion=spec.ion)
+    delvto, mulu0 = spec.mismatch_samples()
+    singles = [tool.run_simulation(params.updated({'vth0': params.vth0 + dv, 'u0': params.u0 * mu}), nominal)
+               for dv, mu in zip(delvto, mulu0)]
+    for name in ('vth', 'ion'):
+        values = np.array([single[name] for single in singles])
+        assert results[name] == pytest.approx(values.mean(), rel=1e-6)
+        assert results[f'{name}_sigma'] == pytest.approx(values.std(ddof=1), rel=1e-6)
+        low, high = np.percentile(values, [0.135, 99.865])
+        assert results[f'{name}_low'] == pytest.approx(low, rel=1e-6)
+        assert results[f'{name}_high'] == pytest.approx(high, rel=1e-6)
+    assert results['vth_sigma'] == pytest.approx(spec.sigma_vth0, rel=0.3)
+
+
+def test_failed_samples_fail_the_candidate(make_tool):
+    tool = make_tool()
+    # a mismatch far beyond the sweep leaves most samples without a Vth
+    spec = BSIM4StatisticalSpec(vth=0.42, ion=5e-4, samples=20, sigma_vth0=2.0)
+    assert tool.simulation_failed(tool.run_simulation(tool.current_params, spec))
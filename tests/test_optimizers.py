@@ -0,0 +1,58 @@
+import pytest
+
+from auto_centering import BSIM4TargetSpec
+from optimizers import PARAMETER_BOUNDS, clamp_parameter, create_optimizer
+from surrogate import AnalyticBackend
+
+SPEC = BSIM4TargetSpec(vth=0.42, ion=5e-4)     # the CI target
+
+
+class RecordingBackend(AnalyticBackend):
+    # keeps the model alterations of every simulated candidate
+
+    def __init__(self):
+        super().__init__()
+        self.alterations = []
+
+    def run(self, job, workdir=None):
+        self.alterations.extend(job.alter.values())
+        return super().run(job, workdir)
+
+
+@pytest.mark.parametrize("optimizer, budget", [("lm", 8), ("broyden", 6)])
+def test_converges_within_budget(make_tool, optimizer, budget):
+    tool = make_tool(optimizer=create_optimizer(optimizer))
+    assert tool.optimize_parameters(SPEC, max_iterations=10, tolerance=0.01)
+    assert tool.simulation_count <= budget
+    final = tool.iteration_log[-1]['specs']
+    assert final['vth'] == pytest.approx(SPEC.vth, rel=0.01)
+    assert final['ion'] == pytest.approx(SPEC.ion, rel=0.01)
+
+
+@pytest.mark.parametrize("optimizer", ["lm", "broyden"])
+@pytest.mark.parametrize("target", [BSIM4TargetSpec(vth=0.12, ion=1e-2), BSIM4TargetSpec(vth=0.85, ion=1e-5)])
+def test_steps_stay_inside_the_bounds(make_tool, optimizer, target):
+    # targets beyond reach push the search against the bounds
+    backend = RecordingBackend()
+    tool = make_tool(optimizer=create_optimizer(optimizer), backend=backend)
+    tool.optimize_parameters(target, max_iterations=6)
+    assert len(backend.alterations) > 6
+    for values in backend.alterations:
+        for name, (low, high) in PARAMETER_BOUNDS.items():
+            assert low <= abs(values[name]) <= high
+    # the search did run into the bounds
+    at_bound = [name for name, (low, high) in PARAMETER_BOUNDS.items()
+                if any(abs(values[name]) in (pytest.approx(low), pytest.approx(high)) for values in backend.alterations)]
+    assert len(at_bound) >= 2
+
+
+def test_clamp_parameter():
+    low, high = PARAMETER_BOUNDS['vsat']
+    assert clamp_parameter('vsat', high * 2) == high
+    assert clamp_parameter('vsat', low / 2) == low
+    assert clamp_parameter('vsat', 1e5) == 1e5
+
+
+def test_unknown_optimizer():
+    with pytest.raises(ValueError, match="Unknown optimizer"):
+        create_optimizer("newton")
@@ -0,0 +1,63 @@
+import pytest
+
+from auto_centering import LINEAR_VDS, BSIM4TargetSpec
+
+# device, sign of its biases and threshold voltages, CI target
+DEVICES = [
+    ("sky130_fd_pr__nfet_01v8", 1, BSIM4TargetSpec(vth=0.42, ion=5e-4)),
+    ("sky130_fd_pr__pfet_01v8", -1, BSIM4TargetSpec(vth=-0.42, ion=3e-4)),
+]
+
+
+@pytest.mark.parametrize("device, sign, spec", DEVICES)
+def test_netlist_signs(make_tool, device, sign, spec):
+    tool = make_tool(device)
+    assert tool.polarity == sign
+    job = tool.build_simulation_job(tool.current_params, spec)
+    assert f"Vds1 d1 0 {sign * LINEAR_VDS}" in job.circuit
+    assert f"Vgs2 g2 0 {sign * spec.vdd}" in job.circuit
+    assert f"Vds2 d2 0 {sign * spec.vdd}" in job.circuit
+    analyses = {analysis.name: analysis for analysis in job.analyses}
+    assert analyses['lin'].command == f"dc Vgs1 0 {sign * spec.vdd} {sign * 0.02}"
+    assert analyses['sat'].command == f"dc Vgs2 0 {sign * spec.vdd} {sign * 0.02}"
+    # the extraction sees ascending gate magnitudes for both polarities
+    assert analyses['lin'].vectors['vgs'] == ("v(g1)" if sign > 0 else "abs(v(g1))")
+    assert job.alter[device]['vth0'] * sign > 0
+
+
+@pytest.mark.parametrize("device, sign, spec", DEVICES)
+def test_extracted_vth_sign(make_tool, device, sign, spec):
+    tool = make_tool(device)
+    results = tool.run_simulation(tool.current_params, spec)
+    assert not tool.simulation_failed(results)
+    for name in ('vth', 'vth_gm', 'vth_sat'):
+        assert results[name] * sign > 0
+    # magnitudes stay positive
+    assert results['ion'] > 0 and results['ss'] > 0 and results['dibl'] > 0
+
+
+@pytest.mark.parametrize("device, sign, spec", DEVICES)
+def test_centering_converges(make_tool, device, sign, spec):
+    tool = make_tool(device)
+    assert tool.optimize_parameters(spec, max_iterations=10, tolerance=0.01)
+    assert tool.simulation_count <= 8
+    final = tool.iteration_log[-1]['specs']
+    assert final['vth'] == pytest.approx(spec.vth, rel=0.02)
+    assert final['ion'] == pytest.approx(spec.ion, rel=0.02)
+    assert tool.current_params.vth0 * sign > 0
+
+
+@pytest.mark.parametrize("device, sign, spec", DEVICES)
+def test_wrong_sign_target_is_rejected(make_tool, device, sign, spec):
+    tool = make_tool(device)
+    assert not tool.optimize_parameters(BSIM4TargetSpec(vth=-spec.vth, ion=spec.ion), max_iterations=2)
+    assert tool.simulation_count == 0
+
+
+@pytest.mark.parametrize("device, sign, spec", DEVICES)
+def test_saved_card_polarity(make_tool, tmp_path, device, sign, spec):
+    tool = make_tool(device)
+    lines = open(tool.save_centered_model(str(tmp_path / "centered.lib"))).read().splitlines()
+    polarity = "nmos" if sign > 0 else "pmos"
+    index = lines.index(f".model {polarity[0]}ch_centered {polarity}")
+    assert f"vth0={tool.current_params.vth0:.6e}" in lines[index + 1]
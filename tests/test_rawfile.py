@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from rawfile import RawfileError, read_rawfile, read_vectors
+
+
+def header(plotname: str, flags: str, names, n_points: int) -> str:
+    lines = ["Title: test", "Date: Thu Jan  1 00:00:00 2026", f"Plotname: {plotname}", f"Flags: {flags}",
+             f"No. Variables: {len(names)}", f"No. Points: {n_points}", "Variables:"]
+    lines += [f"\t{i}\t{name}\t{'voltage' if i == 0 else 'current'}" for i, name in enumerate(names)]
+    return "\n".join(lines) + "\n"
+
+
+def binary_plot(plotname: str, data) -> bytes:
+    names = list(data)
+    values = np.column_stack([data[name] for name in names])
+    flags = "complex" if np.iscomplexobj(values) else "real"
+    record = values.astype('<c16' if flags == "complex" else '<f8')
+    return (header(plotname, flags, names, len(values)) + "Binary:\n").encode() + record.tobytes()
+
+
+def ascii_plot(plotname: str, data) -> bytes:
+    names = list(data)
+    values = np.column_stack([data[name] for name in names])
+    flags = "complex" if np.iscomplexobj(values) else "real"
+    lines = []
+    for index, row in enumerate(values):
+        cells = [f"{float(v.real)!r},{float(v.imag)!r}" if flags == "complex" else repr(float(v)) for v in row]
+        lines.append(f" {index}\t{cells[0]}")
+        lines += [f"\t{cell}" for cell in cells[1:]]
+        lines.append("")
+    return (header(plotname, flags, names, len(values)) + "Values:\n" + "\n".join(lines) + "\n").encode()
+
+
+SWEEP = {'v(g)': np.linspace(0, 1.8, 91), 'i(vd)': np.geomspace(1e-12, 1e-3, 91)}
+
+
+@pytest.mark.parametrize("writer", [binary_plot, ascii_plot])
+def test_real_round_trip(tmp_path, writer):
+    path = tmp_path / "dc.raw"
+    path.write_bytes(writer("DC transfer characteristic", SWEEP))
+    vectors = read_vectors(str(path))
+    assert list(vectors) == list(SWEEP)
+    for name, values in SWEEP.items():
+        np.testing.assert_array_equal(vectors[name], values)
+
+
+@pytest.mark.parametrize("writer", [binary_plot, ascii_plot])
+def test_complex_round_trip(tmp_path, writer):
+    data = {'frequency': np.array([1e3, 1e6, 1e9], dtype=complex), 'v(out)': np.array([1 + 0j, 0.5 - 0.5j, -0.01j])}
+    path = tmp_path / "ac.raw"
+    path.write_bytes(writer("AC Analysis", data))
+    plot = read_rawfile(str(path))[0]
+    assert plot.is_complex
+    np.testing.assert_array_equal(plot.scale, data['frequency'])
+    np.testing.assert_array_equal(plot['V(OUT)'], data['v(out)'])
+
+
+def test_binary_and_ascii_files_read_the_same(tmp_path):
+    (tmp_path / "a.raw").write_bytes(ascii_plot("DC", SWEEP))
+    (tmp_path / "b.raw").write_bytes(binary_plot("DC", SWEEP))
+    ascii_vectors = read_vectors(str(tmp_path / "a.raw"))
+    binary_vectors = read_vectors(str(tmp_path / "b.raw"))
+    for name in SWEEP:
+        np.testing.assert_array_equal(ascii_vectors[name], binary_vectors[name])
+
+
+def test_several_plots_and_repeated_names(tmp_path):
+    path = tmp_path / "multi.raw"
+    second = {'v(g)': np.array([0.0, 0.9]), 'i(vd)': np.array([1e-9, 2e-4])}
+    path.write_bytes(binary_plot("lin", SWEEP) + b"\n" + ascii_plot("sat", second))
+    plots = read_rawfile(str(path))
+    assert [plot.plotname for plot in plots] == ["lin", "sat"]
+    np.testing.assert_array_equal(read_vectors(str(path))['i(vd)'], second['i(vd)'])
+
+    # the trailing blank is lost in the header, so the file lists i(x) twice
+    path.write_bytes(binary_plot("dup", {'v(g)': np.zeros(2), 'i(x)': np.ones(2), 'i(x) ': np.full(2, 2.0)}))
+    assert list(read_rawfile(str(path))[0].data) == ['v(g)', 'i(x)', 'i(x)#1']
+
+
+def test_truncated_and_empty_files_raise(tmp_path):
+    path = tmp_path / "bad.raw"
+    path.write_bytes(binary_plot("DC", SWEEP)[:-8])
+    with pytest.raises(RawfileError):
+        read_rawfile(str(path))
+    path.write_bytes(ascii_plot("DC", SWEEP)[:-40])
+    with pytest.raises(RawfileError):
+        read_rawfile(str(path))
+    path.write_bytes(b"")
+    with pytest.raises(RawfileError):
+        read_rawfile(str(path))
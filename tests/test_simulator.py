@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from simulator import (Analysis, SimulationError, SimulationJob, SimulatorBackend, SubprocessNgspiceBackend,
+                       altermod_commands, create_backend)
+from surrogate import AnalyticBackend
+
+CIRCUIT = [
+    "* one nfet, gate swept at VDD",
+    ".model nch nmos level=54 vth0=0.4 u0=400 vsat=1e5 toxe=4n",
+    "vd d 0 dc 1.8",
+    "vg g 0 dc 0",
+    "m1 d g 0 0 nch l=0.15u w=1u",
+    ".end",
+]
+SWEEP = Analysis('sat', 'dc vg 0 1.8 0.1', {'vgs': 'v(g)', 'id': 'abs(i(vd))'})
+
+
+def drain_current(job: SimulationJob) -> np.ndarray:
+    return AnalyticBackend().run(job)['sat']['id']
+
+
+def test_backend_interface_is_abstract():
+    with pytest.raises(TypeError):
+        SimulatorBackend()
+
+    class StandIn(SimulatorBackend):
+        name = "stand-in"
+
+        def run(self, job, workdir):
+            return {analysis.name: {} for analysis in job.analyses}
+
+    assert StandIn().run(SimulationJob(CIRCUIT, analyses=[SWEEP]), "") == {'sat': {}}
+
+
+def test_create_backend_selection(monkeypatch):
+    monkeypatch.setenv("AUTO_CENTERING_BACKEND", "analytic")
+    assert isinstance(create_backend(), AnalyticBackend)
+    monkeypatch.setenv("AUTO_CENTERING_BACKEND", "subprocess")
+    assert isinstance(create_backend(), SubprocessNgspiceBackend)
+    # an explicit kind wins over the environment, case does not matter
+    assert isinstance(create_backend("Analytic"), AnalyticBackend)
+    with pytest.raises(ValueError, match="Unknown simulator backend"):
+        create_backend("spectre")
+
+
+def test_altermod_commands():
+    assert altermod_commands({'nch': {'vth0': 0.42, 'u0': 400}}) == [
+        "altermod nch vth0 = 4.200000000e-01", "altermod nch u0 = 4.000000000e+02"]
+
+
+def test_analytic_dc_sweep():
+    results = AnalyticBackend().run(SimulationJob(CIRCUIT, analyses=[SWEEP]))
+    np.testing.assert_allclose(results['sat']['vgs'], np.linspace(0, 1.8, 19), atol=1e-12)
+    current = results['sat']['id']
+    assert len(current) == 19
+    assert np.all(np.diff(current) > 0)
+    assert current[0] < 1e-9 < 1e-5 < current[-1]
+
+
+def test_altered_model_parameters_change_the_results():
+    nominal = drain_current(SimulationJob(CIRCUIT, analyses=[SWEEP]))
+    higher_vth = drain_current(SimulationJob(CIRCUIT, alter={'nch': {'vth0': 0.5}}, analyses=[SWEEP]))
+    assert np.all(higher_vth[5:] < nominal[5:])
+    # the same alteration as a control command before the analysis
+    setup = Analysis(SWEEP.name, SWEEP.command, SWEEP.vectors, setup=altermod_commands({'nch': {'vth0': 0.5}}))
+    np.testing.assert_array_equal(drain_current(SimulationJob(CIRCUIT, analyses=[setup])), higher_vth)
+    faster = drain_current(SimulationJob(CIRCUIT, alter={'NCH': {'u0': 800}}, analyses=[SWEEP]))
+    assert faster[-1] > nominal[-1]
+    # alterations do not leak into the next job
+    np.testing.assert_array_equal(drain_current(SimulationJob(CIRCUIT, analyses=[SWEEP])), nominal)
+
+
+def test_analytic_errors():
+    backend = AnalyticBackend()
+    with pytest.raises(SimulationError, match="not found"):
+        backend.run(SimulationJob([line.replace(" nch l=", " pch l=") for line in CIRCUIT], analyses=[SWEEP]))
+    with pytest.raises(SimulationError, match="Unsupported analysis"):
+        backend.run(SimulationJob(CIRCUIT, analyses=[Analysis('ac', 'ac dec 10 1 1e9', {'id': 'i(vd)'})]))